@@ -0,0 +1,128 @@
+"""Benchmarks for the lircd path against the fake lircd.
+
+Run from the repository root with a Home Assistant environment:
+
+    python -m custom_components.a_lirc.benchmark
+"""
+
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .fake_lircd import FakeLircd
+from .keymap import async_load_keymap
+from .lircd import LircdClient, LircdError, LircdSupervisor, LircdTransport
+from .nakamichi import MODEL_KEYS
+from .remote import NakamichiRemote
+
+# Downtime of the restarted lircd in the reconnect benchmark
+RESTART_DOWNTIME = 0.5
+
+# What the fake lircd reports to LIST
+BENCH_REMOTES = {'nakaw': sorted(MODEL_KEYS | {'Enter'})}
+
+# Airtime of one NEC frame, 67.5 ms, plus the gap before the next
+NEC_FRAME_TIME = 0.07
+# Commands per benchmark when every frame takes NEC_FRAME_TIME
+AIRTIME_COUNT = 40
+
+
+async def async_bench_throughput(path, count):
+    """Pipelined SEND_ONCE commands per second through one transport."""
+    transport = LircdTransport(path)
+    transport.connection.start()
+    try:
+        await transport.async_version()
+        start = time.perf_counter()
+        await asyncio.gather(*(transport.async_send_once('nakaw', 'VolPlus') for _ in range(count)))
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(count):
+            await transport.async_send_once('nakaw', 'VolPlus')
+        serial = time.perf_counter() - start
+    finally:
+        await transport.connection.async_close()
+    print(f'{"send_once pipelined":<24} {count / elapsed:8.0f} cmds/s')
+    print(f'{"send_once one by one":<24} {count / serial:8.0f} cmds/s')
+
+
+async def async_bench_press_button(path, count):
+    """press_button latency through the remote entity, one press at a time."""
+    hass = HomeAssistant(tempfile.mkdtemp())
+    entity = NakamichiRemote(await async_load_keymap(hass, path), 'nakaw')
+    entity.hass = hass
+    entity.entity_id = 'remote.a_lirc_benchmark'
+    await entity.async_added_to_hass()
+    try:
+        await entity.irb.transport.async_version()
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            await entity.async_press_button('Enter')
+            latencies.append(time.perf_counter() - start)
+    finally:
+        await entity.async_will_remove_from_hass()
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f'{"press_button":<24} p50 {percentiles[49] * 1e3:6.2f} ms  p99 {percentiles[98] * 1e3:6.2f} ms')
+
+
+async def async_until_answered(supervisor: LircdSupervisor):
+    """Retry VERSION until lircd answers; returns the seconds it took."""
+    start = time.perf_counter()
+    while True:
+        try:
+            await supervisor.async_version()
+            return time.perf_counter() - start
+        except (OSError, LircdError, TimeoutError):
+            # Failing fast does not yield, so let the supervisor run
+            await asyncio.sleep(0)
+
+
+async def async_bench_reconnect(lircd: FakeLircd):
+    """Time from lircd coming back to a command getting through again."""
+    supervisor = LircdSupervisor(LircdClient(lircd.path))
+    supervisor.start()
+    try:
+        await supervisor.async_version()
+        lircd.disconnect()
+        dropped = await async_until_answered(supervisor)
+        await lircd.async_stop()
+        await asyncio.sleep(RESTART_DOWNTIME)
+        await lircd.async_start()
+        restarted = await async_until_answered(supervisor)
+    finally:
+        await supervisor.async_close()
+    print(f'{"recover dropped":<24} {dropped * 1e3:8.1f} ms')
+    print(f'{"recover restarted":<24} {restarted * 1e3:8.1f} ms  (after {RESTART_DOWNTIME:.1f} s down)')
+
+
+async def async_main(count=2000):
+    """Run once against an instant lircd, showing the overhead of the
+    client, and once with every IR frame taking NEC_FRAME_TIME, as a real
+    blaster does."""
+    for transmit_time, runs in ((0.0, count), (NEC_FRAME_TIME, AIRTIME_COUNT)):
+        print(f'-- {transmit_time * 1e3:.0f} ms per IR frame')
+        path = os.path.join(tempfile.mkdtemp(), 'lircd')
+        lircd = FakeLircd(path, transmit_time, remotes=BENCH_REMOTES)
+        await lircd.async_start()
+        try:
+            await async_bench_throughput(path, runs)
+            await async_bench_press_button(path, max(runs // 4, 2))
+            if not transmit_time:
+                # Reconnecting never waits for airtime
+                await async_bench_reconnect(lircd)
+        finally:
+            await lircd.async_stop()
+            os.unlink(path)
+
+
+def main():
+    asyncio.run(async_main())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Unix socket stand-in for lircd, for benchmarks and manual testing.
+
+Answers the reply protocol like the real daemon: sends are transmitted one
+at a time across all clients and only answered once their modelled IR
+airtime has passed. Run from the repository root:
+
+    python -m custom_components.a_lirc.fake_lircd /tmp/lircd [airtime]
+"""
+
+import asyncio
+import sys
+
+FAKE_LIRCD_VERSION = '0.10.1-fake'
+
+
+class FakeLircd:
+    """In-process lircd answering on path.
+
+    transmit_time is the airtime of one IR frame; a SEND_ONCE with a
+    repeat count takes one frame per repeat on top. Keys in fail_keys, and
+    the next fail_next sends, are answered with ERROR. disconnect() drops
+    every client, as a crashing or restarting lircd would.
+    """
+
+    def __init__(self, path, transmit_time=0.0, remotes=None):
+        self.path = path
+        self.transmit_time = transmit_time
+        # remote -> key names, for LIST and for rejecting unknown keys;
+        # None accepts anything
+        self.remotes = remotes
+        self.fail_keys = set()
+        self.fail_next = 0
+        self.commands = []
+        self._server = None
+        self._writers = set()
+        self._handlers = set()
+        self._transmit_lock = asyncio.Lock()
+
+    async def async_start(self):
+        self._server = await asyncio.start_unix_server(self._async_handle, self.path)
+
+    async def async_stop(self):
+        if self._server is not None:
+            self._server.close()
+            self.disconnect()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def disconnect(self):
+        for writer in list(self._writers):
+            writer.transport.abort()
+        self._writers.clear()
+
+    def broadcast(self, line):
+        """Send a line outside any reply, like a decoded button press."""
+        for writer in self._writers:
+            writer.write(line.encode() + b'\n')
+
+    async def _async_handle(self, reader, writer):
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        self._writers.add(writer)
+        try:
+            while line := await reader.readline():
+                command = line.decode(errors='replace').strip()
+                if not command:
+                    continue
+                self.commands.append(command)
+                success, data = await self._async_execute(command.split())
+                reply = ['BEGIN', command, 'SUCCESS' if success else 'ERROR']
+                if data:
+                    reply += ['DATA', str(len(data)), *data]
+                reply.append('END')
+                writer.write(('\n'.join(reply) + '\n').encode())
+        except ConnectionError:
+            pass
+        finally:
+            self._handlers.discard(handler)
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _async_execute(self, words):
+        directive = words[0].upper()
+        args = words[1:]
+        if directive == 'VERSION':
+            return True, [FAKE_LIRCD_VERSION]
+        if directive == 'LIST':
+            if not args:
+                return True, list(self.remotes or ())
+            keys = (self.remotes or {}).get(args[0])
+            if keys is None:
+                return False, [f'unknown remote: "{args[0]}"']
+            return True, [f'{code:016x} {key}' for code, key in enumerate(keys)]
+        if directive in ('SEND_ONCE', 'SEND_START', 'SEND_STOP'):
+            if len(args) < 2:
+                return False, ['bad send packet']
+            remote, key = args[:2]
+            if self.remotes is not None:
+                if remote not in self.remotes:
+                    return False, [f'unknown remote: "{remote}"']
+                if key not in self.remotes[remote]:
+                    return False, [f'unknown command: "{key}"']
+            if key in self.fail_keys:
+                return False, ['transmission failed']
+            if self.fail_next:
+                self.fail_next -= 1
+                return False, ['transmission failed']
+            if directive == 'SEND_ONCE':
+                frames = 1 + (int(args[2]) if len(args) > 2 else 0)
+                async with self._transmit_lock:
+                    if self.transmit_time:
+                        await asyncio.sleep(self.transmit_time * frames)
+            return True, []
+        return False, [f'unknown directive: "{words[0]}"']
+
+
+async def async_main(path, transmit_time=0.0):
+    lircd = FakeLircd(path, transmit_time)
+    await lircd.async_start()
+    print(f'fake lircd listening on {path}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await lircd.async_stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(async_main(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else 0.0))
@@ -0,0 +1,230 @@
+"""The remotes lircd knows and their keys.
+
+Read from lircd.conf files when they are reachable from Home Assistant, or
+else asked from lircd with LIST. Either way the result is cached in
+Home Assistant's storage, so setup neither re-parses nor waits for lircd:
+cached files are re-read once their size or mtime changed, and remote
+entities refresh the keymap in place in the background when lircd reloads
+its config (SIGHUP) or, for a LIST keymap, whenever lircd comes back.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Iterable
+
+from homeassistant.helpers.storage import Store
+
+from .lircd import LircdCommands, LircdError, async_acquire_transport, async_release_transport
+
+_LOGGER = logging.getLogger(__name__)
+
+# hass.data key of the loaded keymaps, by lircd socket path
+DATA_LIRC_KEYMAPS = 'a_lirc_keymaps'
+
+KEYMAP_STORAGE_KEY = 'a_lirc_keymap'
+KEYMAP_STORAGE_VERSION = 1
+
+LIRCD_CONF_SUFFIX = '.conf'
+
+
+def parse_lircd_conf(text) -> dict[str, list[str]]:
+    """Remote name -> key names, for every remote defined in text."""
+    remotes = {}
+    remote = None
+    section = None
+    for line in text.splitlines():
+        words = line.split('#', 1)[0].split()
+        if not words:
+            continue
+        if words[0] == 'begin' and len(words) > 1:
+            if words[1] == 'remote':
+                remote = None
+            else:
+                section = words[1]
+        elif words[0] == 'end' and len(words) > 1:
+            if words[1] == 'remote':
+                remote = None
+            section = None
+        elif section == 'codes':
+            if remote is not None and len(words) > 1:
+                remotes[remote].append(words[0])
+        elif section == 'raw_codes':
+            if remote is not None and words[0] == 'name' and len(words) > 1:
+                remotes[remote].append(words[1])
+        elif section is None and words[0] == 'name' and len(words) > 1:
+            remote = words[1]
+            remotes.setdefault(remote, [])
+    return remotes
+
+
+def find_conf_files(config_files: Iterable[str]) -> list[str]:
+    """config_files with directories expanded to the .conf files in them."""
+    paths = []
+    for path in config_files:
+        if os.path.isdir(path):
+            paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.endswith(LIRCD_CONF_SUFFIX)))
+        else:
+            paths.append(path)
+    return paths
+
+
+def conf_files_signature(config_files: Iterable[str]):
+    """What the cache of config_files is valid for, without reading them."""
+    signature = []
+    for path in find_conf_files(config_files):
+        stat = os.stat(path)
+        signature.append([path, stat.st_mtime_ns, stat.st_size])
+    return signature
+
+
+def read_conf_files(config_files: Iterable[str]) -> dict[str, list[str]]:
+    remotes = {}
+    for path in find_conf_files(config_files):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            remotes.update(parse_lircd_conf(f.read()))
+    return remotes
+
+
+async def async_list_remotes(lircd: LircdCommands) -> dict[str, list[str]]:
+    """Ask lircd for its remotes and their keys with LIST."""
+    remotes = {}
+    for remote in await lircd.async_list():
+        # One "<code> <key>" line per key
+        remotes[remote] = [line.split()[-1] for line in await lircd.async_list(remote) if line.strip()]
+    return remotes
+
+
+class LircKeymap:
+    """Key names of several remotes, indexed by key.
+
+    Works as a container of every known key, so vol.In(keymap) keeps
+    validating against the current keys after a reload.
+    """
+
+    def __init__(self, remotes: dict[str, Iterable[str]]):
+        self.remotes = {}
+        # key -> remotes that have it
+        self.index = {}
+        self.update(remotes)
+
+    def update(self, remotes: dict[str, Iterable[str]]):
+        self.remotes = {remote: tuple(keys) for remote, keys in remotes.items()}
+        index = {}
+        for remote, keys in self.remotes.items():
+            for key in keys:
+                index.setdefault(key, []).append(remote)
+        self.index = index
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        return iter(sorted(self.index))
+
+    def __len__(self):
+        return len(self.index)
+
+    def has_key(self, remote, key):
+        return key in self.remotes.get(remote, ())
+
+    def find_remote(self, keys: Iterable[str]) -> str | None:
+        """The first remote that has every one of keys."""
+        keys = set(keys)
+        for remote in sorted(self.remotes):
+            if keys.issubset(self.remotes[remote]):
+                return remote
+        return None
+
+
+class KeymapLoader:
+    """Loads the keymap of one lircd socket through the storage cache."""
+
+    def __init__(self, hass, path, config_files: Iterable[str] = ()):
+        self.hass = hass
+        self.path = path
+        self.config_files = list(config_files)
+        self.keymap = None
+        self._store = Store(hass, KEYMAP_STORAGE_VERSION, KEYMAP_STORAGE_KEY)
+        self._refreshing = None
+        self._refresh_again = False
+
+    async def _async_signature(self):
+        if self.config_files:
+            return await self.hass.async_add_executor_job(conf_files_signature, self.config_files)
+        return ['lircd', self.path]
+
+    async def _async_read(self):
+        if self.config_files:
+            return await self.hass.async_add_executor_job(read_conf_files, self.config_files)
+        transport = async_acquire_transport(self.hass, self.path)
+        try:
+            return await async_list_remotes(transport)
+        finally:
+            await async_release_transport(self.hass, transport)
+
+    async def async_load(self):
+        signature = await self._async_signature()
+        cached = (await self._store.async_load() or {}).get(self.path)
+        if cached is not None and cached['signature'] == signature:
+            self.keymap = LircKeymap(cached['remotes'])
+            _LOGGER.debug('keymap for %s from cache: %d remotes', self.path, len(self.keymap.remotes))
+        else:
+            self.keymap = LircKeymap(await self._async_read())
+            await self._async_save(signature)
+        return self
+
+    async def async_refresh(self):
+        """Re-read the source and update the keymap in place."""
+        signature = await self._async_signature()
+        self.keymap.update(await self._async_read())
+        await self._async_save(signature)
+        _LOGGER.info('keymap for %s reloaded: %d remotes', self.path, len(self.keymap.remotes))
+
+    def refresh(self):
+        """Refresh in the background, as after lircd's SIGHUP.
+
+        A refresh requested while one runs makes it run once more, as the
+        running one may have read the old config.
+        """
+        if self._refreshing is None:
+            self._refreshing = self.hass.async_create_task(self._async_refresh_logged())
+        else:
+            self._refresh_again = True
+
+    async def _async_save(self, signature):
+        data = await self._store.async_load() or {}
+        data[self.path] = {'signature': signature, 'remotes': self.keymap.remotes}
+        await self._store.async_save(data)
+
+    async def _async_refresh_logged(self):
+        try:
+            while True:
+                self._refresh_again = False
+                try:
+                    await self.async_refresh()
+                except (OSError, LircdError, TimeoutError) as e:
+                    _LOGGER.warning('cannot reload keymap for %s: %r', self.path, e)
+                if not self._refresh_again:
+                    break
+        finally:
+            self._refreshing = None
+
+
+async def async_load_keymap(hass, path, config_files: Iterable[str] = ()) -> KeymapLoader:
+    """The loaded keymap of the lircd at path, shared by every platform.
+
+    The first caller's config_files decide where it is read from.
+    """
+    loaders = hass.data.setdefault(DATA_LIRC_KEYMAPS, {})
+    loading = loaders.get(path)
+    if loading is None:
+        loading = loaders[path] = asyncio.ensure_future(KeymapLoader(hass, path, config_files).async_load())
+    try:
+        return await asyncio.shield(loading)
+    except (OSError, LircdError, TimeoutError):
+        if loaders.get(path) is loading:
+            # Let the next platform setup try again
+            del loaders[path]
+        raise
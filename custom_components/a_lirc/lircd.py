@@ -0,0 +1,481 @@
+"""asyncio client for the lircd socket protocol.
+
+Commands are written as single lines and may be pipelined; lircd answers
+each one in order with a BEGIN/END packet:
+
+    BEGIN
+    SEND_ONCE nakaw Power
+    SUCCESS
+    END
+
+Anything outside a reply packet is a broadcast: a decoded button press, or
+a SIGHUP packet after lircd reloaded its config.
+
+Remote entities share one LircdTransport per socket path through
+async_acquire_transport().
+"""
+
+import abc
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Iterable, NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# lircd only answers a send once the code has been transmitted
+LIRCD_REPLY_TIMEOUT = 5.0
+
+# Reconnect delays after lircd went away, doubling up to the maximum
+LIRCD_RECONNECT_MIN = 1.0
+LIRCD_RECONNECT_MAX = 60.0
+# How often a quiet connection is checked with VERSION, and how long the
+# answer may take
+LIRCD_HEALTH_INTERVAL = 30.0
+LIRCD_HEALTH_TIMEOUT = 2.0
+# Commands held while lircd is away: how many, and for how long each
+LIRCD_QUEUE_MAX = 16
+LIRCD_QUEUE_TIMEOUT = 5.0
+
+# hass.data key of the transports by socket path
+DATA_LIRCD_TRANSPORTS = 'lircd_transports'
+
+
+class LircdError(Exception):
+    """lircd answered a command with ERROR."""
+
+
+class LircdUnavailableError(LircdError):
+    """lircd could not be reached in time."""
+
+
+class LircdReply(NamedTuple):
+    command: str
+    success: bool
+    data: list[str]
+
+
+class LircdPending(NamedTuple):
+    command: str
+    future: asyncio.Future
+
+
+class LircdCommands(abc.ABC):
+    """The lircd commands, on top of a subclass's async_command()."""
+
+    @abc.abstractmethod
+    async def async_command(self, *words, timeout=LIRCD_REPLY_TIMEOUT) -> LircdReply:
+        """Send one command and return its reply."""
+
+    async def async_send_once(self, remote, key, count=0):
+        """Send key once, plus count repeats."""
+        if count:
+            return await self.async_command('SEND_ONCE', remote, key, count)
+        return await self.async_command('SEND_ONCE', remote, key)
+
+    async def async_send_start(self, remote, key):
+        return await self.async_command('SEND_START', remote, key)
+
+    async def async_send_stop(self, remote, key):
+        return await self.async_command('SEND_STOP', remote, key)
+
+    async def async_list(self, remote=None) -> list[str]:
+        """The remotes lircd knows, or remote's "<code> <key>" lines."""
+        if remote is None:
+            return (await self.async_command('LIST')).data
+        return (await self.async_command('LIST', remote)).data
+
+    async def async_version(self, timeout=LIRCD_REPLY_TIMEOUT) -> str:
+        reply = await self.async_command('VERSION', timeout=timeout)
+        return reply.data[0] if reply.data else ''
+
+
+class LircdClient(LircdCommands):
+    """One persistent connection to a lircd socket.
+
+    Connects on first use and again on the next command after the
+    connection dropped, unless connect_on_demand is off, as when a
+    LircdSupervisor reconnects it: commands then fail with ConnectionError
+    while it is down. Commands in flight when it drops fail the same way.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connect_on_demand = True
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._connect_lock = asyncio.Lock()
+        self._pending = deque()
+        self._broadcast_listeners = []
+
+    @property
+    def connected(self):
+        return self._writer is not None
+
+    def add_broadcast_listener(self, listener: Callable[[str], None]) -> Callable[[], None]:
+        """Call listener with every broadcast line; returns a remover."""
+        self._broadcast_listeners.append(listener)
+        return lambda: self._broadcast_listeners.remove(listener)
+
+    async def async_connect(self):
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+            self._read_task = asyncio.get_running_loop().create_task(self._async_read_loop(self._reader))
+            _LOGGER.debug('connected to %s', self.path)
+
+    async def async_command(self, *words, timeout=LIRCD_REPLY_TIMEOUT) -> LircdReply:
+        """Send one command line and wait for its reply.
+
+        Raises LircdError if lircd reports failure.
+        """
+        if self._writer is None:
+            if not self.connect_on_demand:
+                raise ConnectionError(f'{self.path} disconnected')
+            await self.async_connect()
+        command = ' '.join(str(word) for word in words)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(LircdPending(command, future))
+        self._writer.write(command.encode() + b'\n')
+        async with asyncio.timeout(timeout):
+            reply = await future
+        if not reply.success:
+            raise LircdError(f'{command}: {" ".join(reply.data) or "failed"}')
+        return reply
+
+    async def async_wait_disconnected(self):
+        if self._read_task is not None:
+            await asyncio.wait((self._read_task,))
+
+    async def _async_read_loop(self, reader):
+        try:
+            while True:
+                line = await self._async_readline(reader)
+                if line == 'BEGIN':
+                    await self._async_read_packet(reader)
+                elif line:
+                    self._broadcast(line)
+        except (ConnectionError, asyncio.IncompleteReadError, EOFError) as e:
+            _LOGGER.debug('connection to %s lost: %s', self.path, e)
+        finally:
+            self._disconnected()
+
+    async def _async_read_packet(self, reader):
+        command = await self._async_readline(reader)
+        success = True
+        data = []
+        line = await self._async_readline(reader)
+        if line in ('SUCCESS', 'ERROR'):
+            success = line == 'SUCCESS'
+            line = await self._async_readline(reader)
+        if line == 'DATA':
+            count = int(await self._async_readline(reader))
+            data = [await self._async_readline(reader) for _ in range(count)]
+            line = await self._async_readline(reader)
+        if line != 'END':
+            _LOGGER.warning('malformed reply from %s to %s: %s', self.path, command, line)
+        if command == 'SIGHUP':
+            self._broadcast(command)
+            return
+        if not self._pending:
+            _LOGGER.debug('unexpected reply from %s to %s', self.path, command)
+            return
+        pending = self._pending.popleft()
+        if pending.command != command:
+            _LOGGER.warning('reply from %s to %s while waiting for %s', self.path, command, pending.command)
+        if not pending.future.done():
+            pending.future.set_result(LircdReply(command, success, data))
+
+    @staticmethod
+    async def _async_readline(reader):
+        line = await reader.readline()
+        if not line:
+            raise EOFError('lircd closed the connection')
+        return line.decode(errors='replace').rstrip('\n')
+
+    def _broadcast(self, line):
+        for listener in list(self._broadcast_listeners):
+            listener(line)
+
+    def _disconnected(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        while self._pending:
+            future = self._pending.popleft().future
+            if not future.done():
+                future.set_exception(ConnectionError(f'{self.path} disconnected'))
+
+    async def async_close(self):
+        if self._read_task is not None:
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except asyncio.CancelledError:
+                pass
+        self._disconnected()
+
+
+class LircdSupervisor(LircdCommands):
+    """Keeps a LircdClient connected and reports whether lircd is usable.
+
+    Reconnects in the background with exponential backoff and checks a
+    quiet connection with VERSION. Commands issued while lircd is away wait
+    for it, up to LIRCD_QUEUE_MAX of them for LIRCD_QUEUE_TIMEOUT each, and
+    then fail with LircdUnavailableError.
+    """
+
+    def __init__(self, client: LircdClient):
+        self.client = client
+        # Reconnecting is left to _async_run, so a command issued between a
+        # drop and the availability change fails at once
+        client.connect_on_demand = False
+        self.available = False
+        self._available_event = asyncio.Event()
+        self._waiting = 0
+        self._task = None
+        self._availability_listeners = []
+
+    def add_availability_listener(self, listener: Callable[[bool], None]) -> Callable[[], None]:
+        """Call listener with every availability change; returns a remover."""
+        self._availability_listeners.append(listener)
+        return lambda: self._availability_listeners.remove(listener)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._async_run())
+
+    async def async_command(self, *words, timeout=LIRCD_REPLY_TIMEOUT) -> LircdReply:
+        if not self.available:
+            await self._async_wait_available()
+        return await self.client.async_command(*words, timeout=timeout)
+
+    async def _async_wait_available(self):
+        if self._waiting >= LIRCD_QUEUE_MAX:
+            raise LircdUnavailableError(f'{self.client.path} unavailable, {self._waiting} commands waiting')
+        self.start()
+        self._waiting += 1
+        try:
+            async with asyncio.timeout(LIRCD_QUEUE_TIMEOUT):
+                await self._available_event.wait()
+        except TimeoutError:
+            raise LircdUnavailableError(f'{self.client.path} unavailable') from None
+        finally:
+            self._waiting -= 1
+
+    def _set_available(self, available):
+        if available == self.available:
+            return
+        self.available = available
+        if available:
+            self._available_event.set()
+        else:
+            self._available_event.clear()
+        for listener in list(self._availability_listeners):
+            listener(available)
+
+    async def _async_run(self):
+        delay = LIRCD_RECONNECT_MIN
+        while True:
+            try:
+                await self.client.async_connect()
+                version = await self.client.async_version(timeout=LIRCD_HEALTH_TIMEOUT)
+            except (OSError, LircdError, TimeoutError) as e:
+                _LOGGER.debug('cannot reach %s: %r, retrying in %.0f s', self.client.path, e, delay)
+                await self.client.async_close()
+                self._set_available(False)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LIRCD_RECONNECT_MAX)
+                continue
+            _LOGGER.info('connected to lircd %s at %s', version, self.client.path)
+            delay = LIRCD_RECONNECT_MIN
+            self._set_available(True)
+            await self._async_watch()
+            self._set_available(False)
+
+    async def _async_watch(self):
+        """Return once the connection drops or stops answering."""
+        while True:
+            try:
+                async with asyncio.timeout(LIRCD_HEALTH_INTERVAL):
+                    await self.client.async_wait_disconnected()
+                return
+            except TimeoutError:
+                pass
+            try:
+                await self.client.async_version(timeout=LIRCD_HEALTH_TIMEOUT)
+            except (OSError, LircdError, TimeoutError) as e:
+                _LOGGER.warning('%s failed its health check: %r', self.client.path, e)
+                await self.client.async_close()
+                return
+
+    async def async_close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.client.async_close()
+        self._set_available(False)
+
+
+class LircdMetrics:
+    """Command outcomes and queueing on one lircd socket."""
+
+    __slots__ = ('sent', 'failed', 'latency_total', 'latency_max', 'in_flight', 'queue_depth', 'queue_max')
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        # Commands waiting for their reply, and sequences waiting for or
+        # holding the socket
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.queue_max = 0
+
+    def record(self, latency, ok):
+        self.sent += 1
+        if not ok:
+            self.failed += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def as_dict(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'latency_avg_ms': self.latency_total / self.sent * 1000 if self.sent else None,
+            'latency_max_ms': self.latency_max * 1000,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'queue_max': self.queue_max,
+        }
+
+
+class LircdTransport(LircdCommands):
+    """A supervised lircd socket shared by every remote that uses it.
+
+    Single commands pipeline freely; async_sequence() holds the socket so
+    one remote's sequence is never interleaved with another's.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = LircdSupervisor(LircdClient(path))
+        self.metrics = LircdMetrics()
+        self.users = 0
+        self._lock = asyncio.Lock()
+
+    async def async_command(self, *words, timeout=LIRCD_REPLY_TIMEOUT) -> LircdReply:
+        metrics = self.metrics
+        metrics.in_flight += 1
+        start = time.monotonic()
+        ok = False
+        try:
+            reply = await self.connection.async_command(*words, timeout=timeout)
+            ok = True
+            return reply
+        finally:
+            metrics.in_flight -= 1
+            metrics.record(time.monotonic() - start, ok)
+
+    @asynccontextmanager
+    async def async_sequence(self):
+        metrics = self.metrics
+        metrics.queue_depth += 1
+        metrics.queue_max = max(metrics.queue_max, metrics.queue_depth)
+        try:
+            async with self._lock:
+                yield self
+        finally:
+            metrics.queue_depth -= 1
+
+
+def async_acquire_transport(hass, path) -> LircdTransport:
+    """Get the shared transport for path, connecting it on first use."""
+    transports = hass.data.setdefault(DATA_LIRCD_TRANSPORTS, {})
+    transport = transports.get(path)
+    if transport is None:
+        transport = transports[path] = LircdTransport(path)
+    transport.users += 1
+    transport.connection.start()
+    return transport
+
+
+async def async_release_transport(hass, transport: LircdTransport):
+    """Drop one user of transport, closing it after the last."""
+    transport.users -= 1
+    if transport.users == 0:
+        del hass.data[DATA_LIRCD_TRANSPORTS][transport.path]
+        await transport.connection.async_close()
+
+
+class IRStep(NamedTuple):
+    key: str
+    # Extra repeats folded into the same SEND_ONCE
+    count: int = 0
+    # Held with SEND_START/SEND_STOP for this long instead
+    hold: float = 0.0
+
+
+def plan_ir_steps(commands: Iterable[str], num_repeats=1, hold_secs=0.0, repeatable=frozenset()):
+    """Turn a send_command call into lircd steps.
+
+    Consecutive presses of a key in repeatable fold into one step.
+    """
+    commands = list(commands)
+    steps = []
+    for _ in range(num_repeats):
+        for key in commands:
+            if hold_secs:
+                steps.append(IRStep(key, hold=hold_secs))
+            elif steps and steps[-1].key == key and not steps[-1].hold and key in repeatable:
+                steps[-1] = steps[-1]._replace(count=steps[-1].count + 1)
+            else:
+                steps.append(IRStep(key))
+    return steps
+
+
+class IRBlaster:
+    """Sends one lircd remote's keys through a shared transport."""
+
+    def __init__(self, transport: LircdTransport, remote):
+        self.transport = transport
+        self.remote = remote
+
+    async def async_send_steps(self, steps: Iterable[IRStep], delay_secs,
+                               on_sent: Callable[[IRStep], None] | None = None):
+        """Send steps with delay_secs between one finishing and the next.
+
+        Holds are timed from before SEND_START, so the round trip counts
+        toward the hold rather than adding to it. on_sent is called with
+        every step lircd confirmed, so a caller knows how far a failed
+        sequence got.
+        """
+        loop = asyncio.get_running_loop()
+        next_send = 0.0
+        async with self.transport.async_sequence() as transport:
+            for step in steps:
+                await asyncio.sleep(next_send - loop.time())
+                if step.hold:
+                    release = loop.time() + step.hold
+                    await transport.async_send_start(self.remote, step.key)
+                    try:
+                        await asyncio.sleep(release - loop.time())
+                    finally:
+                        await transport.async_send_stop(self.remote, step.key)
+                else:
+                    await transport.async_send_once(self.remote, step.key, step.count)
+                if on_sent is not None:
+                    on_sent(step)
+                next_send = loop.time() + delay_secs
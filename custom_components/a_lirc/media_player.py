@@ -0,0 +1,113 @@
+import logging
+
+from homeassistant.components.media_player import (
+    PLATFORM_SCHEMA,
+    MediaPlayerEntity,
+    MediaPlayerEntityFeature,
+    MediaPlayerState,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+
+from .lircd import IRBlaster, async_acquire_transport, async_release_transport
+from .nakamichi import MODEL_KEYS, NAKAMICHI_VOLUME_MAX, SOUND_MODE_KEYS, SOURCE_KEYS, async_get_model
+from .remote import PLATFORM_SCHEMA as REMOTE_PLATFORM_SCHEMA, async_load_platform_keymap
+
+_LOGGER = logging.getLogger(__name__)
+
+# The same socket and config files as the remote platform
+PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(REMOTE_PLATFORM_SCHEMA.schema)
+
+
+class NakamichiSoundBar(MediaPlayerEntity):
+    """The sound bar as a media player, driven from its estimated state.
+
+    Every call plans the keys from the estimate to the requested state and
+    sends them as one sequence.
+    """
+
+    _attr_supported_features = \
+        MediaPlayerEntityFeature.TURN_ON | \
+        MediaPlayerEntityFeature.TURN_OFF | \
+        MediaPlayerEntityFeature.VOLUME_STEP | \
+        MediaPlayerEntityFeature.VOLUME_SET | \
+        MediaPlayerEntityFeature.VOLUME_MUTE | \
+        MediaPlayerEntityFeature.SELECT_SOURCE | \
+        MediaPlayerEntityFeature.SELECT_SOUND_MODE
+    _attr_source_list = list(SOURCE_KEYS)
+    _attr_sound_mode_list = list(SOUND_MODE_KEYS)
+    _attr_volume_step = 1 / NAKAMICHI_VOLUME_MAX
+    _attr_unique_id = 'nakamichi_sound_bar'
+
+    def __init__(self, path, remote):
+        self._attr_available = False
+        self.path = path
+        self.remote = remote
+        self.irb = None
+        self.model = None
+
+    async def async_added_to_hass(self) -> None:
+        self.irb = IRBlaster(async_acquire_transport(self.hass, self.path), self.remote)
+        connection = self.irb.transport.connection
+        self._attr_available = connection.available
+        self.async_on_remove(connection.add_availability_listener(self._availability_changed))
+        self.model = await async_get_model(self.hass)
+        self.async_on_remove(self.model.add_listener(self._model_changed))
+        self._model_changed(write=False)
+
+    async def async_will_remove_from_hass(self) -> None:
+        await async_release_transport(self.hass, self.irb.transport)
+
+    def _availability_changed(self, available: bool):
+        self._attr_available = available
+        self.async_write_ha_state()
+
+    def _model_changed(self, write=True):
+        state = self.model.state
+        self._attr_state = None if state.power is None else \
+            MediaPlayerState.ON if state.power else MediaPlayerState.OFF
+        self._attr_volume_level = None if state.volume is None else state.volume / NAKAMICHI_VOLUME_MAX
+        self._attr_is_volume_muted = state.muted
+        self._attr_source = state.source
+        self._attr_sound_mode = state.sound_mode
+        if write:
+            self.async_write_ha_state()
+
+    async def async_turn_on(self) -> None:
+        await self.model.async_set(self.irb, power=True)
+
+    async def async_turn_off(self) -> None:
+        await self.model.async_set(self.irb, power=False)
+
+    async def async_set_volume_level(self, volume: float) -> None:
+        await self.model.async_set(self.irb, volume=round(volume * NAKAMICHI_VOLUME_MAX))
+
+    async def async_volume_up(self) -> None:
+        await self.model.async_send_keys(self.irb, ['VolPlus'])
+
+    async def async_volume_down(self) -> None:
+        await self.model.async_send_keys(self.irb, ['VolMinus'])
+
+    async def async_mute_volume(self, mute: bool) -> None:
+        await self.model.async_set(self.irb, muted=mute)
+
+    async def async_select_source(self, source: str) -> None:
+        await self.model.async_set(self.irb, power=True, source=source)
+
+    async def async_select_sound_mode(self, sound_mode: str) -> None:
+        await self.model.async_set(self.irb, power=True, sound_mode=sound_mode)
+
+
+async def async_setup_platform(
+        hass: HomeAssistant,
+        config: ConfigType,
+        async_add_entities: AddEntitiesCallback,
+        discovery_info: DiscoveryInfoType | None = None,
+) -> None:
+    loader = await async_load_platform_keymap(hass, config)
+    remote = loader.keymap.find_remote(MODEL_KEYS)
+    if remote is None:
+        _LOGGER.warning('no remote of %s has the sound bar keys', loader.path)
+        return
+    async_add_entities([NakamichiSoundBar(loader.path, remote)])
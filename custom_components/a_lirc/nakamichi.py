@@ -0,0 +1,256 @@
+"""Estimated state of the Nakamichi sound bar, tracked from the IR keys sent.
+
+The bar never reports anything back, so the state is inferred: a field is
+None until a key has pinned it down, and keys pressed with the bar's own
+remote go unnoticed. The estimate is kept in Home Assistant's storage, so
+it survives restarts.
+"""
+
+import asyncio
+import logging
+from typing import Callable, Iterable, NamedTuple
+
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.storage import Store
+
+from .lircd import IRBlaster, IRStep, LircdError, plan_ir_steps
+
+_LOGGER = logging.getLogger(__name__)
+
+# hass.data key of the shared NakamichiModel
+DATA_NAKAMICHI_MODEL = 'a_lirc_nakamichi'
+
+NAKAMICHI_STORAGE_KEY = 'a_lirc_nakamichi'
+NAKAMICHI_STORAGE_VERSION = 1
+# Seconds a state change waits to be saved, so a key sequence saves once
+NAKAMICHI_SAVE_DELAY = 10
+
+# Volume steps from silent to full on the bar's display
+NAKAMICHI_VOLUME_MAX = 60
+
+# Gap the bar needs between two different keys
+NAKAMICHI_KEY_DELAY = 0.3
+
+# Keys the sound bar steps once per received repeat frame, so consecutive
+# presses can go out as one SEND_ONCE with a repeat count. Toggles like
+# Power would read repeat frames as a single held press.
+REPEATABLE_KEYS = frozenset([
+    'VolPlus',
+    'VolMinus',
+    'BassPlus',
+    'BassMinus',
+    'TreblePlus',
+    'TrebleMinus',
+    'CenterPlus',
+    'CenterMinus',
+    'SsePlus',
+    'SseMinus',
+    'SurroundSidePlus',
+    'SurroundSideMinus',
+    'SurroundBackPlus',
+    'SurroundBackMinus',
+])
+
+# Source or sound mode name -> the key selecting it directly
+SOURCE_KEYS = {
+    'TV': 'TV',
+    'HDMI 2': 'HDMI2',
+    'HDMI 3': 'HDMI3',
+    'HDMI 4': 'HDMI4',
+    'Optical': 'Opt',
+    'Coaxial': 'Coax',
+    'Bluetooth': 'Bt',
+    'AUX': 'Aux',
+    'USB': 'USB',
+}
+SOUND_MODE_KEYS = {
+    'Music': 'Music',
+    'Movie': 'Movie',
+    'Game': 'Game',
+    'No DSP': 'NoDSP',
+    'All Channel Stereo': 'AllChStereo',
+    'Surround': 'Surround',
+}
+# Every key the model sends; the lircd remote having them all is the bar's
+MODEL_KEYS = frozenset(['Power', 'Mute', 'VolPlus', 'VolMinus', *SOURCE_KEYS.values(), *SOUND_MODE_KEYS.values()])
+SOURCE_BY_KEY = {key: source for source, key in SOURCE_KEYS.items()}
+SOUND_MODE_BY_KEY = {key: mode for mode, key in SOUND_MODE_KEYS.items()}
+
+
+class NakamichiState(NamedTuple):
+    power: bool | None = None
+    volume: int | None = None
+    muted: bool | None = False
+    source: str | None = None
+    sound_mode: str | None = None
+
+
+def apply_key(state: NakamichiState, key) -> NakamichiState:
+    """The state after the bar received key once."""
+    if key == 'Power':
+        return state._replace(power=None if state.power is None else not state.power)
+    if not state.power:
+        # Everything else is ignored while in standby, and whether the bar
+        # is in standby is unknown
+        return state
+    if key in ('VolPlus', 'VolMinus'):
+        volume = state.volume
+        if volume is not None:
+            volume = min(max(volume + (1 if key == 'VolPlus' else -1), 0), NAKAMICHI_VOLUME_MAX)
+        return state._replace(volume=volume, muted=False)
+    if key == 'Mute':
+        return state._replace(muted=None if state.muted is None else not state.muted)
+    if key in SOURCE_BY_KEY:
+        return state._replace(source=SOURCE_BY_KEY[key])
+    if key in SOUND_MODE_BY_KEY:
+        return state._replace(sound_mode=SOUND_MODE_BY_KEY[key])
+    return state
+
+
+def plan_keys(state: NakamichiState, power=None, volume=None, muted=None, source=None, sound_mode=None):
+    """The shortest key list taking the bar from state to the given targets.
+
+    Targets left as None keep their current value. An unknown volume is
+    first pinned down by stepping all the way to silent, the end that is
+    safe to overshoot into.
+
+    Power is a toggle, so nothing is planned while power is unknown, and a
+    bar in standby ignores every other key: both raise HomeAssistantError
+    rather than plan keys that would go unheard or do the opposite.
+    """
+    if power is None and volume is None and muted is None and source is None and sound_mode is None:
+        return []
+    if state.power is None:
+        raise HomeAssistantError('sound bar power is unknown')
+    if power is False:
+        return ['Power'] if state.power else []
+    if not state.power and not power:
+        raise HomeAssistantError('sound bar is off')
+    keys = [] if state.power else ['Power']
+    if source is not None and source != state.source:
+        keys.append(SOURCE_KEYS[source])
+    if sound_mode is not None and sound_mode != state.sound_mode:
+        keys.append(SOUND_MODE_KEYS[sound_mode])
+    unmuted = False
+    if volume is not None and volume != state.volume:
+        current = state.volume
+        if current is None:
+            keys.extend(['VolMinus'] * NAKAMICHI_VOLUME_MAX)
+            current = 0
+        keys.extend([('VolPlus' if volume > current else 'VolMinus')] * abs(volume - current))
+        unmuted = True
+    is_muted = False if unmuted else state.muted
+    if muted is not None and muted != is_muted:
+        if is_muted is None:
+            # Mute is a toggle too
+            raise HomeAssistantError('sound bar mute is unknown')
+        keys.append('Mute')
+    return keys
+
+
+class NakamichiModel:
+    """The estimated sound bar state shared by the a_lirc entities."""
+
+    def __init__(self, store: Store = None):
+        self.state = NakamichiState()
+        self._listeners = []
+        self._store = store
+
+    async def async_load(self):
+        data = await self._store.async_load() if self._store is not None else None
+        if data:
+            self.state = NakamichiState(**{field: data[field] for field in NakamichiState._fields if field in data})
+            _LOGGER.debug('sound bar restored as %s', self.state)
+        return self
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        _LOGGER.debug('sound bar now %s', state)
+        self.state = state
+        if self._store is not None:
+            self._store.async_delay_save(self.state._asdict, NAKAMICHI_SAVE_DELAY)
+        for listener in list(self._listeners):
+            listener()
+
+    def assume_power(self, power: bool):
+        """Take power as known, as when the bar's own remote was used."""
+        self.observe(power=power)
+
+    def observe_steps(self, steps: Iterable[IRStep]):
+        """Track steps that reached lircd."""
+        state = self.state
+        for step in steps:
+            if step.hold:
+                # The number of repeats a hold produces is unknown
+                state = apply_key(state, step.key)
+                if step.key in ('VolPlus', 'VolMinus'):
+                    state = state._replace(volume=None)
+                continue
+            presses = step.count + 1
+            if state.power and step.key in ('VolPlus', 'VolMinus') and presses >= NAKAMICHI_VOLUME_MAX:
+                # A full sweep pins down even an unknown volume
+                state = state._replace(volume=NAKAMICHI_VOLUME_MAX if step.key == 'VolPlus' else 0, muted=False)
+                continue
+            for _ in range(presses):
+                state = apply_key(state, step.key)
+        self._set_state(state)
+
+    def observe_keys(self, keys: Iterable[str]):
+        """Track keys the bar got some other way, as over HDMI-CEC."""
+        state = self.state
+        for key in keys:
+            state = apply_key(state, key)
+        self._set_state(state)
+
+    def observe(self, **fields):
+        """Take fields of the state as known."""
+        self._set_state(self.state._replace(**fields))
+
+    def forget(self, keys: Iterable[str] = ()):
+        """Drop what a failed send of keys may have left uncertain.
+
+        Power and mute are toggles, so they are only kept when none of keys
+        could have flipped them.
+        """
+        keys = set(keys)
+        state = self.state
+        self._set_state(NakamichiState(
+            power=None if 'Power' in keys else state.power,
+            muted=None if keys & {'Mute', 'VolPlus', 'VolMinus'} else state.muted))
+
+    async def async_send_steps(self, blaster: IRBlaster, steps: list[IRStep], delay_secs):
+        """Send steps as one sequence and track the ones that got through."""
+        sent = []
+        try:
+            await blaster.async_send_steps(steps, delay_secs, sent.append)
+        except (OSError, LircdError, TimeoutError, asyncio.CancelledError):
+            self.observe_steps(sent)
+            # The step that failed may have been transmitted all the same
+            self.forget(step.key for step in steps[len(sent):len(sent) + 1])
+            raise
+        self.observe_steps(sent)
+
+    async def async_send_keys(self, blaster: IRBlaster, keys):
+        """Send keys as one sequence and track them."""
+        await self.async_send_steps(blaster, plan_ir_steps(keys, repeatable=REPEATABLE_KEYS), NAKAMICHI_KEY_DELAY)
+
+    async def async_set(self, blaster: IRBlaster, **targets):
+        """Move the bar to targets, as accepted by plan_keys()."""
+        keys = plan_keys(self.state, **targets)
+        if keys:
+            _LOGGER.debug('%s -> %s', targets, keys)
+            await self.async_send_keys(blaster, keys)
+
+
+async def async_get_model(hass) -> NakamichiModel:
+    """The shared model, restored from storage by the first caller."""
+    loading = hass.data.get(DATA_NAKAMICHI_MODEL)
+    if loading is None:
+        store = Store(hass, NAKAMICHI_STORAGE_VERSION, NAKAMICHI_STORAGE_KEY)
+        loading = hass.data[DATA_NAKAMICHI_MODEL] = asyncio.ensure_future(NakamichiModel(store).async_load())
+    return await asyncio.shield(loading)
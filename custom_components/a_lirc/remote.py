@@ -1,10 +1,18 @@
-import lirc
 import logging
-import socket
 from typing import Iterable
 
-from homeassistant.components.remote import RemoteEntity
-from homeassistant.core import HomeAssistant
+from homeassistant.components.remote import (
+    ATTR_DELAY_SECS,
+    ATTR_HOLD_SECS,
+    ATTR_NUM_REPEATS,
+    DEFAULT_DELAY_SECS,
+    DEFAULT_HOLD_SECS,
+    DEFAULT_NUM_REPEATS,
+    PLATFORM_SCHEMA,
+    RemoteEntity,
+)
+from homeassistant.core import HomeAssistant, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError, PlatformNotReady
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers.entity_platform import AddEntitiesCallback, async_get_current_platform
 from homeassistant.helpers.typing import DiscoveryInfoType
@@ -13,136 +21,158 @@ from homeassistant.helpers.typing import DiscoveryInfoType
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 
+from .keymap import KeymapLoader, async_load_keymap
+from .lircd import IRBlaster, IRStep, LircdError, async_acquire_transport, async_release_transport, plan_ir_steps
+from .nakamichi import MODEL_KEYS, REPEATABLE_KEYS, SOUND_MODE_KEYS, async_get_model
+
+LIRCD_SOCKET = '/lircd/lircd-nakaw'
+
+CONF_SOCKET = "socket"
+CONF_CONFIG_FILES = "config_files"
+
 SERVICE_PRESS_BUTTON = "press_button"
+SERVICE_GET_DIAGNOSTICS = "get_diagnostics"
+SERVICE_ASSUME_POWER = "assume_power"
 ATTR_BUTTON = "button"
+ATTR_POWER = "power"
 
-PRESS_BUTTON_SCHEMA = cv.make_entity_service_schema(
+PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
-        vol.Required(ATTR_BUTTON): vol.In(
-            [
-                'Power',
-                'Mute',
-                'TV',
-                'HDMI2',
-                'HDMI3',
-                'HDMI4',
-                'Opt',
-                'Coax',
-                'Bt',
-                'Aux',
-                'USB',
-                'Music',
-                'Movie',
-                'Game',
-                'Night',
-                'NoDSP',
-                'AllChStereo',
-                'Surround',
-                'Setup',
-                'InfoStop',
-                'Return',
-                'SsePlus',
-                'SseMinus',
-                'Left',
-                'Right',
-                'Enter',
-                'BassPlus',
-                'BassMinus',
-                'VolPlus',
-                'VolMinus',
-                'CenterPlus',
-                'CenterMinus',
-                'TreblePlus',
-                'TrebleMinus',
-                'SurroundSidePlus',
-                'SurroundSideMinus',
-                'SurroundBackPlus',
-                'SurroundBackMinus',
-                'SystemMemory1',
-                'SystemMemory2',
-                'SystemMemory3',
-                'BtPlayPause',
-                'BtStop',
-                'BtPrevTrack',
-                'BtNextTrack'
-            ]
-        ),
+        vol.Optional(CONF_SOCKET, default=LIRCD_SOCKET): cv.string,
+        # lircd.conf files or lircd.conf.d directories; lircd is asked
+        # with LIST when there are none
+        vol.Optional(CONF_CONFIG_FILES, default=[]): vol.All(cv.ensure_list, [cv.string]),
     }
 )
 
 
-class IRBlaster:
-    def __init__(self):
-        try:
-            self.connect_client()
-        except:
-            pass
-
-    def connect_client(self):
-        self.client = lirc.Client(
-            connection=lirc.LircdConnection(
-                address="/lircd/lircd-nakaw",
-                socket=socket.socket(socket.AF_UNIX, socket.SOCK_STREAM),
-                timeout=5.0
-            )
-        )
-
-    def send_command(self, command):
-        def inner_func():
-            self.client.send_once("nakaw", command)
-        try:
-            inner_func()
-        except Exception:
-            self.connect_client()
-            inner_func()
+_LOGGER = logging.getLogger(__name__)
 
 
-_LOGGER = logging.getLogger(__name__)
+async def async_load_platform_keymap(hass: HomeAssistant, config: ConfigType) -> KeymapLoader:
+    try:
+        return await async_load_keymap(hass, config[CONF_SOCKET], config[CONF_CONFIG_FILES])
+    except (OSError, LircdError, TimeoutError) as e:
+        raise PlatformNotReady(f'cannot read the remotes of {config[CONF_SOCKET]}: {e!r}') from e
+
+
+class LircRemote(RemoteEntity):
+    """One remote from lircd's config, sending its keys as they are."""
+
+    # Keys whose consecutive presses may go out as one SEND_ONCE
+    repeatable_keys = frozenset()
+
+    def __init__(self, loader: KeymapLoader, remote):
+        self._attr_name = remote
+        self._attr_unique_id = f'{loader.path}:{remote}'
+        self._attr_available = False
+        self.logger = _LOGGER
+        self.loader = loader
+        self.remote = remote
+        self.irb = None
+
+    async def async_added_to_hass(self) -> None:
+        self.irb = IRBlaster(async_acquire_transport(self.hass, self.loader.path), self.remote)
+        connection = self.irb.transport.connection
+        self._attr_available = connection.available
+        self.async_on_remove(connection.add_availability_listener(self._availability_changed))
+        self.async_on_remove(connection.client.add_broadcast_listener(self._broadcast))
+
+    async def async_will_remove_from_hass(self) -> None:
+        await async_release_transport(self.hass, self.irb.transport)
+
+    def _availability_changed(self, available: bool):
+        self._attr_available = available
+        self.async_write_ha_state()
+        if available and not self.loader.config_files:
+            # lircd may have come back with another config
+            self.loader.refresh()
+
+    def _broadcast(self, line):
+        if line == 'SIGHUP':
+            self.loader.refresh()
+
+    async def async_send_command(self, command: Iterable[str], **kwargs):
+        steps = plan_ir_steps(command,
+                              kwargs.get(ATTR_NUM_REPEATS, DEFAULT_NUM_REPEATS),
+                              kwargs.get(ATTR_HOLD_SECS, DEFAULT_HOLD_SECS),
+                              self.repeatable_keys)
+        self.logger.debug(f'sending {command} as {len(steps)} lircd commands')
+        await self.async_send_steps(steps, kwargs.get(ATTR_DELAY_SECS, DEFAULT_DELAY_SECS))
+
+    async def async_send_steps(self, steps: list[IRStep], delay_secs):
+        await self.irb.async_send_steps(steps, delay_secs)
+
+    async def async_get_diagnostics(self):
+        transport = self.irb.transport
+        return {
+            'path': transport.path,
+            'remote': self.remote,
+            'keys': len(self.loader.keymap.remotes.get(self.remote, ())),
+            'available': transport.connection.available,
+            'users': transport.users,
+            **transport.metrics.as_dict(),
+        }
 
-class NakamichiRemote(RemoteEntity):
-    _attr_activity_list = ['Power', 'SsePlus', 'Mute']
+    async def async_press_button(self, button):
+        if not self.loader.keymap.has_key(self.remote, button):
+            raise HomeAssistantError(f'{self.remote} has no key {button}')
+        await self.async_send_command([button])
+
+    async def async_assume_power(self, power: bool):
+        raise HomeAssistantError(f'the state of {self.remote} is not tracked')
+
+
+class NakamichiRemote(LircRemote):
+    # Activities are the sound bar's sound modes
+    _attr_activity_list = list(SOUND_MODE_KEYS)
     _attr_current_activity = ''
-    _attr_unique_id = 'singleton'
+    repeatable_keys = REPEATABLE_KEYS
 
-    def __init__(self):
+    def __init__(self, loader: KeymapLoader, remote):
+        super().__init__(loader, remote)
+        self._attr_unique_id = 'singleton'
         self._attr_current_activity = ''
-        self.fd = -1
-        self.logger = _LOGGER
-        self.irb = IRBlaster()
+        self.model = None
 
-    # load config file or hardcode
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.model = await async_get_model(self.hass)
+        self.async_on_remove(self.model.add_listener(self._model_changed))
+        self._model_changed(write=False)
 
-    def turn_on(self, activity: str = None, **kwargs):
-        self.logger.debug('sending on')
-        self.send_command('Power')
+    def _model_changed(self, write=True):
+        state = self.model.state
+        self._attr_is_on = state.power
+        self._attr_current_activity = state.sound_mode or ''
+        if write:
+            self.async_write_ha_state()
 
     async def async_turn_on(self, activity: str = None, **kwargs):
+        if activity is not None and activity not in SOUND_MODE_KEYS:
+            raise HomeAssistantError(f'unknown activity {activity}')
         self.logger.debug('sending async on')
-        self.turn_on()
+        await self.model.async_set(self.irb, power=True, sound_mode=activity)
 
     def turn_off(self, activity: str = None, **kwargs):
         self.logger.debug('sending off')
 
     async def async_turn_off(self, activity: str = None, **kwargs):
         self.logger.debug('sending async off')
+        await self.model.async_set(self.irb, power=False)
 
     async def async_toggle(self, activity: str = None, **kwargs):
+        if self.model.state.power is None:
+            raise HomeAssistantError('sound bar power is unknown')
         self.logger.debug('sending async toggle')
+        await self.model.async_set(self.irb, power=not self.model.state.power)
 
-    def send_command(self, command: Iterable[str], **kwargs):
-        self.logger.debug(f'sending send command {command}')
-        for com in command:
-            self.irb.send_command(com)
-            break
+    async def async_assume_power(self, power: bool):
+        self.model.assume_power(power)
 
-    async def async_send_command(self, command: Iterable[str], **kwargs):
-        self.logger.debug('sending async send command')
-        for com in command:
-            self.irb.send_command(com)
-            break
+    async def async_send_steps(self, steps: list[IRStep], delay_secs):
+        await self.model.async_send_steps(self.irb, steps, delay_secs)
 
-    async def async_press_button(self, button):
-        await self.async_send_command([button])
 
 async def async_setup_platform(
         hass: HomeAssistant,
@@ -150,10 +180,27 @@ async def async_setup_platform(
         async_add_entities: AddEntitiesCallback,
         discovery_info: DiscoveryInfoType | None = None,
 ) -> None:
-    async_add_entities([NakamichiRemote()])
+    loader = await async_load_platform_keymap(hass, config)
+    keymap = loader.keymap
+    sound_bar = keymap.find_remote(MODEL_KEYS)
+    async_add_entities([
+        NakamichiRemote(loader, remote) if remote == sound_bar else LircRemote(loader, remote)
+        for remote in sorted(keymap.remotes)
+    ])
 
     platform = async_get_current_platform()
 
     platform.async_register_entity_service(
-        SERVICE_PRESS_BUTTON, PRESS_BUTTON_SCHEMA, "async_press_button"
+        SERVICE_PRESS_BUTTON,
+        cv.make_entity_service_schema({vol.Required(ATTR_BUTTON): vol.In(keymap)}),
+        "async_press_button",
+    )
+    platform.async_register_entity_service(
+        SERVICE_ASSUME_POWER,
+        cv.make_entity_service_schema({vol.Required(ATTR_POWER): cv.boolean}),
+        "async_assume_power",
+    )
+    platform.async_register_entity_service(
+        SERVICE_GET_DIAGNOSTICS, cv.make_entity_service_schema({}), "async_get_diagnostics",
+        supports_response=SupportsResponse.ONLY,
     )
@@ -23,6 +23,7 @@ from websockets.exceptions import ConnectionClosedError
 from .const import (
     DATA_CLIENT,
     DATA_PLATFORM_SETUP,
+    DATA_QUEUES,
     DOMAIN,
     EVENT_DEVICE_ADDED_TO_REGISTRY,
     LOGGER,
@@ -262,7 +263,14 @@ async def setup_driver(
         hass.async_create_task(async_on_dev_added(dev))
         hass.async_create_task(device_added(hass, entry, dev_reg, dev))
 
-    def device_removed_handler(emitter, dev: ButtplugClientDevice) -> None:
+    def device_removed_handler(emitter, dev: ButtplugClientDevice | int) -> None:
+        # Some buttplug-py versions pass the index; the device is still listed
+        if not isinstance(dev, ButtplugClientDevice):
+            dev = client.devices.get(dev, dev)
+        if isinstance(dev, ButtplugClientDevice):
+            queue = entry_hass_data.get(DATA_QUEUES, {}).pop(dev.name, None)
+            if queue is not None:
+                hass.async_create_task(queue.async_close())
         hass.async_create_task(device_disconnected(dev_reg, dev, client, entry))
 
     known_devices = device_registry.async_entries_for_config_entry(
@@ -389,6 +397,9 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if DATA_CLIENT_LISTEN_TASK in info:
         await disconnect_client(hass, entry)
 
+    for queue in info.get(DATA_QUEUES, {}).values():
+        await queue.async_close()
+
     hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
@@ -9,6 +9,7 @@ DEFAULT_SERVER = "ws://localhost:12345"
 
 DATA_CLIENT = "client"
 DATA_PLATFORM_SETUP = "platform_setup"
+DATA_QUEUES = "queues"
 
 EVENT_DEVICE_ADDED_TO_REGISTRY = f"{DOMAIN}_device_added_to_registry"
 
@@ -0,0 +1,17 @@
+"""Diagnostics support for Buttplug."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_QUEUES, DOMAIN
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return the outbound command queue of every device."""
+    queues = hass.data[DOMAIN][entry.entry_id].get(DATA_QUEUES, {})
+    return {"queues": {name: queue.as_dict() for name, queue in queues.items()}}
@@ -1,6 +1,10 @@
 """Support for Buttplug controls using the number platform."""
 from __future__ import annotations
 
+import asyncio
+import contextlib
+from functools import partial
+
 from websockets.exceptions import ConnectionClosedError
 
 from buttplug.client import (
@@ -21,7 +25,7 @@ from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DATA_CLIENT, DOMAIN, LOGGER
+from .const import DATA_CLIENT, DATA_QUEUES, DOMAIN, LOGGER
 
 PARALLEL_UPDATES = 0
 BUTTPLUG_CMD_VIBRATE = "VibrateCmd"
@@ -31,6 +35,21 @@ CMD_TYPE_VIBRATE = "vibrate"
 CMD_TYPE_ROTATE = "rotate"
 CMD_TYPE_LINEAR = "linear"
 
+# How long a device's queue collects values before sending them as one
+# command, in seconds
+AGGREGATE_TICK = 0.01
+# Commands to a device start at least this many times the server's average
+# acknowledgement latency apart, within these bounds (seconds)
+SEND_INTERVAL_FACTOR = 2.0
+SEND_INTERVAL_MIN = 0.05
+SEND_INTERVAL_MAX = 1.0
+# Weight of the newest sample in the acknowledgement latency average
+ACK_LATENCY_WEIGHT = 0.2
+# Sends of the same values before their callers get the error
+SEND_ATTEMPTS = 3
+# Duration of a linear move, in milliseconds
+LINEAR_MOVE_DURATION = 1000
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -39,11 +58,15 @@ async def async_setup_entry(
 ) -> None:
     """Set up Buttplug Number entity from Config Entry."""
     client: ButtplugClient = hass.data[DOMAIN][config_entry.entry_id][DATA_CLIENT]
+    queues: dict[str, ButtplugCommandQueue] = hass.data[DOMAIN][
+        config_entry.entry_id
+    ].setdefault(DATA_QUEUES, {})
 
     @callback
     def async_add_number(dev: ButtplugClientDevice) -> None:
         """Add Buttplug number entity."""
         entities: list[ButtplugNumberEntity] = []
+        queue = queues[dev.name] = ButtplugCommandQueue(dev)
         for message, attributes in dev.allowed_messages.items():
             handle = True  # TODO golf the section?
             if message == BUTTPLUG_CMD_VIBRATE:
@@ -59,7 +82,7 @@ async def async_setup_entry(
                 for index in range(0, attributes.feature_count):
                     # LOGGER.info()
                     entities.append(
-                        ButtplugNumberEntity(dev, cmd_type, index, sole_index)
+                        ButtplugNumberEntity(dev, queue, cmd_type, index, sole_index)
                     )
         async_add_entities(entities)
 
@@ -72,12 +95,218 @@ async def async_setup_entry(
     )
 
 
+class ButtplugCommandQueue:
+    """Outbound commands of one device, coalesced and rate limited.
+
+    Values set within AGGREGATE_TICK of each other go out as a single
+    multi-index VibrateCmd, RotateCmd or LinearCmd, so motors set together
+    start together and cost one server round-trip. Commands are sent one at
+    a time, spaced by a multiple of the server's measured acknowledgement
+    latency; a value set while its feature is still queued replaces the
+    queued one, so a slow toy skips intermediate values instead of falling
+    behind, and always ends up at the last value set. Values whose command
+    failed stay queued, unless replaced, and go out again in the next send
+    slot, up to SEND_ATTEMPTS times.
+    """
+
+    def __init__(self, dev: ButtplugClientDevice) -> None:
+        """Initialize the queue for dev."""
+        self._dev = dev
+        # cmd_type -> feature index -> value
+        self._pending: dict[str, dict[int, float]] = {}
+        # cmd_type -> resolved once the pending values are sent
+        self._batches: dict[str, asyncio.Future] = {}
+        # cmd_type -> loop time its oldest pending value was set
+        self._queued_at: dict[str, float] = {}
+        # cmd_type -> failed sends of the pending values
+        self._attempts: dict[str, int] = {}
+        self._sender: asyncio.Task | None = None
+        self._next_send = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.superseded = 0
+        self.ack_latency: float | None = None
+        # Time from a value being set to the server acknowledging it
+        self.lag = 0.0
+        self.lag_max = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Feature values waiting to be sent."""
+        return sum(len(values) for values in self._pending.values())
+
+    @property
+    def send_interval(self) -> float:
+        """The least time between the starts of two commands."""
+        if self.ack_latency is None:
+            return SEND_INTERVAL_MIN
+        return min(
+            max(SEND_INTERVAL_MIN, SEND_INTERVAL_FACTOR * self.ack_latency),
+            SEND_INTERVAL_MAX,
+        )
+
+    async def async_set(self, cmd_type: str, index: int, value: float) -> None:
+        """Set feature index to value (-1 to 1) and wait until it is sent.
+
+        Returns once a command carrying the value, or a newer value for
+        the same feature, has been acknowledged.
+        """
+        loop = asyncio.get_running_loop()
+        values = self._pending.setdefault(cmd_type, {})
+        if index in values:
+            self.superseded += 1
+        values[index] = value
+        batch = self._batches.get(cmd_type)
+        if batch is None:
+            batch = self._batches[cmd_type] = loop.create_future()
+            self._queued_at[cmd_type] = loop.time()
+        if self._sender is None:
+            self._sender = loop.create_task(self._async_send_pending())
+        # Shielded so one caller being cancelled does not cancel the batch
+        await asyncio.shield(batch)
+
+    async def _async_send_pending(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch = None
+        try:
+            while self._pending:
+                cmd_type = min(self._queued_at, key=self._queued_at.__getitem__)
+                # Wait for more values to join, and for the rate limit
+                await asyncio.sleep(
+                    max(self._queued_at[cmd_type] + AGGREGATE_TICK, self._next_send)
+                    - loop.time()
+                )
+                values = self._pending.pop(cmd_type)
+                batch = self._batches.pop(cmd_type)
+                queued_at = self._queued_at.pop(cmd_type)
+                start = loop.time()
+                try:
+                    await self._async_send(cmd_type, values)
+                except Exception as err:  # pylint: disable=broad-except
+                    self.failed += 1
+                    attempts = self._attempts.get(cmd_type, 0) + 1
+                    if attempts < SEND_ATTEMPTS:
+                        LOGGER.debug(
+                            "Retrying %s command to %s: %s", cmd_type, self._dev.name, err
+                        )
+                        self._attempts[cmd_type] = attempts
+                        self._requeue(cmd_type, values, batch, queued_at)
+                    else:
+                        # Handed to every caller in the batch
+                        self._attempts.pop(cmd_type, None)
+                        batch.set_exception(err)
+                else:
+                    self._attempts.pop(cmd_type, None)
+                    self.sent += 1
+                    batch.set_result(None)
+                    latency = loop.time() - start
+                    self.ack_latency = (
+                        latency
+                        if self.ack_latency is None
+                        else self.ack_latency
+                        + ACK_LATENCY_WEIGHT * (latency - self.ack_latency)
+                    )
+                    self.lag = loop.time() - queued_at
+                    self.lag_max = max(self.lag_max, self.lag)
+                batch = None
+                self._next_send = start + self.send_interval
+        finally:
+            self._sender = None
+            # Only left behind when the sender was cancelled or crashed
+            self._fail_outstanding(batch)
+
+    def _requeue(
+        self,
+        cmd_type: str,
+        values: dict[int, float],
+        batch: asyncio.Future,
+        queued_at: float,
+    ) -> None:
+        """Queue values again after a failed send, behind newer values."""
+        pending = self._pending.setdefault(cmd_type, {})
+        for index, value in values.items():
+            pending.setdefault(index, value)
+        newer = self._batches.get(cmd_type)
+        if newer is None:
+            self._batches[cmd_type] = batch
+        else:
+            # The callers of both wait for the retry
+            newer.add_done_callback(partial(_copy_outcome, batch))
+        self._queued_at[cmd_type] = queued_at
+
+    def _fail_outstanding(self, batch: asyncio.Future | None = None) -> None:
+        batches = list(self._batches.values())
+        if batch is not None:
+            batches.append(batch)
+        self._pending.clear()
+        self._batches.clear()
+        self._queued_at.clear()
+        self._attempts.clear()
+        for batch in batches:
+            if not batch.done():
+                batch.set_exception(
+                    ConnectionError(f"Command queue of {self._dev.name} closed")
+                )
+
+    async def async_close(self) -> None:
+        """Stop sending; callers still waiting get ConnectionError."""
+        sender = self._sender
+        if sender is not None:
+            sender.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await sender
+        # A sender cancelled before it ran never got to its cleanup
+        self._fail_outstanding()
+
+    def as_dict(self) -> dict:
+        """Queue diagnostics."""
+        now = asyncio.get_running_loop().time()
+        return {
+            "depth": self.depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "superseded": self.superseded,
+            "ack_latency_ms": None
+            if self.ack_latency is None
+            else self.ack_latency * 1000,
+            "send_interval_ms": self.send_interval * 1000,
+            "lag_ms": self.lag * 1000,
+            "lag_max_ms": self.lag_max * 1000,
+            "oldest_pending_ms": (now - min(self._queued_at.values())) * 1000
+            if self._queued_at
+            else None,
+        }
+
+    async def _async_send(self, cmd_type: str, values: dict[int, float]) -> None:
+        if cmd_type == CMD_TYPE_VIBRATE:
+            await self._dev.send_vibrate_cmd(values)
+        elif cmd_type == CMD_TYPE_ROTATE:
+            # negative means opposite direction
+            await self._dev.send_rotate_cmd(
+                {index: (abs(value), value >= 0) for index, value in values.items()}
+            )
+        elif cmd_type == CMD_TYPE_LINEAR:
+            # the device moves to the position over LINEAR_MOVE_DURATION
+            await self._dev.send_linear_cmd(
+                {index: (LINEAR_MOVE_DURATION, value) for index, value in values.items()}
+            )  # TODO figure out how to set two numbers at once from the UI for this.
+
+
+def _copy_outcome(target: asyncio.Future, source: asyncio.Future) -> None:
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(None)
+
+
 # TODO use inputnumber? https://github.com/home-assistant/core/blob/2022.6.7/homeassistant/components/input_number/__init__.py
 class ButtplugNumberEntity(NumberEntity):
     """Representation of a Buttplug number entity."""
 
-    # TODO allow user to batch commands instead of doing individually for diff motors.
-
     icon_mapping = {
         CMD_TYPE_VIBRATE: "mdi:vibrate",
         CMD_TYPE_ROTATE: "mdi:rotate-360",
@@ -87,12 +316,14 @@ class ButtplugNumberEntity(NumberEntity):
     def __init__(
         self,
         dev: ButtplugClientDevice,
+        queue: ButtplugCommandQueue,
         cmd_type: str,
         index: int,
         sole_index: bool = False,
     ) -> None:
         """Initialize a ButtplugNumberEntity entity."""
         self._dev = dev
+        self._queue = queue
         self._cmd_type = cmd_type
         self._index = index
         self._attr_value = 0
@@ -120,20 +351,7 @@ class ButtplugNumberEntity(NumberEntity):
         """Update the current value."""
         internal_value = value / 100
         try:
-            if self._cmd_type == CMD_TYPE_VIBRATE:
-                await self._dev.send_vibrate_cmd({self._index: internal_value})
-            elif self._cmd_type == CMD_TYPE_ROTATE:
-                await self._dev.send_rotate_cmd(
-                    {self._index: (abs(internal_value), internal_value >= 0)}
-                )  # negative means opposite direction
-            elif self._cmd_type == CMD_TYPE_LINEAR:
-                # the device can move back and forth. We can call send_linear_cmd on the device
-                # and it'll tell the server to make the device move to 90% of the
-                # maximum position over 1 second (1000ms).
-                await self._dev.send_linear_cmd(
-                    {self._index: (1000, internal_value)}
-                )  # TODO figure out how to set two numbers at once from the UI for this.
-                # We wait 1 second for the move, then we move it back to the 0% position.
+            await self._queue.async_set(self._cmd_type, self._index, internal_value)
         except ConnectionClosedError:
             LOGGER.exception(
                 "Failed to send command to device; connection between Home Assistant and Buttplug server already closed."
@@ -0,0 +1,263 @@
+"""Microbenchmarks for the CEC message path.
+
+Run from the repository root with a Home Assistant environment:
+
+    python -m custom_components.hdmi_cec_kernel.benchmark
+"""
+
+import asyncio
+import os
+import struct
+import tempfile
+import time
+import timeit
+
+from homeassistant.core import HomeAssistant
+
+from .media_player import (
+    CEC_LOG_ADDR_INVALID,
+    CEC_MODE_INITIATOR,
+    PHYS_ADDR_BY_SOURCE,
+    SOURCE_LIST,
+    CecEvent,
+    CecEventType,
+    CecIoctlBuffers,
+    CecLogAddrs,
+    CecMsg,
+    CecParsedMsg,
+    Cmd,
+    HdmiCecKernelEntity,
+    RxStatus,
+    CecEventFlags,
+    cec_g_phys_addr,
+    cec_s_mode,
+    cec_s_phys_addr,
+    clear_laddrs,
+    get_laddr,
+)
+from .recorder import KIND_EVENT, KIND_MSG
+from .replay import REPLAY_ENTITY_ID, FakeCecAdapter, FakeCecDevice, async_replay, fake_ioctl
+
+# Logical address claim time modelled by the fake adapter in the switch
+# benchmark, roughly one poll message on a quiet bus
+SWITCH_CLAIM_TIME = 0.005
+
+
+class LegacyCecMsg:
+    """CecMsg as it was before the struct.Struct codec, for comparison."""
+
+    def __init__(self, buf):
+        self.tx_ts, \
+            self.rx_ts, \
+            self.length, \
+            self.timeout, \
+            self.sequence, \
+            self.flags = struct.unpack('QQIIII', buf[:32])
+        self.msg = buf[32:32 + self.length]
+        self.reply, \
+            rx_status, \
+            self.tx_status, \
+            self.tx_arb_lost_cnt, \
+            self.tx_nack_cnt, \
+            self.tx_low_drive_cnt, \
+            self.tx_error_cnt = struct.unpack('BBBBBBB', buf[48:55])
+        self.rx_status = RxStatus(rx_status)
+
+    @staticmethod
+    def pack(msg, reply):
+        buf = bytearray(CecMsg.CEC_MSG_STRUCT_SIZE)
+        buf[:32] = struct.pack('QQIIII', 0, 0, len(msg), 0, 0, 0)
+        buf[32:32 + len(msg)] = msg
+        buf[48:55] = struct.pack('BBBBBBB', 1 if reply else 0, 0, 0, 0, 0, 0, 0)
+        # transmit() also parsed the buffer back for its debug log
+        LegacyCecMsg(buf)
+        return buf
+
+
+class LegacyCecEvent:
+    """CecEvent as it was before the struct.Struct codec, for comparison."""
+
+    def __init__(self, buf):
+        self.ts, \
+            event, \
+            flags = struct.unpack("QII", buf[:16])
+        self.event = CecEventType(event)
+        self.flags = CecEventFlags(flags)
+
+        if self.event == CecEventType.CEC_EVENT_STATE_CHANGE:
+            self.phys_addr, \
+                self.log_addr_mask, \
+                self.have_conn_info = struct.unpack("HHH", buf[16:22])
+        elif self.event == CecEventType.CEC_EVENT_LOST_MSGS:
+            self.lost_msgs = struct.unpack("I", buf[16:20])
+
+
+class LegacyCecLogAddrs:
+    """CecLogAddrs as it was before the struct.Struct codec, for comparison."""
+
+    def __init__(self, buf):
+        self.log_addr = buf[:4]
+        self.log_addr_mask, \
+            self.cec_version, \
+            self.num_log_addrs, \
+            self.vendor_id, \
+            self.flags = struct.unpack("HBBII", buf[4:16])
+        self.osd_name = buf[16:31]
+        self.primary_device_type = buf[31:35]
+        self.log_addr_type = buf[35:39]
+        self.all_device_types = buf[39:43]
+        self.features = buf[43:91]
+
+
+def legacy_switch_source(adapter, phys_addr):
+    """CecAdapter.switch_source as it was before address plans, for comparison.
+
+    Returns the time Active Source went out, like the current one.
+    """
+    tmp_fd = os.open(adapter.path, os.O_RDWR)
+    cec_s_mode(tmp_fd, CEC_MODE_INITIATOR)
+    try:
+        old_phys_addr = cec_g_phys_addr(tmp_fd)
+        laddrs = CecLogAddrs.get(tmp_fd)
+        try:
+            clear_laddrs(tmp_fd)
+            cec_s_phys_addr(tmp_fd, phys_addr)
+            laddrs.set(tmp_fd)
+            laddr = get_laddr(tmp_fd)
+            msg_buf = CecParsedMsg.build(laddr, 15, Cmd.CEC_MSG_ACTIVE_SOURCE, phys_addr >> 8, phys_addr & 0xff)
+            CecMsg.transmit(tmp_fd, msg_buf, 0)
+            return time.monotonic()
+        finally:
+            clear_laddrs(tmp_fd)
+            cec_s_phys_addr(tmp_fd, old_phys_addr)
+            laddrs.set(tmp_fd)
+    finally:
+        os.close(tmp_fd)
+        adapter.invalidate_addrs()
+
+
+def sample_msg_buf(*msg):
+    buf = bytearray(CecMsg.CEC_MSG_STRUCT_SIZE)
+    CecMsg.pack(buf, bytes(msg), False)
+    buf[49] = RxStatus.CEC_RX_STATUS_OK.value
+    return buf
+
+
+def sample_event_buf():
+    buf = bytearray(CecEvent.CEC_EVENT_STRUCT_SIZE)
+    struct.pack_into('QIIHHH', buf, 0, 1234, CecEventType.CEC_EVENT_STATE_CHANGE.value, 0,
+                     0x1000, 0x10, 1)
+    return buf
+
+
+def sample_log_addrs_buf():
+    buf = bytearray(CecLogAddrs.CEC_LOG_ADDRS_STRUCT_SIZE)
+    buf[:4] = bytes((4, CEC_LOG_ADDR_INVALID, CEC_LOG_ADDR_INVALID, CEC_LOG_ADDR_INVALID))
+    return buf
+
+
+def sample_traffic(count):
+    """Records of typical TV and sound bar chatter, in recorder log form."""
+    cycle = [
+        sample_msg_buf(0x04, Cmd.CEC_MSG_REPORT_POWER_STATUS.value, 0),
+        sample_msg_buf(0x0f, Cmd.CEC_MSG_ACTIVE_SOURCE.value, 0x00, 0x00),
+        sample_msg_buf(0x5f, Cmd.CEC_MSG_ROUTING_INFORMATION.value, 0x11, 0x00),
+        sample_msg_buf(0x0f, Cmd.CEC_MSG_ROUTING_CHANGE.value, 0x00, 0x00, 0x20, 0x00),
+        sample_msg_buf(0x5f, Cmd.CEC_MSG_DEVICE_VENDOR_ID.value, 0x00, 0x09, 0xb0),
+        sample_msg_buf(0x5f, Cmd.CEC_MSG_REPORT_PHYSICAL_ADDR.value, 0x10, 0x00, 0x05),
+        sample_msg_buf(0x0f, 0x9e, 0x05),  # CEC_MSG_CEC_VERSION, not dispatched
+    ]
+    records = [(KIND_EVENT, 0.0, sample_event_buf())]
+    for index in range(count):
+        records.append((KIND_MSG, (index + 1) * 0.01, cycle[index % len(cycle)]))
+    return records
+
+
+def bench(name, legacy, current, number):
+    legacy_time = timeit.timeit(legacy, number=number)
+    current_time = timeit.timeit(current, number=number)
+    print(f'{name:<24} legacy {legacy_time / number * 1e9:8.0f} ns  '
+          f'current {current_time / number * 1e9:8.0f} ns  '
+          f'x{legacy_time / current_time:.2f}')
+
+
+def main(number=200000):
+    rx_buf = sample_msg_buf(0x05, Cmd.CEC_MSG_REPORT_POWER_STATUS.value, 0)
+    event_buf = sample_event_buf()
+    log_addrs_buf = sample_log_addrs_buf()
+    buffers = CecIoctlBuffers()
+    tx_msg = CecParsedMsg.build(4, 0, Cmd.CEC_MSG_GIVE_DEVICE_POWER_STATUS)
+
+    def legacy_receive():
+        parsed = CecParsedMsg(LegacyCecMsg(rx_buf).msg)
+        return parsed.cmd, parsed.args[0]
+
+    def current_receive():
+        buffers.rx[:] = rx_buf
+        parsed = CecMsg(buffers.rx).parse()
+        return parsed.cmd, parsed.args[0]
+
+    def legacy_event():
+        event = LegacyCecEvent(event_buf)
+        return event.event == CecEventType.CEC_EVENT_STATE_CHANGE and event.log_addr_mask
+
+    def current_event():
+        buffers.event[:] = event_buf
+        event = CecEvent(buffers.event)
+        return event.event_raw == CecEventType.CEC_EVENT_STATE_CHANGE.value and event.log_addr_mask
+
+    bench('receive + parse', legacy_receive, current_receive, number)
+    bench('dequeue event', legacy_event, current_event, number)
+    bench('get laddr', lambda: LegacyCecLogAddrs(log_addrs_buf).log_addr[0],
+          lambda: CecLogAddrs(log_addrs_buf).log_addr[0], number)
+    bench('pack transmit', lambda: LegacyCecMsg.pack(tx_msg, False),
+          lambda: CecMsg.pack(buffers.tx, tx_msg, False), number)
+    asyncio.run(async_bench_replay(number // 10))
+    asyncio.run(async_bench_switch(number // 2000))
+
+
+async def async_bench_replay(count):
+    result = await async_replay(HomeAssistant(tempfile.gettempdir()), sample_traffic(count))
+    print(f'{"replay through entity":<24} {result.messages} msgs in {result.elapsed * 1000:.0f} ms  '
+          f'{result.rate:8.0f} msgs/s')
+
+
+async def async_bench_switch(count, claim_time=SWITCH_CLAIM_TIME):
+    """Time select_source from call to Active Source.
+
+    Alternating between two inputs, and repeating one, as a user flicking
+    through inputs or an automation re-asserting one would.
+    """
+    for name, sources in (('select source alternate', SOURCE_LIST[1:3]), ('select source repeat', SOURCE_LIST[1:2])):
+        hass = HomeAssistant(tempfile.gettempdir())
+        entity = HdmiCecKernelEntity(FakeCecAdapter())
+        entity.hass = hass
+        entity.entity_id = REPLAY_ENTITY_ID
+        adapter = entity.adapter
+        with fake_ioctl(FakeCecDevice(claim_time=claim_time)):
+            try:
+                await adapter.async_run(adapter.open)
+                legacy_latency = 0.0
+                legacy_start = time.monotonic()
+                for index in range(count):
+                    start = time.monotonic()
+                    sent = await adapter.async_run(legacy_switch_source, adapter,
+                                                   PHYS_ADDR_BY_SOURCE[sources[index % len(sources)]])
+                    legacy_latency += sent - start
+                legacy_time = time.monotonic() - legacy_start
+                current_latency = 0.0
+                current_start = time.monotonic()
+                for index in range(count):
+                    source = sources[index % len(sources)]
+                    await entity.async_select_source(source)
+                    current_latency += entity.switch_latency[source]
+                current_time = time.monotonic() - current_start
+            finally:
+                await entity.async_will_remove_from_hass()
+        print(f'{name:<24} legacy {legacy_latency / count * 1e3:6.2f} ms  '
+              f'current {current_latency / count * 1e3:6.2f} ms  '
+              f'x{legacy_latency / current_latency:.2f}  '
+              f'({count / legacy_time:.0f} -> {count / current_time:.0f} switches/s)')
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,12 @@
 import asyncio
+import errno
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import NamedTuple
 import os
+import re
 import fcntl
 import struct
 import select
@@ -8,14 +14,19 @@ from datetime import timedelta, datetime
 from enum import Enum, Flag
 
 from homeassistant.components.media_player import MediaPlayerEntity, MediaPlayerEntityFeature, MediaPlayerState
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import HomeAssistant, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddEntitiesCallback, async_get_current_platform
 from homeassistant.helpers.typing import DiscoveryInfoType, ConfigType
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.event import async_call_later
 
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 
+from .inotify import IN_ATTRIB, IN_CREATE, IN_DELETE, Inotify
+from .recorder import CecRecorder, KIND_EVENT, KIND_MSG
+
 _LOGGER = logging.getLogger(__name__)
 
 _IOC_NRBITS = 8
@@ -112,7 +123,18 @@ class Cmd(Enum):
     CEC_MSG_REPORT_POWER_STATUS = 0x90
     CEC_MSG_USER_CONTROL_PRESSED = 0x44
     CEC_MSG_USER_CONTROL_RELEASED = 0x45
+    CEC_MSG_SET_OSD_NAME = 0x47
     CEC_MSG_SET_SYSTEM_AUDIO_MODE = 0x72
+    CEC_MSG_GIVE_AUDIO_STATUS = 0x71
+    CEC_MSG_REPORT_AUDIO_STATUS = 0x7a
+
+
+CMD_BY_OPCODE = {cmd.value: cmd for cmd in Cmd}
+
+
+def opcode_name(opcode):
+    cmd = CMD_BY_OPCODE.get(opcode)
+    return cmd.name if cmd is not None else hex(opcode)
 
 
 class UiCmd(Enum):
@@ -126,6 +148,9 @@ class UiCmd(Enum):
     CEC_OP_UI_CMD_ENTER = 0x2b
     CEC_OP_UI_CMD_VOLUME_UP = 0x41
     CEC_OP_UI_CMD_VOLUME_DOWN = 0x42
+    CEC_OP_UI_CMD_MUTE = 0x43
+    CEC_OP_UI_CMD_MUTE_FUNCTION = 0x65
+    CEC_OP_UI_CMD_RESTORE_VOLUME_FUNCTION = 0x66
 
 
 UI_COMMAND_TABLE = {
@@ -147,6 +172,9 @@ class PwrState(Enum):
     CEC_OP_POWER_STATUS_TO_STANDBY = 3
 
 
+PWR_STATE_BY_VALUE = {state.value: state for state in PwrState}
+
+
 class TxStatus(Flag):
     CEC_TX_STATUS_OK = 0x1
     CEC_TX_STATUS_ARB_LOST = 0x02
@@ -154,6 +182,8 @@ class TxStatus(Flag):
     CEC_TX_STATUS_LOW_DRIVE = 0x08
     CEC_TX_STATUS_ERROR = 0x10
     CEC_TX_STATUS_MAX_RETRIES = 0x20
+    CEC_TX_STATUS_ABORTED = 0x40
+    CEC_TX_STATUS_TIMEOUT = 0x80
 
 
 class RxStatus(Flag):
@@ -163,7 +193,17 @@ class RxStatus(Flag):
 
 
 SERVICE_PRESS_BUTTON = "press_button"
+SERVICE_PRESS_SEQUENCE = "press_sequence"
+SERVICE_GET_DIAGNOSTICS = "get_diagnostics"
+SERVICE_START_RECORDING = "start_recording"
+SERVICE_STOP_RECORDING = "stop_recording"
 ATTR_BUTTON = "button"
+ATTR_HOLD = "hold"
+ATTR_REPEAT = "repeat"
+ATTR_GAP = "gap"
+ATTR_SEQUENCE = "sequence"
+ATTR_INTERRUPT = "interrupt"
+ATTR_FILENAME = "filename"
 
 PRESS_BUTTON_SCHEMA = cv.make_entity_service_schema(
     {
@@ -171,6 +211,44 @@ PRESS_BUTTON_SCHEMA = cv.make_entity_service_schema(
     }
 )
 
+# CEC 2.0 13.13.3: a held key repeats <User Control Pressed> every 200-500 ms,
+# and followers take 550 ms without one as a release
+KEY_REPEAT_INTERVAL = 0.3
+# Pause between a release and the next press, so TVs register the keys
+# separately
+KEY_GAP = 0.1
+KEY_SEQUENCE_MAX_PENDING = 4
+
+KEY_PRESS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_BUTTON): vol.In(UI_COMMAND_TABLE.keys()),
+        vol.Optional(ATTR_HOLD, default=0.0): vol.All(vol.Coerce(float), vol.Range(min=0, max=10)),
+        vol.Optional(ATTR_REPEAT, default=1): vol.All(vol.Coerce(int), vol.Range(min=1, max=50)),
+        vol.Optional(ATTR_GAP, default=KEY_GAP): vol.All(vol.Coerce(float), vol.Range(min=0, max=10)),
+    }
+)
+
+
+def key_press(value):
+    """Validate a sequence step; a bare button name is a single tap."""
+    if isinstance(value, str):
+        value = {ATTR_BUTTON: value}
+    return KEY_PRESS_SCHEMA(value)
+
+
+PRESS_SEQUENCE_SCHEMA = cv.make_entity_service_schema(
+    {
+        vol.Required(ATTR_SEQUENCE): vol.All(cv.ensure_list, [key_press]),
+        vol.Optional(ATTR_INTERRUPT, default=False): cv.boolean,
+    }
+)
+
+START_RECORDING_SCHEMA = cv.make_entity_service_schema(
+    {
+        vol.Required(ATTR_FILENAME): cv.string,
+    }
+)
+
 
 class CecParsedMsg:
     def __init__(self, buf):
@@ -182,11 +260,7 @@ class CecParsedMsg:
             self.destination = None
 
         if len(buf) >= 2:
-            try:
-                self.cmd = Cmd(buf[1])
-            except ValueError:
-                self.cmd = None
-                _LOGGER.warning('%s is not a valid command', hex(buf[1]))
+            self.cmd = CMD_BY_OPCODE.get(buf[1])
         else:
             self.cmd = None
 
@@ -194,7 +268,10 @@ class CecParsedMsg:
             self.args = buf[2:]
 
     def __repr__(self):
-        return repr(self.__dict__)
+        fields = dict(self.__dict__)
+        if 'args' in fields:
+            fields['args'] = bytes(fields['args']).hex()
+        return repr(fields)
 
     @staticmethod
     def build(initiator, destination, cmd, *args):
@@ -214,37 +291,86 @@ class CecParsedMsg:
         return msg_buf
 
 
-class CecMsg:
-    CEC_MSG_STRUCT_SIZE = 56
-    CEC_TRANSMIT = _iowr('a', 5, CEC_MSG_STRUCT_SIZE)
-    CEC_RECEIVE = _iowr('a', 6, CEC_MSG_STRUCT_SIZE)
+class CecField:
+    """Fixed-offset field of a kernel ioctl struct, decoded only when read."""
+
+    __slots__ = ('layout', 'offset')
+
+    def __init__(self, fmt, offset):
+        self.layout = struct.Struct(fmt)
+        self.offset = offset
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return self.layout.unpack_from(obj.buf, self.offset)[0]
+
+
+class CecStruct:
+    """Zero-copy view over a kernel ioctl struct.
+
+    Views over a CecIoctlBuffers buffer are only valid until that buffer is
+    reused by the next ioctl.
+    """
+
+    __slots__ = ('buf',)
+    _fields = ()
 
     def __init__(self, buf):
-        self.tx_ts, \
-            self.rx_ts, \
-            self.length, \
-            self.timeout, \
-            self.sequence, \
-            self.flags = struct.unpack('QQIIII', buf[:32])
-        self.msg = buf[32:32 + self.length]
-        self.reply, \
-            rx_status, \
-            self.tx_status, \
-            self.tx_arb_lost_cnt, \
-            self.tx_nack_cnt, \
-            self.tx_low_drive_cnt, \
-            self.tx_error_cnt = struct.unpack('BBBBBBB', buf[48:55])
-        self.rx_status = RxStatus(rx_status)
+        self.buf = memoryview(buf)
 
     def __repr__(self):
-        return repr(self.__dict__)
+        fields = {}
+        for name in self._fields:
+            value = getattr(self, name)
+            fields[name] = value.hex() if isinstance(value, memoryview) else value
+        return repr(fields)
+
+
+class CecMsg(CecStruct):
+    CEC_MSG_STRUCT_SIZE = 56
+    CEC_TRANSMIT = _iowr('a', 5, CEC_MSG_STRUCT_SIZE)
+    CEC_RECEIVE = _iowr('a', 6, CEC_MSG_STRUCT_SIZE)
+
+    CEC_MSG_HEADER = struct.Struct('QQIIII')
+    CEC_MSG_MSG_OFFSET = 32
+    CEC_MSG_STATUS_OFFSET = 48
+    CEC_MSG_ZERO = bytes(CEC_MSG_STRUCT_SIZE)
+
+    __slots__ = ()
+    _fields = ('tx_ts', 'rx_ts', 'length', 'timeout', 'sequence', 'flags', 'msg',
+               'reply', 'rx_status', 'tx_status', 'tx_arb_lost_cnt', 'tx_nack_cnt',
+               'tx_low_drive_cnt', 'tx_error_cnt')
+
+    tx_ts = CecField('Q', 0)
+    rx_ts = CecField('Q', 8)
+    length = CecField('I', 16)
+    timeout = CecField('I', 20)
+    sequence = CecField('I', 24)
+    flags = CecField('I', 28)
+    reply = CecField('B', 48)
+    rx_status_raw = CecField('B', 49)
+    tx_status = CecField('B', 50)
+    tx_arb_lost_cnt = CecField('B', 51)
+    tx_nack_cnt = CecField('B', 52)
+    tx_low_drive_cnt = CecField('B', 53)
+    tx_error_cnt = CecField('B', 54)
+
+    @property
+    def msg(self):
+        return self.buf[self.CEC_MSG_MSG_OFFSET:self.CEC_MSG_MSG_OFFSET + self.length]
+
+    @property
+    def rx_status(self):
+        return RxStatus(self.rx_status_raw)
 
     def parse(self):
         return CecParsedMsg(self.msg)
 
     @staticmethod
-    def receive(fd):
-        buf = bytearray(CecMsg.CEC_MSG_STRUCT_SIZE)
+    def receive(fd, buf=None):
+        if buf is None:
+            buf = bytearray(CecMsg.CEC_MSG_STRUCT_SIZE)
         try:
             do_ioctl(fd, CecMsg.CEC_RECEIVE, buf)
             msg = CecMsg(buf)
@@ -255,32 +381,62 @@ class CecMsg:
             return None
 
     @staticmethod
-    def transmit(fd, msg, reply):
+    def pack(buf, msg, reply, timeout=0):
+        """Fill buf for CEC_TRANSMIT.
+
+        reply is the opcode the kernel should wait timeout ms for (0 for none)
+        """
         assert len(msg) <= 16
-        buf = bytearray(CecMsg.CEC_MSG_STRUCT_SIZE)
-        buf[:32] = struct.pack('QQIIII',
-                               0,  # self.tx_ts
-                               0,  # self.rx_ts
-                               len(msg),  # self.length
-                               0,  # self.timeout
-                               0,  # self.sequence
-                               0)  # self.flags
-        buf[32:32 + len(msg)] = msg
-        buf[48:55] = struct.pack('BBBBBBB',
-                                 1 if reply else 0,  # self.reply
-                                 0,  # self.rx_status
-                                 0,  # self.tx_status
-                                 0,  # self.tx_arb_lost_cnt
-                                 0,  # self.tx_nack_cnt
-                                 0,  # self.tx_low_drive_cnt
-                                 0)  # self.tx_error_cnt
-        parsed_msg = CecMsg(buf)
-        _LOGGER.debug('sending %s', parsed_msg)
-        _LOGGER.debug(parsed_msg.parse())
+        if hasattr(reply, 'value'):
+            reply = reply.value
+        buf[:] = CecMsg.CEC_MSG_ZERO
+        CecMsg.CEC_MSG_HEADER.pack_into(buf, 0,
+                                        0,  # tx_ts
+                                        0,  # rx_ts
+                                        len(msg),  # length
+                                        timeout,  # timeout
+                                        0,  # sequence
+                                        0)  # flags
+        buf[CecMsg.CEC_MSG_MSG_OFFSET:CecMsg.CEC_MSG_MSG_OFFSET + len(msg)] = msg
+        buf[CecMsg.CEC_MSG_STATUS_OFFSET] = reply
+
+    @staticmethod
+    def transmit(fd, msg, reply, buf=None, timeout=0):
+        """Transmit msg and return the kernel's CecTxResult.
+
+        On a non-blocking descriptor the result is still pending; the final
+        status arrives later through CEC_RECEIVE under the same sequence.
+        """
+        if buf is None:
+            buf = bytearray(CecMsg.CEC_MSG_STRUCT_SIZE)
+        CecMsg.pack(buf, msg, reply, timeout)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug('sending %s', CecParsedMsg(msg))
         do_ioctl(fd, CecMsg.CEC_TRANSMIT, buf)
-        # tx_status = TxStatus(buf[50])
-        # if TxStatus.CEC_TX_STATUS_OK not in tx_status:
-        #    raise RuntimeError('cec_transmit status not ok')
+        return CecTxResult.from_msg(CecMsg(buf))
+
+
+class CecTxResult(NamedTuple):
+    """tx_status and error counters of one CEC_TRANSMIT."""
+    sequence: int
+    tx_status: int
+    arb_lost: int
+    nack: int
+    low_drive: int
+    error: int
+
+    @staticmethod
+    def from_msg(msg: CecMsg):
+        return CecTxResult(msg.sequence, msg.tx_status, msg.tx_arb_lost_cnt, msg.tx_nack_cnt,
+                           msg.tx_low_drive_cnt, msg.tx_error_cnt)
+
+    @property
+    def pending(self):
+        return self.tx_status == 0
+
+    @property
+    def ok(self):
+        return bool(self.tx_status & TxStatus.CEC_TX_STATUS_OK.value)
 
 
 class CecEventType(Enum):
@@ -293,30 +449,42 @@ class CecEventFlags(Flag):
     CEC_EVENT_FL_DROPPED_EVENTS = 0x2
 
 
-class CecEvent:
+class CecEvent(CecStruct):
     CEC_EVENT_STRUCT_SIZE = 80
     CEC_DQEVENT = _iowr('a', 7, CEC_EVENT_STRUCT_SIZE)
 
-    def __init__(self, buf):
-        self.ts, \
-            event, \
-            flags = struct.unpack("QII", buf[:16])
-        self.event = CecEventType(event)
-        self.flags = CecEventFlags(flags)
-
-        if self.event == CecEventType.CEC_EVENT_STATE_CHANGE:
-            self.phys_addr, \
-                self.log_addr_mask, \
-                self.have_conn_info = struct.unpack("HHH", buf[16:22])
-        elif self.event == CecEventType.CEC_EVENT_LOST_MSGS:
-            self.lost_msgs = struct.unpack("I", buf[16:20])
-
-    def __repr__(self):
-        return repr(self.__dict__)
+    __slots__ = ()
+
+    ts = CecField('Q', 0)
+    event_raw = CecField('I', 8)
+    flags_raw = CecField('I', 12)
+    # CEC_EVENT_STATE_CHANGE
+    phys_addr = CecField('H', 16)
+    log_addr_mask = CecField('H', 18)
+    have_conn_info = CecField('H', 20)
+    # CEC_EVENT_LOST_MSGS
+    lost_msgs = CecField('I', 16)
+
+    @property
+    def event(self):
+        return CecEventType(self.event_raw)
+
+    @property
+    def flags(self):
+        return CecEventFlags(self.flags_raw)
+
+    @property
+    def _fields(self):
+        if self.event_raw == CecEventType.CEC_EVENT_STATE_CHANGE.value:
+            return 'ts', 'event', 'flags', 'phys_addr', 'log_addr_mask', 'have_conn_info'
+        if self.event_raw == CecEventType.CEC_EVENT_LOST_MSGS.value:
+            return 'ts', 'event', 'flags', 'lost_msgs'
+        return 'ts', 'event', 'flags'
 
     @staticmethod
-    def deque(fd):
-        buf = bytearray(CecEvent.CEC_EVENT_STRUCT_SIZE)
+    def deque(fd, buf=None):
+        if buf is None:
+            buf = bytearray(CecEvent.CEC_EVENT_STRUCT_SIZE)
         try:
             do_ioctl(fd, CecEvent.CEC_DQEVENT, buf)
             return CecEvent(buf)
@@ -324,54 +492,77 @@ class CecEvent:
             return None
 
 
-class CecLogAddrs:
+class CecLogAddrs(CecStruct):
     CEC_LOG_ADDRS_STRUCT_SIZE = 92
     CEC_ADAP_G_LOG_ADDRS = _ior('a', 3, CEC_LOG_ADDRS_STRUCT_SIZE)
     CEC_ADAP_S_LOG_ADDRS = _iowr('a', 4, CEC_LOG_ADDRS_STRUCT_SIZE)
 
     CEC_MAX_LOG_ADDRS = 4
 
-    def __init__(self, buf):
-        self.log_addr = buf[:4]
-        self.log_addr_mask, \
-            self.cec_version, \
-            self.num_log_addrs, \
-            self.vendor_id, \
-            self.flags = struct.unpack("HBBII", buf[4:16])
-        self.osd_name = buf[16:31]
-        self.primary_device_type = buf[31:35]
-        self.log_addr_type = buf[35:39]
-        self.all_device_types = buf[39:43]
-        self.features = buf[43:91]
+    __slots__ = ()
+    _fields = ('log_addr', 'log_addr_mask', 'cec_version', 'num_log_addrs', 'vendor_id',
+               'flags', 'osd_name', 'primary_device_type', 'log_addr_type',
+               'all_device_types', 'features')
 
-    def __repr__(self):
-        return repr(self.__dict__)
+    log_addr_mask = CecField('H', 4)
+    cec_version = CecField('B', 6)
+    num_log_addrs = CecField('B', 7)
+    vendor_id = CecField('I', 8)
+    flags = CecField('I', 12)
+
+    @property
+    def log_addr(self):
+        return self.buf[:4]
+
+    @property
+    def osd_name(self):
+        return self.buf[16:31]
+
+    @property
+    def primary_device_type(self):
+        return self.buf[31:35]
+
+    @property
+    def log_addr_type(self):
+        return self.buf[35:39]
+
+    @property
+    def all_device_types(self):
+        return self.buf[39:43]
+
+    @property
+    def features(self):
+        return self.buf[43:91]
 
     @staticmethod
-    def get(fd):
-        buf = bytearray(CecLogAddrs.CEC_LOG_ADDRS_STRUCT_SIZE)
+    def get(fd, buf=None):
+        if buf is None:
+            buf = bytearray(CecLogAddrs.CEC_LOG_ADDRS_STRUCT_SIZE)
         do_ioctl(fd, CecLogAddrs.CEC_ADAP_G_LOG_ADDRS, buf)
         return CecLogAddrs(buf)
 
-    def set(self, fd):
-        buf = bytearray(CecLogAddrs.CEC_LOG_ADDRS_STRUCT_SIZE)
-        buf[:4] = self.log_addr
-        buf[4:16] = struct.pack("HBBII",
-                                self.log_addr_mask,
-                                self.cec_version,
-                                self.num_log_addrs,
-                                self.vendor_id,
-                                self.flags)
-        buf[16:31] = self.osd_name
-        buf[31:35] = self.primary_device_type
-        buf[35:39] = self.log_addr_type
-        buf[39:43] = self.all_device_types
-        buf[43:91] = self.features
+    def set(self, fd, buf=None):
+        # CEC_ADAP_S_LOG_ADDRS writes back into its argument, so hand the
+        # kernel a copy to keep this view intact
+        if buf is None:
+            buf = bytearray(self.buf)
+        else:
+            buf[:] = self.buf
         do_ioctl(fd, CecLogAddrs.CEC_ADAP_S_LOG_ADDRS, buf)
 
 
-def get_laddr(fd):
-    laddrs = CecLogAddrs.get(fd)
+class CecIoctlBuffers:
+    """Preallocated ioctl buffers for one adapter, reused by every call."""
+
+    def __init__(self):
+        self.rx = bytearray(CecMsg.CEC_MSG_STRUCT_SIZE)
+        self.tx = bytearray(CecMsg.CEC_MSG_STRUCT_SIZE)
+        self.event = bytearray(CecEvent.CEC_EVENT_STRUCT_SIZE)
+        self.log_addrs = bytearray(CecLogAddrs.CEC_LOG_ADDRS_STRUCT_SIZE)
+
+
+def get_laddr(fd, buffers=None):
+    laddrs = CecLogAddrs.get(fd, buffers.log_addrs if buffers else None)
     return laddrs.log_addr[0]
 
 
@@ -380,7 +571,31 @@ def clear_laddrs(fd):
     do_ioctl(fd, CecLogAddrs.CEC_ADAP_S_LOG_ADDRS, la_buf)
 
 
+CEC_LOG_ADDR_AUDIOSYSTEM = 5
+# What the kernel reports as the logical address of an unconfigured adapter
+CEC_LOG_ADDR_INVALID = 0xff
+CEC_PHYS_ADDR_INVALID = 0xffff
+
+# <Report Audio Status> operand: mute flag and a 0-100 volume, 0x7f unknown
+CEC_OP_AUD_MUTE_STATUS_ON = 0x80
+CEC_OP_AUD_VOLUME_MASK = 0x7f
+CEC_OP_AUD_VOLUME_MAX = 100
+
 SOUND_BAR_INDEX_MAP = [1, 2, 3]
+SOURCE_LIST = ['HDMI 1/ARC', 'HDMI 2', 'HDMI 3', 'HDMI 4', 'HDMI 1.2', 'HDMI 1.3', 'HDMI 1.4']
+
+
+def source_phys_addr(index: int) -> int:
+    if index >= 4:
+        sound_bar_index = SOUND_BAR_INDEX_MAP[index - 4]
+        return (1 << 12) | (sound_bar_index << 8)
+    return (index + 1) << 12
+
+
+PHYS_ADDR_BY_SOURCE = {source: source_phys_addr(index) for index, source in enumerate(SOURCE_LIST)}
+# Keyed by the top two levels of the physical address, which is as deep as
+# the sources go
+SOURCE_BY_PHYS_ADDR = {phys_addr: source for source, phys_addr in PHYS_ADDR_BY_SOURCE.items()}
 
 
 def phys_addr_to_string(phys_addr: int):
@@ -388,70 +603,869 @@ def phys_addr_to_string(phys_addr: int):
 
 
 
-class HdmiCecKernelEntity(MediaPlayerEntity):
-    _attr_has_entity_name = True
-    _attr_supported_features = \
-        MediaPlayerEntityFeature.TURN_ON | \
-        MediaPlayerEntityFeature.TURN_OFF | \
-        MediaPlayerEntityFeature.SELECT_SOURCE | \
-        MediaPlayerEntityFeature.VOLUME_STEP
-    _attr_source_list = ['HDMI 1/ARC', 'HDMI 2', 'HDMI 3', 'HDMI 4', 'HDMI 1.2', 'HDMI 1.3', 'HDMI 1.4']
-    _attr_unique_id = 'singleton'
+class CecDevice:
+    """What the bus traffic has told us about one logical address."""
+
+    __slots__ = ('log_addr', 'phys_addr', 'vendor_id', 'power_state', 'osd_name', 'last_seen')
+
+    def __init__(self, log_addr):
+        self.log_addr = log_addr
+        self.phys_addr = None
+        self.vendor_id = None
+        self.power_state = None
+        self.osd_name = None
+        self.last_seen = None
+
+    def as_dict(self):
+        return {
+            'log_addr': self.log_addr,
+            'phys_addr': phys_addr_to_string(self.phys_addr) if self.phys_addr is not None else None,
+            'vendor_id': f'{self.vendor_id:06x}' if self.vendor_id is not None else None,
+            'power_state': self.power_state.name if self.power_state is not None else None,
+            'osd_name': self.osd_name,
+            'last_seen': self.last_seen,
+        }
+
+
+class CecTopology:
+    """Bus topology, updated from every message that goes by."""
 
     def __init__(self):
-        self._attr_state = MediaPlayerState.OFF
-        self.path = None
+        self.devices = [CecDevice(log_addr) for log_addr in range(15)]
+        # opcode -> (minimum argument length, handler)
+        self._observers = {
+            Cmd.CEC_MSG_REPORT_PHYSICAL_ADDR.value: (2, self._on_phys_addr),
+            Cmd.CEC_MSG_ACTIVE_SOURCE.value: (2, self._on_active_source),
+            Cmd.CEC_MSG_DEVICE_VENDOR_ID.value: (3, self._on_vendor_id),
+            Cmd.CEC_MSG_REPORT_POWER_STATUS.value: (1, self._on_power_status),
+            Cmd.CEC_MSG_SET_OSD_NAME.value: (1, self._on_osd_name),
+            Cmd.CEC_MSG_STANDBY.value: (0, self._on_standby),
+        }
+
+    def observe(self, initiator, destination, opcode, args):
+        if initiator == 15:
+            return
+        device = self.devices[initiator]
+        device.last_seen = time.monotonic()
+        entry = self._observers.get(opcode)
+        if entry is not None and len(args) >= entry[0]:
+            entry[1](device, destination, args)
+
+    def find_phys_addr(self, phys_addr):
+        for device in self.devices:
+            if device.phys_addr == phys_addr:
+                return device
+        return None
+
+    @staticmethod
+    def _on_phys_addr(device, destination, args):
+        device.phys_addr = (args[0] << 8) | args[1]
+
+    @staticmethod
+    def _on_active_source(device, destination, args):
+        device.phys_addr = (args[0] << 8) | args[1]
+        device.power_state = PwrState.CEC_OP_POWER_STATUS_ON
+
+    @staticmethod
+    def _on_vendor_id(device, destination, args):
+        device.vendor_id = (args[0] << 16) | (args[1] << 8) | args[2]
+
+    @staticmethod
+    def _on_power_status(device, destination, args):
+        device.power_state = PWR_STATE_BY_VALUE.get(args[0])
+
+    @staticmethod
+    def _on_osd_name(device, destination, args):
+        device.osd_name = bytes(args).decode('ascii', 'replace')
+
+    def _on_standby(self, device, destination, args):
+        if destination == 15:
+            for other in self.devices:
+                if other.power_state is not None:
+                    other.power_state = PwrState.CEC_OP_POWER_STATUS_STANDBY
+        else:
+            self.devices[destination].power_state = PwrState.CEC_OP_POWER_STATUS_STANDBY
+
+    def as_dict(self):
+        return {device.log_addr: device.as_dict() for device in self.devices if device.last_seen is not None}
+
+
+REPLY_TIMEOUT_MARGIN = 0.5
+
+
+# How long after a non-blocking transmit its status may take to come back;
+# the kernel itself gives up on a transfer after one second
+TX_STATUS_TIMEOUT = 1.0 + REPLY_TIMEOUT_MARGIN
+
+# Retries on top of the kernel's own attempts, by the failure that used them
+# up. Lost arbitration clears once the other initiator's frame is done; a
+# NACK usually means a busy follower, e.g. a TV still waking up.
+TX_RETRY_BACKOFF = {
+    TxStatus.CEC_TX_STATUS_ARB_LOST.value: (0.02, 0.05, 0.1),
+    TxStatus.CEC_TX_STATUS_NACK.value: (0.1, 0.3, 1.0),
+}
+
+TX_UNCLAIMED_MAX = 16
+
+
+class CecTransmitError(RuntimeError):
+    def __init__(self, opcode, result: CecTxResult):
+        super().__init__(f'transmit {hex(opcode)} failed: {TxStatus(result.tx_status)}')
+        self.opcode = opcode
+        self.result = result
+
+
+def reply_args(reply, length) -> bytes:
+    """The operands of a reply; one too short for them counts as no answer."""
+    args = getattr(reply.msg, 'args', b'')
+    if len(args) < length:
+        raise TimeoutError(f'reply without its operands: {reply.msg!r}')
+    return args
+
+
+class CecTxStats:
+    """Transmit outcomes for one opcode."""
+
+    __slots__ = ('sent', 'failed', 'retries', 'arb_lost', 'nack', 'low_drive', 'error',
+                 'latency_total', 'latency_max')
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.arb_lost = 0
+        self.nack = 0
+        self.low_drive = 0
+        self.error = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, results, latency):
+        """Count one send made of the given attempts."""
+        self.sent += 1
+        if not results[-1].ok:
+            self.failed += 1
+        self.retries += len(results) - 1
+        for result in results:
+            self.arb_lost += result.arb_lost
+            self.nack += result.nack
+            self.low_drive += result.low_drive
+            self.error += result.error
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def as_dict(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'success_rate': (self.sent - self.failed) / self.sent if self.sent else None,
+            'retries': self.retries,
+            'arb_lost': self.arb_lost,
+            'nack': self.nack,
+            'low_drive': self.low_drive,
+            'error': self.error,
+            'latency_mean_ms': self.latency_total / self.sent * 1000 if self.sent else None,
+            'latency_max_ms': self.latency_max * 1000,
+        }
+
+
+class CecFeatureAbortError(RuntimeError):
+    """The destination answered a request with Feature Abort."""
+
+
+class CecReply(NamedTuple):
+    msg: CecParsedMsg
+    latency: float
+
+
+class CecReplyWaiter:
+    __slots__ = ('initiator', 'opcode', 'sequence', 'future', 'sent', 'result')
+
+    def __init__(self, initiator, opcode, future):
+        self.initiator = initiator
+        self.opcode = opcode
+        self.sequence = None
+        self.future = future
+        self.sent = time.monotonic()
+        self.result = None
+
+
+class CecSourcePlan:
+    """Prebuilt steps for announcing one source's physical address."""
+
+    __slots__ = ('phys_addr', 'phys_addr_buf', 'log_addr', 'active_source')
+
+    def __init__(self, phys_addr, log_addr):
+        self.phys_addr = phys_addr
+        self.phys_addr_buf = struct.pack('H', phys_addr)
+        self.set_log_addr(log_addr)
+
+    def set_log_addr(self, log_addr):
+        """Rebuild Active Source for the logical address the claim got.
+
+        Without a valid address, e.g. before the adapter has an HDMI link,
+        there is nothing to build yet; the first switch's claim provides it.
+        """
+        self.log_addr = log_addr
+        if log_addr not in range(16):
+            self.active_source = None
+            return
+        self.active_source = CecParsedMsg.build(log_addr, 15, Cmd.CEC_MSG_ACTIVE_SOURCE,
+                                                self.phys_addr >> 8, self.phys_addr & 0xff)
+
+
+class CecAdapter:
+    """A /dev/cecN adapter owned by a dedicated I/O worker thread.
+
+    Every ioctl that can block on the kernel driver runs on the worker, one
+    at a time and in submission order. Only the O_NONBLOCK receive and event
+    dequeue calls of the read_ready drain loop run on the event loop.
+
+    The adapter's own logical and physical addresses are cached and only
+    re-read after a CEC_EVENT_STATE_CHANGE or a failed transmit.
+
+    Transmits go out non-blocking. Their final tx_status comes back through
+    CEC_RECEIVE and is matched to the sender by sequence number.
+
+    Source switches claim a source's physical address on a second, blocking
+    descriptor, following address plans prepared at open.
+    """
+
+    def __init__(self, path):
+        self.path = path
         self.fd = -1
+        self.buffers = CecIoctlBuffers()
+        self.log_addr = None
+        self.phys_addr = None
+        self._reply_waiters = []
+        self.reply_latency = {}
+        self._tx_waiters = {}
+        self._tx_unclaimed = {}
+        self.tx_stats = {}
+        self.key_sequencer = CecKeySequencer(self)
+        # Blocking descriptor for source switches, the adapter's own
+        # addresses to restore afterwards, and the source currently taken
+        self._switch_fd = -1
+        self._switch_log_addrs = bytearray(CecLogAddrs.CEC_LOG_ADDRS_STRUCT_SIZE)
+        self._home_phys_addr_buf = None
+        self._home_log_addrs = None
+        self._home_stale = True
+        self._known_phys_addrs = frozenset()
+        self.switched_phys_addr = None
+        self.source_plans = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='hdmi_cec_kernel')
+
+    async def async_run(self, func, *args):
+        """Queue func(*args) on the I/O worker and wait for its result."""
+        return await self.submit(func, *args)
+
+    def submit(self, func, *args) -> asyncio.Future:
+        """Queue func(*args) on the I/O worker right away, ahead of later calls."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def open(self) -> bool:
+        self.close()
+
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+        except OSError as e:
+            _LOGGER.debug('cannot open %s: %s', self.path, e)
+            return False
+
+        self.invalidate_addrs()
 
-    def open_fd(self):
-        loop = asyncio.get_event_loop()
+        _LOGGER.info(f'opened {self.path} -> {self.fd}')
+
+        try:
+            cec_s_mode(self.fd, CEC_MODE_INITIATOR | CEC_MODE_FOLLOWER)
+        except OSError as e:
+            _LOGGER.debug('cannot set mode on %s: %s', self.path, e)
+            self.close()
+            return False
+        try:
+            self.prepare_source_switch()
+        except OSError as e:
+            # Retried by the first switch
+            _LOGGER.debug('cannot plan source switches on %s: %s', self.path, e)
+        try:
+            self.send(0, Cmd.CEC_MSG_GIVE_DEVICE_POWER_STATUS)
+            self.send(0, Cmd.CEC_MSG_REQUEST_ACTIVE_SOURCE)
+            self.send(0, Cmd.CEC_MSG_ROUTING_INFORMATION)
+            self.send(CEC_LOG_ADDR_AUDIOSYSTEM, Cmd.CEC_MSG_GIVE_AUDIO_STATUS)
+        except OSError as e:
+            # E.g. no HDMI link yet; a state change event follows once there is
+            _LOGGER.debug('initial queries on %s failed: %s', self.path, e)
+        return True
+
+    def close(self):
+        if self._switch_fd != -1:
+            try:
+                self.restore_addrs()
+            except OSError as e:
+                _LOGGER.debug('cannot restore addresses on %s: %s', self.path, e)
+            os.close(self._switch_fd)
+            self._switch_fd = -1
         if self.fd != -1:
             os.close(self.fd)
-            loop.remove_reader(self.fd)
-            self.path = None
             self.fd = -1
 
-        for i in range(2):
-            try:
-                self.path = f'/dev/cec{i}'
-                self.fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+    def invalidate_addrs(self):
+        self.log_addr = None
+        self.phys_addr = None
+
+    def refresh_addrs(self):
+        self.log_addr = get_laddr(self.fd, self.buffers)
+        self.phys_addr = cec_g_phys_addr(self.fd)
+
+    def get_laddr(self):
+        if self.log_addr is None:
+            self.refresh_addrs()
+        return self.log_addr
+
+    def process_event(self, event: CecEvent):
+        """Track address changes reported by the kernel."""
+        if event.event_raw == CecEventType.CEC_EVENT_STATE_CHANGE.value:
+            # The laddr is re-read on the worker by the next send
+            self.log_addr = None
+            self.phys_addr = event.phys_addr
+            if event.phys_addr not in self._known_phys_addrs:
+                # Changed by something other than a source switch
+                self._home_stale = True
+
+    def transmit(self, msg_buf, reply=0, timeout=0):
+        return CecMsg.transmit(self.fd, msg_buf, reply, self.buffers.tx, timeout)
+
+    def send(self, destination, cmd, *args, reply=0, timeout=0):
+        laddr = self.get_laddr()
+        if laddr not in range(16):
+            # Unconfigured, unless the cached laddr is stale
+            self.refresh_addrs()
+            laddr = self.log_addr
+            if laddr not in range(16):
+                raise OSError(errno.ENONET, f'{self.path} has no logical address')
+        try:
+            return self.transmit(CecParsedMsg.build(laddr, destination, cmd, *args), reply, timeout)
+        except OSError:
+            # The cached laddr may be stale; retry once with fresh addresses
+            self.refresh_addrs()
+            if self.log_addr == laddr or self.log_addr not in range(16):
+                raise
+            _LOGGER.debug('log_addr changed %s -> %s, retrying', laddr, self.log_addr)
+            return self.transmit(CecParsedMsg.build(self.log_addr, destination, cmd, *args), reply, timeout)
+
+    async def async_transmit_result(self, func, *args) -> CecTxResult:
+        """Run a transmit on the worker and wait for its final tx_status."""
+        result = await self.async_run(func, *args)
+        if not result.pending:
+            return result
+        unclaimed = self._tx_unclaimed.pop(result.sequence, None)
+        if unclaimed is not None:
+            return unclaimed
+        future = asyncio.get_running_loop().create_future()
+        self._tx_waiters[result.sequence] = future
+        try:
+            async with asyncio.timeout(TX_STATUS_TIMEOUT):
+                return await future
+        finally:
+            del self._tx_waiters[result.sequence]
+
+    def complete_transmit(self, result: CecTxResult):
+        future = self._tx_waiters.get(result.sequence)
+        if future is not None:
+            if not future.done():
+                future.set_result(result)
+            return
+        # Either the sender hasn't registered yet or nobody is waiting
+        if len(self._tx_unclaimed) >= TX_UNCLAIMED_MAX:
+            del self._tx_unclaimed[next(iter(self._tx_unclaimed))]
+        self._tx_unclaimed[result.sequence] = result
+
+    def get_tx_stats(self, opcode) -> CecTxStats:
+        stats = self.tx_stats.get(opcode)
+        if stats is None:
+            stats = self.tx_stats[opcode] = CecTxStats()
+        return stats
+
+    async def async_send(self, destination, cmd, *args) -> CecTxResult:
+        """Send cmd, retrying lost arbitration and NACKs with backoff.
+
+        Raises CecTransmitError with the last attempt's result once the
+        retries are used up or the failure isn't worth retrying.
+        """
+        opcode = cmd.value if hasattr(cmd, 'value') else cmd
+        start = time.monotonic()
+        results = []
+        while True:
+            result = await self.async_transmit_result(self.send, destination, cmd, *args)
+            results.append(result)
+            if result.ok:
+                break
+            delays = None
+            for failure, backoff in TX_RETRY_BACKOFF.items():
+                if result.tx_status & failure:
+                    delays = backoff
+                    break
+            if delays is None or len(results) > len(delays):
+                break
+            _LOGGER.debug('transmit %s: %s, retrying', hex(opcode), TxStatus(result.tx_status))
+            await asyncio.sleep(delays[len(results) - 1])
+        self.get_tx_stats(opcode).record(results, time.monotonic() - start)
+        if not result.ok:
+            raise CecTransmitError(opcode, result)
+        return result
+
+    async def async_transmit_and_wait(self, destination, cmd, *args, expected_opcode, timeout=1.0):
+        """Send cmd and wait for the expected_opcode reply from destination.
+
+        Directed requests ask the kernel to track the reply, which then comes
+        back through CEC_RECEIVE tagged with the request's sequence number.
+        Broadcast requests are answered by whoever has the reply, so those
+        are matched on opcode alone, and go out through async_send.
+        """
+        if hasattr(expected_opcode, 'value'):
+            expected_opcode = expected_opcode.value
+        broadcast = destination == 15
+        waiter = CecReplyWaiter(None if broadcast else destination, expected_opcode,
+                                asyncio.get_running_loop().create_future())
+        self._reply_waiters.append(waiter)
+        try:
+            if broadcast:
+                await self.async_send(destination, cmd, *args)
+            else:
+                waiter.sequence = (await self.async_run(partial(
+                    self.send, destination, cmd, *args,
+                    reply=expected_opcode, timeout=int(timeout * 1000)))).sequence
+            # The kernel reports its own reply timeout; this one only
+            # covers replies that can't be tied back to the request
+            async with asyncio.timeout(timeout + REPLY_TIMEOUT_MARGIN):
+                parsed = await waiter.future
+        finally:
+            self._reply_waiters.remove(waiter)
+            if waiter.result is not None:
+                self.get_tx_stats(cmd.value if hasattr(cmd, 'value') else cmd).record(
+                    (waiter.result,), time.monotonic() - waiter.sent)
+        latency = time.monotonic() - waiter.sent
+        self.reply_latency[expected_opcode] = latency
+        _LOGGER.debug('reply %s from %s after %.1f ms', hex(expected_opcode), destination, latency * 1000)
+        return CecReply(parsed, latency)
+
+    def process_msg(self, msg: CecMsg) -> bool:
+        """Resolve transmit and reply waiters from a received message.
+
+        Returns True if msg is a kernel status report rather than bus traffic.
+        """
+        sequence = msg.sequence
+        if sequence:
+            if not msg.reply:
+                self.complete_transmit(CecTxResult.from_msg(msg))
+                return True
+            tx_ok = msg.tx_status & TxStatus.CEC_TX_STATUS_OK.value
+            for waiter in self._reply_waiters:
+                if waiter.sequence != sequence or waiter.future.done():
+                    continue
+                waiter.result = CecTxResult.from_msg(msg)
+                if not tx_ok:
+                    raw = msg.msg
+                    waiter.future.set_exception(CecTransmitError(raw[1] if len(raw) > 1 else 0, waiter.result))
+                    return True
+                rx_status = msg.rx_status_raw
+                if rx_status & RxStatus.CEC_RX_STATUS_TIMEOUT.value:
+                    waiter.future.set_exception(TimeoutError(f'no reply {hex(waiter.opcode)}'))
+                    return True
+                if rx_status & RxStatus.CEC_RX_STATUS_FEATURE_ABORT.value:
+                    waiter.future.set_exception(CecFeatureAbortError(f'feature abort {hex(waiter.opcode)}'))
+                    return False
+                waiter.future.set_result(CecParsedMsg(bytes(msg.msg)))
+                return False
+            if not tx_ok or msg.rx_status_raw & RxStatus.CEC_RX_STATUS_TIMEOUT.value:
+                return True
+        if not self._reply_waiters:
+            return False
+        raw = msg.msg
+        if len(raw) < 2:
+            return False
+        initiator = raw[0] >> 4
+        opcode = raw[1]
+        for waiter in self._reply_waiters:
+            if waiter.opcode == opcode and waiter.initiator in (None, initiator) and not waiter.future.done():
+                waiter.future.set_result(CecParsedMsg(bytes(raw)))
                 break
+        return False
+
+    def prepare_source_switch(self):
+        """Open the blocking switch descriptor and plan every source.
+
+        Reads the adapter's own addresses once; they are only read again
+        after the kernel reports a change that no switch explains.
+        """
+        if self._switch_fd == -1:
+            self._switch_fd = os.open(self.path, os.O_RDWR)
+            try:
+                cec_s_mode(self._switch_fd, CEC_MODE_INITIATOR)
             except OSError:
-                self.fd = -1
-                pass
+                os.close(self._switch_fd)
+                self._switch_fd = -1
+                raise
+        # Never mistake a taken source for the adapter's own addresses
+        self.restore_addrs()
+        phys_addr = cec_g_phys_addr(self._switch_fd)
+        laddrs = CecLogAddrs.get(self._switch_fd)
+        self._home_phys_addr_buf = struct.pack('H', phys_addr)
+        self._home_log_addrs = bytes(laddrs.buf)
+        self._home_stale = False
+        self.source_plans = {source_phys_addr: CecSourcePlan(source_phys_addr, laddrs.log_addr[0])
+                             for source_phys_addr in PHYS_ADDR_BY_SOURCE.values()}
+        self._known_phys_addrs = frozenset((CEC_PHYS_ADDR_INVALID, phys_addr, *self.source_plans))
+
+    def claim_addrs(self, phys_addr_buf):
+        """Move the switch descriptor's adapter to a physical address.
+
+        Returns the logical address claimed there, which the kernel writes
+        back into the S_LOG_ADDRS argument.
+        """
+        clear_laddrs(self._switch_fd)
+        do_ioctl(self._switch_fd, CEC_ADAP_S_PHYS_ADDR, phys_addr_buf)
+        self._switch_log_addrs[:] = self._home_log_addrs
+        do_ioctl(self._switch_fd, CecLogAddrs.CEC_ADAP_S_LOG_ADDRS, self._switch_log_addrs)
+        return self._switch_log_addrs[0]
+
+    def switch_source(self, phys_addr: int) -> float:
+        """Announce phys_addr as the active source.
+
+        Takes over phys_addr, going straight from a source taken by an
+        earlier switch when restore_addrs() hasn't run since, and stays
+        there. Returns the monotonic time Active Source left the adapter,
+        and raises CecTransmitError if it did not get through.
+        """
+        if self._switch_fd == -1 or self._home_stale:
+            self.prepare_source_switch()
+        plan = self.source_plans.get(phys_addr)
+        if plan is None:
+            plan = CecSourcePlan(phys_addr, self._home_log_addrs[0])
+        try:
+            if self.switched_phys_addr != phys_addr:
+                self.switched_phys_addr = phys_addr
+                log_addr = self.claim_addrs(plan.phys_addr_buf)
+                _LOGGER.debug('phys_addr < %s, log_addr > %s', phys_addr_to_string(phys_addr), log_addr)
+                if log_addr != plan.log_addr:
+                    plan.set_log_addr(log_addr)
+            if plan.active_source is None:
+                raise OSError(errno.ENONET, f'no logical address at {phys_addr_to_string(phys_addr)}')
+            result = CecMsg.transmit(self._switch_fd, plan.active_source, 0)
+            sent = time.monotonic()
+            if not result.ok:
+                raise CecTransmitError(Cmd.CEC_MSG_ACTIVE_SOURCE.value, result)
+            return sent
+        except (OSError, CecTransmitError):
+            self.restore_addrs()
+            raise
+        finally:
+            self.invalidate_addrs()
 
-        if self.fd != -1:
-            _LOGGER.info(f'opened {self.path} -> {self.fd}')
+    def restore_addrs(self):
+        """Give the adapter its own addresses back after switch_source()."""
+        if self.switched_phys_addr is None:
+            return
+        self.switched_phys_addr = None
+        try:
+            self.claim_addrs(self._home_phys_addr_buf)
+            _LOGGER.debug('phys_addr < %s', phys_addr_to_string(struct.unpack('H', self._home_phys_addr_buf)[0]))
+        finally:
+            self.invalidate_addrs()
 
-            cec_s_mode(self.fd, CEC_MODE_INITIATOR | CEC_MODE_FOLLOWER)
 
-            laddr = get_laddr(self.fd)
-            msg_buf = CecParsedMsg.build(laddr, 0,
-                                         Cmd.CEC_MSG_GIVE_DEVICE_POWER_STATUS)
-            CecMsg.transmit(self.fd, msg_buf, False)
-            msg_buf = CecParsedMsg.build(laddr, 0,
-                                         Cmd.CEC_MSG_REQUEST_ACTIVE_SOURCE)
-            CecMsg.transmit(self.fd, msg_buf, False)
-            msg_buf = CecParsedMsg.build(laddr, 0,
-                                         Cmd.CEC_MSG_ROUTING_INFORMATION)
-            CecMsg.transmit(self.fd, msg_buf, False)
-
-            loop.add_reader(self.fd, self.read_ready)
-            loop._selector._selector.modify(self.fd, select.EPOLLIN | select.EPOLLPRI)
+class CecKeyPress(NamedTuple):
+    command: UiCmd
+    hold: float = 0.0
+    repeat: int = 1
+    gap: float = KEY_GAP
+
+
+class CecKeySequencer:
+    """Plays key sequences on one adapter, one at a time in call order.
+
+    Presses are timed against deadlines on the loop clock, so the time the
+    I/O worker spends transmitting counts toward holds and gaps instead of
+    adding to them.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self._lock = asyncio.Lock()
+        self._sequences = set()
+        self._next_press = 0.0
+
+    async def async_play(self, presses, destination=0):
+        """Queue presses and wait until they have been played.
+
+        Returns early without error if cancel() interrupts the sequence.
+        """
+        if len(self._sequences) >= KEY_SEQUENCE_MAX_PENDING:
+            raise HomeAssistantError('too many CEC key sequences queued')
+        sequence = asyncio.get_running_loop().create_task(self._async_play(presses, destination))
+        self._sequences.add(sequence)
+        sequence.add_done_callback(self._sequences.discard)
+        try:
+            await sequence
+        except asyncio.CancelledError:
+            # Cancelling the caller cancels the sequence with it
+            if not sequence.cancelled() or asyncio.current_task().cancelling():
+                raise
+
+    def cancel(self):
+        """Interrupt the running sequence and drop the queued ones."""
+        for sequence in self._sequences:
+            sequence.cancel()
+        self._sequences.clear()
+
+    async def _async_play(self, presses, destination):
+        async with self._lock:
+            for press in presses:
+                for _ in range(press.repeat):
+                    await self._async_press(press, destination)
+
+    async def _async_press(self, press: CecKeyPress, destination):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(max(0.0, self._next_press - loop.time()))
+        pressed_at = loop.time()
+        release_at = pressed_at + press.hold
+        try:
+            await self.adapter.async_send(destination, Cmd.CEC_MSG_USER_CONTROL_PRESSED, press.command)
+            repeat_at = pressed_at + KEY_REPEAT_INTERVAL
+            while repeat_at < release_at:
+                await asyncio.sleep(max(0.0, repeat_at - loop.time()))
+                await self.adapter.async_send(destination, Cmd.CEC_MSG_USER_CONTROL_PRESSED, press.command)
+                repeat_at += KEY_REPEAT_INTERVAL
+            await asyncio.sleep(max(0.0, release_at - loop.time()))
+        finally:
+            # Queued straight onto the worker, so even an interrupted hold
+            # is released before anything sent after it
+            released = self.adapter.submit(self.adapter.send, destination, Cmd.CEC_MSG_USER_CONTROL_RELEASED)
+            self._next_press = loop.time() + press.gap
+        await released
+
+
+# Power poll intervals: right after a command of ours, while nothing has
+# confirmed the state, and while the TV's reports agree with each other
+POWER_POLL_FAST = timedelta(seconds=2)
+POWER_POLL_FAST_ATTEMPTS = 5
+POWER_POLL_UNCERTAIN = timedelta(seconds=30)
+POWER_POLL_STABLE = timedelta(minutes=5)
+
+# Bounds on one volume_set: confirm-and-press rounds, key presses in total,
+# and the level change a single press is believed to make
+VOLUME_SET_MAX_ROUNDS = 4
+VOLUME_SET_MAX_PRESSES = 100
+VOLUME_STEP_MAX = 10.0
+
+# How long the adapter keeps a selected source's addresses before taking
+# back its own; a switch within that time skips the restore
+SOURCE_RESTORE_DELAY = 0.5
+
+# Reopen retries after a failed open, doubling up to the maximum. Hotplug
+# events from the adapter manager retry right away.
+REOPEN_BACKOFF_MIN = 1.0
+REOPEN_BACKOFF_MAX = 300.0
+
+CEC_DEVICE_DIR = '/dev'
+CEC_DEVICE_RE = re.compile(r'cec\d+')
+# Kept as an entity even while unplugged, under the unique ID it had when
+# it was the only adapter
+DEFAULT_ADAPTER_PATH = '/dev/cec0'
+
+# hass.data key of the CecAdapterManager, for integrations sending over CEC
+DATA_CEC_ADAPTERS = 'hdmi_cec_kernel_adapters'
+
+
+class HdmiCecKernelEntity(MediaPlayerEntity):
+    _attr_has_entity_name = True
+    _attr_supported_features = \
+        MediaPlayerEntityFeature.TURN_ON | \
+        MediaPlayerEntityFeature.TURN_OFF | \
+        MediaPlayerEntityFeature.SELECT_SOURCE | \
+        MediaPlayerEntityFeature.VOLUME_STEP | \
+        MediaPlayerEntityFeature.VOLUME_SET | \
+        MediaPlayerEntityFeature.VOLUME_MUTE
+    _attr_source_list = SOURCE_LIST
+
+    def __init__(self, adapter: CecAdapter):
+        self._attr_state = MediaPlayerState.OFF
+        self._attr_available = False
+        self.adapter = adapter
+        if adapter.path == DEFAULT_ADAPTER_PATH:
+            self._attr_unique_id = 'singleton'
+        else:
+            self._attr_unique_id = self._attr_name = os.path.basename(adapter.path)
+        self.topology = CecTopology()
+        self.recorder = None
+        self._epoll = None
+        self._cancel_reopen = None
+        self._reopen_delay = REOPEN_BACKOFF_MIN
+        # opcode -> (minimum argument length, handler)
+        self._dispatch = {
+            Cmd.CEC_MSG_GIVE_DEVICE_POWER_STATUS.value: (0, self._on_give_power_status),
+            Cmd.CEC_MSG_REPORT_POWER_STATUS.value: (1, self._on_report_power_status),
+            Cmd.CEC_MSG_ACTIVE_SOURCE.value: (0, self._on_active_source),
+            Cmd.CEC_MSG_STANDBY.value: (0, self._on_standby),
+            Cmd.CEC_MSG_IMAGE_VIEW_ON.value: (0, self._on_image_view_on),
+            Cmd.CEC_MSG_ROUTING_CHANGE.value: (4, self._on_routing_change),
+            Cmd.CEC_MSG_SET_STREAM_PATH.value: (2, self._on_set_stream_path),
+            Cmd.CEC_MSG_ROUTING_INFORMATION.value: (2, self._on_routing_information),
+            Cmd.CEC_MSG_REPORT_AUDIO_STATUS.value: (1, self._on_report_audio_status),
+        }
+        self._cancel_power_poll = None
+        self._expected_power_state = None
+        self._fast_power_polls = 0
+        # Audio system volume (0-100) as last reported, the number of
+        # reports so far, and the level change per volume key once learned
+        self._audio_volume = None
+        self._audio_reports = 0
+        self._volume_step = None
+        self._cancel_source_restore = None
+        # source -> seconds from select_source to Active Source on the bus
+        self.switch_latency = {}
+
+    async def async_open_adapter(self, _: datetime | None = None) -> None:
+        self.cancel_reopen()
+        self._remove_reader()
+
+        if await self.adapter.async_run(self.adapter.open):
+            self._reopen_delay = REOPEN_BACKOFF_MIN
+            self._add_reader()
+            self._attr_available = True
         else:
-            loop.call_later(1.0, self.open_fd)
+            self._attr_available = False
+            self._cancel_reopen = async_call_later(self.hass, self._reopen_delay, self.async_open_adapter)
+            self._reopen_delay = min(self._reopen_delay * 2, REOPEN_BACKOFF_MAX)
+        self.schedule_update_ha_state()
+
+    def cancel_reopen(self):
+        if self._cancel_reopen:
+            self._cancel_reopen()
+            self._cancel_reopen = None
+
+    def _add_reader(self):
+        # asyncio readers only wait for EPOLLIN, but the kernel signals CEC
+        # events with EPOLLPRI; wait on a private epoll set covering both
+        self._epoll = select.epoll()
+        self._epoll.register(self.adapter.fd, select.EPOLLIN | select.EPOLLPRI)
+        asyncio.get_running_loop().add_reader(self._epoll.fileno(), self.read_ready)
+
+    def _remove_reader(self):
+        if self._epoll is not None:
+            asyncio.get_running_loop().remove_reader(self._epoll.fileno())
+            self._epoll.close()
+            self._epoll = None
+
+    def adapter_added(self):
+        """The device node (re)appeared or became accessible; retry now."""
+        if self.adapter.fd == -1:
+            self._reopen_delay = REOPEN_BACKOFF_MIN
+            self.hass.async_create_task(self.async_open_adapter())
+
+    async def async_adapter_removed(self):
+        self.cancel_reopen()
+        self.cancel_source_restore()
+        self._remove_reader()
+        await self.adapter.async_run(self.adapter.close)
+        self._attr_available = False
+        self.schedule_update_ha_state()
 
     async def async_added_to_hass(self) -> None:
-        self.open_fd()
-        self.async_on_remove(
-            async_track_time_interval(self.hass, self.request_power_state, timedelta(seconds=30))
-        )
+        await self.async_open_adapter()
+        self.schedule_power_poll(POWER_POLL_UNCERTAIN)
+
+    async def async_will_remove_from_hass(self) -> None:
+        self.cancel_reopen()
+        self.cancel_source_restore()
+        if self._cancel_power_poll:
+            self._cancel_power_poll()
+        self.adapter.key_sequencer.cancel()
+        self._remove_reader()
+        await self.async_stop_recording()
+        await self.adapter.async_run(self.adapter.close)
+        self.adapter.shutdown()
+
+    def schedule_power_poll(self, delay: timedelta):
+        """(Re)start the power poll timer, dropping any sooner poll."""
+        if self._cancel_power_poll:
+            self._cancel_power_poll()
+        self._cancel_power_poll = async_call_later(self.hass, delay, self.async_request_power_state)
+
+    def expect_power_state(self, state: bool):
+        """Poll fast until the TV confirms the power state we just commanded."""
+        self._expected_power_state = state
+        self._fast_power_polls = POWER_POLL_FAST_ATTEMPTS
+        self.update_power_state(state)
+        self.schedule_power_poll(POWER_POLL_FAST)
+
+    def observe_power_state(self, state: bool, confirmed: bool):
+        """Track power from bus traffic.
+
+        Every observation pushes the next poll out, so polling stays
+        suspended while traffic keeps the state fresh.
+        """
+        expected = self._expected_power_state
+        if expected is not None and state != expected and self._fast_power_polls > 0:
+            # The TV hasn't caught up with our command yet
+            self.verify_power_state()
+            return
+        self._expected_power_state = None
+        self.update_power_state(state)
+        if confirmed:
+            self._fast_power_polls = 0
+            self.schedule_power_poll(POWER_POLL_STABLE)
+        else:
+            self.verify_power_state()
+
+    def verify_power_state(self):
+        if self._fast_power_polls > 0:
+            self._fast_power_polls -= 1
+            self.schedule_power_poll(POWER_POLL_FAST)
+        else:
+            self.schedule_power_poll(POWER_POLL_UNCERTAIN)
 
-    def request_power_state(self, _: datetime | None = None) -> None:
-        laddr = get_laddr(self.fd)
-        msg_buf = CecParsedMsg.build(laddr, 0,
-                                     Cmd.CEC_MSG_GIVE_DEVICE_POWER_STATUS)
-        CecMsg.transmit(self.fd, msg_buf, False)
+    async def async_request_power_state(self, _: datetime | None = None) -> None:
+        # Called early, as after a power event, this poll replaces the pending one
+        if self._cancel_power_poll:
+            self._cancel_power_poll()
+            self._cancel_power_poll = None
+        try:
+            await self.async_query_power_state()
+        except (TimeoutError, CecFeatureAbortError, CecTransmitError, OSError) as e:
+            _LOGGER.debug('power state query failed: %s', e)
+            if self._cancel_power_poll is None:
+                self.verify_power_state()
+
+    async def async_query_power_state(self) -> bool:
+        """Ask the TV for its power state and wait for the answer."""
+        reply = await self.adapter.async_transmit_and_wait(
+            0, Cmd.CEC_MSG_GIVE_DEVICE_POWER_STATUS,
+            expected_opcode=Cmd.CEC_MSG_REPORT_POWER_STATUS)
+        return reply_args(reply, 1)[0] == PwrState.CEC_OP_POWER_STATUS_ON.value
+
+    async def async_query_active_source(self) -> int:
+        """Ask the bus for the active source and return its physical address."""
+        reply = await self.adapter.async_transmit_and_wait(
+            15, Cmd.CEC_MSG_REQUEST_ACTIVE_SOURCE,
+            expected_opcode=Cmd.CEC_MSG_ACTIVE_SOURCE)
+        args = reply_args(reply, 2)
+        return (args[0] << 8) | args[1]
+
+    async def async_query_audio_status(self):
+        """Ask the audio system for its status; returns (volume, muted).
+
+        The reply also goes through dispatch, which updates the entity.
+        """
+        reply = await self.adapter.async_transmit_and_wait(
+            CEC_LOG_ADDR_AUDIOSYSTEM, Cmd.CEC_MSG_GIVE_AUDIO_STATUS,
+            expected_opcode=Cmd.CEC_MSG_REPORT_AUDIO_STATUS)
+        status = reply_args(reply, 1)[0]
+        volume = status & CEC_OP_AUD_VOLUME_MASK
+        return (volume if volume <= CEC_OP_AUD_VOLUME_MAX else None), bool(status & CEC_OP_AUD_MUTE_STATUS_ON)
 
     def update_power_state(self, state: bool):
         if state:
@@ -471,153 +1485,329 @@ class HdmiCecKernelEntity(MediaPlayerEntity):
 
     def process_event(self, event: CecEvent):
         _LOGGER.debug('event: %s', event)
-        if event.event == CecEventType.CEC_EVENT_STATE_CHANGE and event.log_addr_mask != 0:
-            laddr = get_laddr(self.fd)
-            msg_buf = CecParsedMsg.build(laddr, 0,
-                                         Cmd.CEC_MSG_GIVE_DEVICE_POWER_STATUS)
-            CecMsg.transmit(self.fd, msg_buf, False)
+        self.adapter.process_event(event)
+        if event.event_raw == CecEventType.CEC_EVENT_STATE_CHANGE.value and event.log_addr_mask != 0:
+            self.hass.async_create_task(self.async_request_power_state())
 
     def process_msg(self, msg: CecMsg):
         _LOGGER.debug(msg)
-        parsed = msg.parse()
-        _LOGGER.debug(parsed)
-
-        if parsed.initiator == 0:
-            if parsed.cmd == Cmd.CEC_MSG_GIVE_DEVICE_POWER_STATUS:
-                _LOGGER.debug('reporting power status')
-                msg_buf = CecParsedMsg.build(parsed.destination, parsed.initiator,
-                                             Cmd.CEC_MSG_REPORT_POWER_STATUS, PwrState.CEC_OP_POWER_STATUS_ON)
-                CecMsg.transmit(self.fd, msg_buf, False)
-            elif parsed.cmd == Cmd.CEC_MSG_REPORT_POWER_STATUS:
-                pwr_state = PwrState(parsed.args[0])
-                power_state = True if pwr_state == PwrState.CEC_OP_POWER_STATUS_ON else False
-                self.update_power_state(power_state)
-            elif parsed.cmd == Cmd.CEC_MSG_ACTIVE_SOURCE:
-                self.update_source(None)
-                _LOGGER.info('!!! SWITCH TO APPS !!!')
-            elif parsed.cmd == Cmd.CEC_MSG_STANDBY:
-                self.update_power_state(False)
-        if parsed.initiator in (0, 5):
-            if parsed.cmd == Cmd.CEC_MSG_ROUTING_CHANGE:
-                sound_bar_index = parsed.args[2] & 0xf
-                if sound_bar_index:
-                    resolved_index = SOUND_BAR_INDEX_MAP.index(sound_bar_index)
-                    source = self._attr_source_list[resolved_index + 4]
-                else:
-                    source = self._attr_source_list[(parsed.args[2] >> 4) - 1]
-                if self._attr_source_list.index(source) != 0:
-                    self.update_source(source)
-                    _LOGGER.info(f'!!! SWITCH TO ANOTHER INPUT (%s.%s) !!!', parsed.args[2] >> 4, sound_bar_index)
-            elif parsed.cmd == Cmd.CEC_MSG_SET_STREAM_PATH:
-                sound_bar_index = parsed.args[0] & 0xf
-                if sound_bar_index:
-                    resolved_index = SOUND_BAR_INDEX_MAP.index(sound_bar_index)
-                    source = self._attr_source_list[resolved_index + 4]
-                else:
-                    source = self._attr_source_list[(parsed.args[0] >> 4) - 1]
+        if self.adapter.process_msg(msg):
+            return
+        raw = msg.msg
+        if len(raw) < 2:
+            return
+        initiator = raw[0] >> 4
+        destination = raw[0] & 0xf
+        opcode = raw[1]
+        args = raw[2:]
+        self.topology.observe(initiator, destination, opcode, args)
+        entry = self._dispatch.get(opcode)
+        if entry is not None and len(args) >= entry[0]:
+            entry[1](initiator, destination, args)
+
+    def _on_give_power_status(self, initiator, destination, args):
+        if initiator == 0:
+            _LOGGER.debug('reporting power status')
+            self.hass.async_create_task(self.async_report_power_status(initiator))
+
+    async def async_report_power_status(self, destination):
+        try:
+            await self.adapter.async_send(destination, Cmd.CEC_MSG_REPORT_POWER_STATUS, PwrState.CEC_OP_POWER_STATUS_ON)
+        except (TimeoutError, CecTransmitError, OSError) as e:
+            _LOGGER.warning('cannot report power status to %d: %s', destination, e)
+
+    def _on_report_power_status(self, initiator, destination, args):
+        if initiator == 0:
+            pwr_state = args[0]
+            power_state = pwr_state in (PwrState.CEC_OP_POWER_STATUS_ON.value, PwrState.CEC_OP_POWER_STATUS_TO_ON.value)
+            # Transitional states get re-polled until they settle
+            self.observe_power_state(power_state, pwr_state in (PwrState.CEC_OP_POWER_STATUS_ON.value,
+                                                                PwrState.CEC_OP_POWER_STATUS_STANDBY.value))
+
+    def _on_active_source(self, initiator, destination, args):
+        if initiator == 0:
+            self.update_source(None)
+            _LOGGER.info('!!! SWITCH TO APPS !!!')
+        self.observe_power_state(True, initiator == 0)
+
+    def _on_standby(self, initiator, destination, args):
+        if initiator == 0 or destination == 15:
+            self.observe_power_state(False, initiator == 0)
+
+    def _on_image_view_on(self, initiator, destination, args):
+        if destination == 0:
+            self.observe_power_state(True, False)
+
+    def _on_routing_change(self, initiator, destination, args):
+        if initiator in (0, 5):
+            source = SOURCE_BY_PHYS_ADDR.get(args[2] << 8)
+            if source is not None and source != SOURCE_LIST[0]:
+                self.update_source(source)
+                _LOGGER.info(f'!!! SWITCH TO ANOTHER INPUT (%s.%s) !!!', args[2] >> 4, args[2] & 0xf)
+
+    def _on_set_stream_path(self, initiator, destination, args):
+        if initiator in (0, 5):
+            source = SOURCE_BY_PHYS_ADDR.get(args[0] << 8)
+            if source is not None:
                 self.update_source(source)
-                _LOGGER.info(f'!!! SWITCH TO ME (%s.%s) !!!', parsed.args[0] >> 4, sound_bar_index)
-        if parsed.initiator == 5:
-            if parsed.cmd == Cmd.CEC_MSG_ROUTING_INFORMATION:
-                sound_bar_index = parsed.args[0] & 0xf
-                if sound_bar_index:
-                    resolved_index = SOUND_BAR_INDEX_MAP.index(sound_bar_index)
-                    source = self._attr_source_list[resolved_index + 4]
-                    self.update_source(source)
-                    _LOGGER.info(f'!!! SWITCH TO SOUND BAR INPUT (%s.%s) !!!', parsed.args[0] >> 4, sound_bar_index)
+                _LOGGER.info(f'!!! SWITCH TO ME (%s.%s) !!!', args[0] >> 4, args[0] & 0xf)
+
+    def _on_routing_information(self, initiator, destination, args):
+        if initiator == 5 and args[0] & 0xf:
+            source = SOURCE_BY_PHYS_ADDR.get(args[0] << 8)
+            if source is not None:
+                self.update_source(source)
+                _LOGGER.info(f'!!! SWITCH TO SOUND BAR INPUT (%s.%s) !!!', args[0] >> 4, args[0] & 0xf)
+
+    def _on_report_audio_status(self, initiator, destination, args):
+        if initiator != CEC_LOG_ADDR_AUDIOSYSTEM:
+            return
+        volume = args[0] & CEC_OP_AUD_VOLUME_MASK
+        if volume <= CEC_OP_AUD_VOLUME_MAX:
+            self._audio_volume = volume
+            self._attr_volume_level = volume / CEC_OP_AUD_VOLUME_MAX
+        self._audio_reports += 1
+        self._attr_is_volume_muted = bool(args[0] & CEC_OP_AUD_MUTE_STATUS_ON)
+        self.schedule_update_ha_state()
+
+    async def async_get_diagnostics(self):
+        return {
+            'path': self.adapter.path,
+            'log_addr': self.adapter.log_addr,
+            'phys_addr': None if self.adapter.phys_addr is None else phys_addr_to_string(self.adapter.phys_addr),
+            'tx': {opcode_name(opcode): stats.as_dict() for opcode, stats in self.adapter.tx_stats.items()},
+            'reply_latency_ms': {opcode_name(opcode): latency * 1000
+                                 for opcode, latency in self.adapter.reply_latency.items()},
+            'switch_latency_ms': {source: latency * 1000 for source, latency in self.switch_latency.items()},
+            'topology': self.topology.as_dict(),
+        }
+
+    def record(self, kind, buf):
+        if self.recorder.record(kind, buf):
+            # Chunks are written on the I/O worker, which keeps them in order
+            self.adapter.submit(self.recorder.write, self.recorder.take())
+
+    async def async_start_recording(self, filename):
+        """Append raw bus traffic to filename, relative to the config dir.
+
+        The file must be in a directory listed in allowlist_external_dirs.
+        """
+        path = self.hass.config.path(filename)
+        if not self.hass.config.is_allowed_path(path):
+            raise HomeAssistantError(f'{path} is not in an allowed directory')
+        await self.async_stop_recording()
+        self.recorder = await self.adapter.async_run(CecRecorder.open, path)
+        _LOGGER.info('recording CEC traffic to %s', path)
+
+    async def async_stop_recording(self):
+        recorder = self.recorder
+        if recorder is None:
+            return
+        self.recorder = None
+        await self.adapter.async_run(recorder.close)
 
     def read_ready(self):
         try:
-            event = CecEvent.deque(self.fd)
+            event = CecEvent.deque(self.adapter.fd, self.adapter.buffers.event)
             while event is not None:
+                if self.recorder is not None:
+                    self.record(KIND_EVENT, event.buf)
                 self.process_event(event)
-                event = CecEvent.deque(self.fd)
+                event = CecEvent.deque(self.adapter.fd, self.adapter.buffers.event)
 
-            msg = CecMsg.receive(self.fd)
+            msg = CecMsg.receive(self.adapter.fd, self.adapter.buffers.rx)
             while msg is not None:
+                if self.recorder is not None:
+                    self.record(KIND_MSG, msg.buf)
                 self.process_msg(msg)
-                msg = CecMsg.receive(self.fd)
+                msg = CecMsg.receive(self.adapter.fd, self.adapter.buffers.rx)
         except OSError as e:
-            self.open_fd()
+            self._remove_reader()
+            self.hass.async_create_task(self.async_open_adapter())
             raise e
 
-    def turn_on(self) -> None:
-        laddr = get_laddr(self.fd)
-        msg_buf = CecParsedMsg.build(laddr, 0,
-                                     Cmd.CEC_MSG_IMAGE_VIEW_ON)
-        CecMsg.transmit(self.fd, msg_buf, False)
-        self.update_power_state(True)
+    async def async_turn_on(self) -> None:
+        try:
+            await self.adapter.async_send(0, Cmd.CEC_MSG_IMAGE_VIEW_ON)
+        except (TimeoutError, CecTransmitError, OSError) as e:
+            raise HomeAssistantError(f'cannot turn on the TV: {e}') from e
+        self.expect_power_state(True)
+
+    async def async_turn_off(self) -> None:
+        try:
+            await self.adapter.async_send(15, Cmd.CEC_MSG_STANDBY)
+        except (TimeoutError, CecTransmitError, OSError) as e:
+            raise HomeAssistantError(f'cannot put the bus in standby: {e}') from e
+        self.expect_power_state(False)
+
+    async def async_select_source(self, source: str) -> None:
+        start = time.monotonic()
+        self.cancel_source_restore()
+        try:
+            sent = await self.adapter.async_run(self.adapter.switch_source, PHYS_ADDR_BY_SOURCE[source])
+        except (CecTransmitError, OSError) as e:
+            raise HomeAssistantError(f'cannot switch to {source}: {e}') from e
+        self.switch_latency[source] = sent - start
+        _LOGGER.debug('switched to %s in %.1f ms', source, (sent - start) * 1000)
+        self._cancel_source_restore = async_call_later(self.hass, SOURCE_RESTORE_DELAY, self.async_restore_addrs)
+        self.update_source(source)
+
+    def cancel_source_restore(self):
+        if self._cancel_source_restore:
+            self._cancel_source_restore()
+            self._cancel_source_restore = None
+
+    async def async_restore_addrs(self, _: datetime | None = None) -> None:
+        self._cancel_source_restore = None
+        try:
+            await self.adapter.async_run(self.adapter.restore_addrs)
+        except OSError as e:
+            _LOGGER.warning('cannot restore addresses on %s: %s', self.adapter.path, e)
 
-    def turn_off(self) -> None:
-        laddr = get_laddr(self.fd)
-        msg_buf = CecParsedMsg.build(laddr, 15,
-                                     Cmd.CEC_MSG_STANDBY)
-        CecMsg.transmit(self.fd, msg_buf, False)
-        self.update_power_state(False)
+    async def _async_play(self, presses: list[CecKeyPress], destination=0) -> None:
+        try:
+            await self.adapter.key_sequencer.async_play(presses, destination)
+        except (TimeoutError, CecTransmitError, OSError) as e:
+            raise HomeAssistantError(f'cannot send key presses: {e!r}') from e
+
+    async def async_send_ui_command(self, ui_command: UiCmd) -> None:
+        await self._async_play([CecKeyPress(ui_command)])
+
+    async def async_volume_up(self) -> None:
+        await self.async_send_ui_command(UiCmd.CEC_OP_UI_CMD_VOLUME_UP)
+
+    async def async_volume_down(self) -> None:
+        await self.async_send_ui_command(UiCmd.CEC_OP_UI_CMD_VOLUME_DOWN)
+
+    async def async_set_volume_level(self, volume: float) -> None:
+        """Step the audio system to volume with volume keys.
+
+        Each round confirms the level with GIVE_AUDIO_STATUS and presses the
+        key as often as the learned step size calls for, probing with a
+        single press until the step is known. Reports the audio system sends
+        while the keys go out end a round early once they show the target
+        reached; they lag the presses, so they never steer the count.
+        """
+        target = round(volume * CEC_OP_AUD_VOLUME_MAX)
+        presses = 0
+        level = await self._async_confirmed_volume()
+        for _ in range(VOLUME_SET_MAX_ROUNDS):
+            step = self._volume_step or 1.0
+            if abs(target - level) * 2 <= step or presses >= VOLUME_SET_MAX_PRESSES:
+                return
+            up = target > level
+            count = round(abs(target - level) / step) if self._volume_step else 1
+            count = max(1, min(count, VOLUME_SET_MAX_PRESSES - presses))
+            key = CecKeyPress(UiCmd.CEC_OP_UI_CMD_VOLUME_UP if up else UiCmd.CEC_OP_UI_CMD_VOLUME_DOWN)
+            reports = self._audio_reports
+            sent = 0
+            while sent < count:
+                reported = self._audio_volume
+                if self._audio_reports != reports and reported is not None and \
+                        (reported >= target if up else reported <= target):
+                    break
+                await self._async_play([key], CEC_LOG_ADDR_AUDIOSYSTEM)
+                sent += 1
+            presses += sent
+            previous, level = level, await self._async_confirmed_volume()
+            if level != previous and 0 < level < CEC_OP_AUD_VOLUME_MAX:
+                self._volume_step = min(max(abs(level - previous) / sent, 1.0), VOLUME_STEP_MAX)
+
+    async def _async_confirmed_volume(self) -> int:
+        try:
+            volume, _ = await self.async_query_audio_status()
+        except (TimeoutError, CecFeatureAbortError, CecTransmitError) as e:
+            raise HomeAssistantError(f'audio system did not report its status: {e}') from e
+        if volume is None:
+            raise HomeAssistantError('audio system reports an unknown volume')
+        return volume
+
+    async def async_mute_volume(self, mute: bool) -> None:
+        try:
+            await self.adapter.key_sequencer.async_play(
+                [CecKeyPress(UiCmd.CEC_OP_UI_CMD_MUTE_FUNCTION if mute else UiCmd.CEC_OP_UI_CMD_RESTORE_VOLUME_FUNCTION)],
+                CEC_LOG_ADDR_AUDIOSYSTEM)
+            _, muted = await self.async_query_audio_status()
+            if muted != mute:
+                # The explicit mute functions are optional; fall back to toggling
+                await self.adapter.key_sequencer.async_play([CecKeyPress(UiCmd.CEC_OP_UI_CMD_MUTE)],
+                                                            CEC_LOG_ADDR_AUDIOSYSTEM)
+                await self.async_query_audio_status()
+        except (TimeoutError, CecFeatureAbortError, CecTransmitError) as e:
+            raise HomeAssistantError(f'cannot {"mute" if mute else "unmute"} the audio system: {e!r}') from e
 
-    def select_source(self, source: str) -> None:
-        index = self._attr_source_list.index(source)
+    async def async_press_button(self, button):
+        command = UI_COMMAND_TABLE[button]
+        _LOGGER.info("pressed button %s -> %s", button, command)
+        await self.async_send_ui_command(command)
 
-        # Perform this intricate sequence with a blocking file descriptor
-        tmp_fd = os.open(self.path, os.O_RDWR)
-        cec_s_mode(tmp_fd, CEC_MODE_INITIATOR)
+    async def async_press_sequence(self, sequence, interrupt=False):
+        if interrupt:
+            self.adapter.key_sequencer.cancel()
+        await self._async_play([
+            CecKeyPress(UI_COMMAND_TABLE[step[ATTR_BUTTON]], step[ATTR_HOLD], step[ATTR_REPEAT], step[ATTR_GAP])
+            for step in sequence
+        ])
 
-        try:
-            old_phys_addr = cec_g_phys_addr(tmp_fd)
-            laddrs = CecLogAddrs.get(tmp_fd)
 
-            try:
-                clear_laddrs(tmp_fd)
-                _LOGGER.debug(f'clear log_addr')
-                if index >= 4:
-                    sound_bar_index = SOUND_BAR_INDEX_MAP[index - 4]
-                    phys_addr = (1 << 12) | (sound_bar_index << 8)
-                else:
-                    phys_addr = (index + 1) << 12
-                cec_s_phys_addr(tmp_fd, phys_addr)
-                _LOGGER.debug(f'phys_addr < {phys_addr_to_string(phys_addr)}')
-                laddrs.set(tmp_fd)
-                _LOGGER.debug(f'log_addr < {laddrs.log_addr[0]}')
-
-                laddr = get_laddr(tmp_fd)
-                _LOGGER.debug(f'log_addr > {laddr}')
-
-                msg_buf = CecParsedMsg.build(laddr, 15,
-                                             Cmd.CEC_MSG_ACTIVE_SOURCE, phys_addr >> 8, phys_addr & 0xff)
-                CecMsg.transmit(tmp_fd, msg_buf, False)
-                _LOGGER.debug(f'active_source < {phys_addr_to_string(phys_addr)}')
-
-                self.update_source(self._attr_source_list[index])
-            finally:
-                clear_laddrs(tmp_fd)
-                _LOGGER.debug(f'clear log_addr')
-                cec_s_phys_addr(tmp_fd, old_phys_addr)
-                _LOGGER.debug(f'phys_addr < {phys_addr_to_string(old_phys_addr)}')
-                laddrs.set(tmp_fd)
-                _LOGGER.debug(f'log_addr < {laddrs.log_addr[0]}')
-        finally:
-            os.close(tmp_fd)
+def find_adapter_paths():
+    return sorted(os.path.join(CEC_DEVICE_DIR, name) for name in os.listdir(CEC_DEVICE_DIR)
+                  if CEC_DEVICE_RE.fullmatch(name))
 
-    def send_ui_command(self, ui_command: UiCmd) -> None:
-        laddr = get_laddr(self.fd)
-        msg_buf = CecParsedMsg.build(laddr, 0,
-                                     Cmd.CEC_MSG_USER_CONTROL_PRESSED,
-                                     ui_command)
-        CecMsg.transmit(self.fd, msg_buf, False)
-        msg_buf = CecParsedMsg.build(laddr, 0,
-                                     Cmd.CEC_MSG_USER_CONTROL_RELEASED)
-        CecMsg.transmit(self.fd, msg_buf, False)
 
-    def volume_up(self) -> None:
-        self.send_ui_command(UiCmd.CEC_OP_UI_CMD_VOLUME_UP)
+class CecAdapterManager:
+    """Keeps one entity per /dev/cecN.
 
-    def volume_down(self) -> None:
-        self.send_ui_command(UiCmd.CEC_OP_UI_CMD_VOLUME_DOWN)
+    Adapters are followed through inotify on /dev: new nodes get an entity,
+    removed ones turn their entity unavailable until they come back.
+    """
 
-    async def async_press_button(self, button):
-        command = UI_COMMAND_TABLE[button]
-        _LOGGER.info("pressed button %s -> %s", button, command)
-        self.send_ui_command(command)
+    def __init__(self, hass: HomeAssistant, async_add_entities: AddEntitiesCallback):
+        self.hass = hass
+        self._async_add_entities = async_add_entities
+        self.entities = {}
+        self._inotify = None
+
+    async def async_start(self):
+        paths = await self.hass.async_add_executor_job(find_adapter_paths)
+        self.add_adapters([DEFAULT_ADAPTER_PATH, *paths])
+        try:
+            self._inotify = Inotify(CEC_DEVICE_DIR, IN_CREATE | IN_DELETE | IN_ATTRIB)
+        except OSError as e:
+            _LOGGER.warning('cannot watch %s for CEC adapters, relying on reopen retries: %s', CEC_DEVICE_DIR, e)
+            return
+        self.hass.loop.add_reader(self._inotify.fd, self._inotify_ready)
+        self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_stop)
+
+    def add_adapters(self, paths):
+        entities = []
+        for path in paths:
+            if path not in self.entities:
+                entity = self.entities[path] = HdmiCecKernelEntity(CecAdapter(path))
+                entities.append(entity)
+        if entities:
+            self._async_add_entities(entities)
+
+    def _inotify_ready(self):
+        for mask, name in self._inotify.read_events():
+            if not CEC_DEVICE_RE.fullmatch(name):
+                continue
+            path = os.path.join(CEC_DEVICE_DIR, name)
+            entity = self.entities.get(path)
+            if mask & IN_DELETE:
+                if entity is not None:
+                    _LOGGER.info('%s removed', path)
+                    self.hass.async_create_task(entity.async_adapter_removed())
+            elif entity is None:
+                _LOGGER.info('%s added', path)
+                self.add_adapters([path])
+            else:
+                entity.adapter_added()
+
+    async def _async_stop(self, _event):
+        self.hass.loop.remove_reader(self._inotify.fd)
+        self._inotify.close()
+        self._inotify = None
 
 
 async def async_setup_platform(
@@ -626,12 +1816,26 @@ async def async_setup_platform(
     async_add_entities: AddEntitiesCallback,
     discovery_info: DiscoveryInfoType | None = None,
 ) -> None:
-    async_add_entities([HdmiCecKernelEntity()])
+    manager = hass.data[DATA_CEC_ADAPTERS] = CecAdapterManager(hass, async_add_entities)
+    await manager.async_start()
 
     platform = async_get_current_platform()
 
     platform.async_register_entity_service(
         SERVICE_PRESS_BUTTON, PRESS_BUTTON_SCHEMA, "async_press_button"
     )
+    platform.async_register_entity_service(
+        SERVICE_PRESS_SEQUENCE, PRESS_SEQUENCE_SCHEMA, "async_press_sequence"
+    )
+    platform.async_register_entity_service(
+        SERVICE_GET_DIAGNOSTICS, cv.make_entity_service_schema({}), "async_get_diagnostics",
+        supports_response=SupportsResponse.ONLY,
+    )
+    platform.async_register_entity_service(
+        SERVICE_START_RECORDING, START_RECORDING_SCHEMA, "async_start_recording"
+    )
+    platform.async_register_entity_service(
+        SERVICE_STOP_RECORDING, cv.make_entity_service_schema({}), "async_stop_recording"
+    )
 
 
@@ -0,0 +1,82 @@
+"""Append-only binary log of raw CEC_RECEIVE/CEC_DQEVENT buffers.
+
+The log starts with LOG_MAGIC, followed by records of a RECORD_HEADER
+(kind, wall clock timestamp) and the raw ioctl struct, whose size is implied
+by the kind.
+"""
+
+import struct
+import time
+
+LOG_MAGIC = b'CECLOG01'
+RECORD_HEADER = struct.Struct('<Bd')
+
+KIND_MSG = 1
+KIND_EVENT = 2
+
+# sizeof(struct cec_msg) and sizeof(struct cec_event)
+RECORD_SIZES = {
+    KIND_MSG: 56,
+    KIND_EVENT: 80,
+}
+
+
+class CecRecorder:
+    """Buffers records in memory and appends them to the log in chunks.
+
+    record() runs on the event loop; write() does the file I/O and belongs
+    on a worker thread.
+    """
+
+    FLUSH_SIZE = 4096
+
+    def __init__(self, file):
+        self._file = file
+        self._pending = bytearray()
+
+    @staticmethod
+    def open(path):
+        file = open(path, 'ab')
+        if file.tell() == 0:
+            file.write(LOG_MAGIC)
+        return CecRecorder(file)
+
+    def record(self, kind, buf) -> bool:
+        """Queue a raw buffer; returns True once a chunk is ready to write."""
+        self._pending += RECORD_HEADER.pack(kind, time.time())
+        self._pending += buf
+        return len(self._pending) >= self.FLUSH_SIZE
+
+    def take(self) -> bytes:
+        chunk = bytes(self._pending)
+        self._pending.clear()
+        return chunk
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self._file.flush()
+
+    def close(self):
+        self.write(self.take())
+        self._file.close()
+
+
+def read_log(path):
+    """Yield (kind, timestamp, buf) for every complete record in a log."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if not data.startswith(LOG_MAGIC):
+        raise ValueError(f'{path} is not a CEC log')
+    view = memoryview(data)
+    offset = len(LOG_MAGIC)
+    while offset + RECORD_HEADER.size <= len(view):
+        kind, ts = RECORD_HEADER.unpack_from(view, offset)
+        offset += RECORD_HEADER.size
+        size = RECORD_SIZES.get(kind)
+        if size is None:
+            raise ValueError(f'unknown record kind {kind} at offset {offset - RECORD_HEADER.size}')
+        if offset + size > len(view):
+            # Torn final record from an interrupted write
+            return
+        yield kind, ts, bytes(view[offset:offset + size])
+        offset += size
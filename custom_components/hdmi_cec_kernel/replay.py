@@ -0,0 +1,220 @@
+"""Deterministic replay of recorded CEC traffic without /dev/cec.
+
+Feeds a recorder log through HdmiCecKernelEntity behind a fake adapter whose
+ioctls are answered in memory. Run from the repository root with a Home
+Assistant environment:
+
+    python -m custom_components.hdmi_cec_kernel.replay cec-traffic.log
+"""
+
+import asyncio
+import errno
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from homeassistant.core import HomeAssistant
+
+from . import media_player
+from .media_player import (
+    CEC_ADAP_G_PHYS_ADDR,
+    CEC_ADAP_S_PHYS_ADDR,
+    CEC_G_MODE,
+    CEC_LOG_ADDR_INVALID,
+    CEC_S_MODE,
+    CecAdapter,
+    CecEvent,
+    CecLogAddrs,
+    CecMsg,
+    HdmiCecKernelEntity,
+    RxStatus,
+    TxStatus,
+)
+from .recorder import KIND_MSG, read_log
+
+REPLAY_ENTITY_ID = 'media_player.hdmi_cec_kernel_replay'
+
+
+class FakeCecDevice:
+    """In-memory stand-in for the kernel side of a /dev/cecN descriptor.
+
+    Transmits succeed unless a tx_status is queued in tx_failures. Nothing
+    on the fake bus answers, so requests that ask the kernel to wait for a
+    reply get its timeout status back, after the requested timeout scaled by
+    time_scale. Claiming logical addresses takes claim_time seconds, standing
+    in for the kernel polling the bus, and gets claim_log_addr, by default
+    log_addr. An adapter without an HDMI link yet has log_addr and
+    claim_log_addr CEC_LOG_ADDR_INVALID, as the kernel reports it.
+    """
+
+    def __init__(self, log_addr=4, phys_addr=0x1000, time_scale=0.001, claim_time=0.0, claim_log_addr=None):
+        self.phys_addr = phys_addr
+        self.claim_log_addr = log_addr if claim_log_addr is None else claim_log_addr
+        self.mode = 0
+        self.log_addrs = bytearray(CecLogAddrs.CEC_LOG_ADDRS_STRUCT_SIZE)
+        self.log_addrs[:4] = bytes((log_addr, CEC_LOG_ADDR_INVALID, CEC_LOG_ADDR_INVALID, CEC_LOG_ADDR_INVALID))
+        self.log_addrs[7] = 1  # num_log_addrs
+        self.rx = deque()
+        self.events = deque()
+        self.transmitted = []
+        self.tx_failures = deque()
+        self.sequence = 0
+        self.time_scale = time_scale
+        self.claim_time = claim_time
+        # schedule(delay, buf) is called from the I/O worker to deliver a
+        # kernel reply status once delay seconds have passed
+        self.schedule = None
+
+    def queue(self, kind, buf):
+        (self.rx if kind == KIND_MSG else self.events).append(bytes(buf))
+
+    def ioctl(self, fd, cmd, buf):
+        if cmd == CecMsg.CEC_RECEIVE:
+            self._pop(self.rx, buf)
+        elif cmd == CecEvent.CEC_DQEVENT:
+            self._pop(self.events, buf)
+        elif cmd == CecMsg.CEC_TRANSMIT:
+            self._transmit(buf)
+        elif cmd == CecLogAddrs.CEC_ADAP_G_LOG_ADDRS:
+            buf[:] = self.log_addrs
+        elif cmd == CecLogAddrs.CEC_ADAP_S_LOG_ADDRS:
+            self.log_addrs[:] = buf
+            if not buf[7]:
+                self.log_addrs[:4] = bytes((CEC_LOG_ADDR_INVALID,) * 4)
+            else:
+                if self.claim_time:
+                    time.sleep(self.claim_time)
+                # Written back like the kernel does
+                self.log_addrs[0] = self.claim_log_addr
+                buf[:] = self.log_addrs
+        elif cmd == CEC_ADAP_G_PHYS_ADDR:
+            struct.pack_into('H', buf, 0, self.phys_addr)
+        elif cmd == CEC_ADAP_S_PHYS_ADDR:
+            self.phys_addr = struct.unpack('H', buf)[0]
+        elif cmd == CEC_S_MODE:
+            self.mode = struct.unpack('I', buf)[0]
+        elif cmd == CEC_G_MODE:
+            struct.pack_into('I', buf, 0, self.mode)
+        else:
+            raise OSError(errno.ENOTTY, os.strerror(errno.ENOTTY))
+
+    @staticmethod
+    def _pop(queue, buf):
+        try:
+            buf[:] = queue.popleft()
+        except IndexError:
+            raise BlockingIOError(errno.EAGAIN, os.strerror(errno.EAGAIN)) from None
+
+    def _transmit(self, buf):
+        self.sequence += 1
+        msg = CecMsg(buf)
+        struct.pack_into('I', buf, 24, self.sequence)
+        self.transmitted.append(bytes(msg.msg))
+        if self.tx_failures:
+            tx_status = self.tx_failures.popleft()
+            buf[50] = tx_status | TxStatus.CEC_TX_STATUS_MAX_RETRIES.value
+            buf[51] = 4 if tx_status & TxStatus.CEC_TX_STATUS_ARB_LOST.value else 0
+            buf[52] = 4 if tx_status & TxStatus.CEC_TX_STATUS_NACK.value else 0
+            return
+        buf[50] = TxStatus.CEC_TX_STATUS_OK.value
+        if msg.reply and msg.timeout and self.schedule is not None:
+            status = bytearray(buf)
+            status[49] = RxStatus.CEC_RX_STATUS_TIMEOUT.value
+            self.schedule(msg.timeout / 1000 * self.time_scale, bytes(status))
+
+
+class FakeCecAdapter(CecAdapter):
+    """CecAdapter over /dev/null; pair with fake_ioctl() for the ioctls."""
+
+    def __init__(self):
+        super().__init__(os.devnull)
+
+
+@contextmanager
+def fake_ioctl(device: FakeCecDevice):
+    """Route every CEC ioctl in this process to device.
+
+    Only for replays and benchmarks: a real adapter open in the same process
+    would be routed there as well.
+    """
+    saved = media_player.do_ioctl
+    media_player.do_ioctl = device.ioctl
+    try:
+        yield device
+    finally:
+        media_player.do_ioctl = saved
+
+
+class ReplayResult(NamedTuple):
+    entity: HdmiCecKernelEntity
+    device: FakeCecDevice
+    messages: int
+    events: int
+    elapsed: float
+
+    @property
+    def rate(self):
+        """Received messages processed per second."""
+        return self.messages / self.elapsed if self.elapsed else 0.0
+
+
+async def async_replay(hass: HomeAssistant, records, realtime=False, device: FakeCecDevice = None) -> ReplayResult:
+    """Feed (kind, timestamp, buf) records through a fresh entity.
+
+    Each record is delivered by its own read_ready wakeup, as the kernel
+    would. With realtime, the recorded gaps between records are kept.
+    device defaults to a configured adapter at 1.0.0.0.
+    """
+    if device is None:
+        device = FakeCecDevice()
+    entity = HdmiCecKernelEntity(FakeCecAdapter())
+    entity.hass = hass
+    entity.entity_id = REPLAY_ENTITY_ID
+    messages = 0
+    events = 0
+
+    def deliver(buf):
+        device.rx.append(buf)
+        entity.read_ready()
+
+    device.schedule = lambda delay, buf: hass.loop.call_soon_threadsafe(hass.loop.call_later, delay, deliver, buf)
+    with fake_ioctl(device):
+        try:
+            await entity.adapter.async_run(entity.adapter.open)
+            start = time.perf_counter()
+            last_ts = None
+            for kind, ts, buf in records:
+                if realtime and last_ts is not None and ts > last_ts:
+                    await asyncio.sleep(ts - last_ts)
+                last_ts = ts
+                device.queue(kind, buf)
+                entity.read_ready()
+                if kind == KIND_MSG:
+                    messages += 1
+                else:
+                    events += 1
+            await hass.async_block_till_done()
+            elapsed = time.perf_counter() - start
+        finally:
+            await entity.async_will_remove_from_hass()
+    return ReplayResult(entity, device, messages, events, elapsed)
+
+
+async def async_main(path, realtime=False):
+    hass = HomeAssistant(tempfile.gettempdir())
+    result = await async_replay(hass, list(read_log(path)), realtime)
+    print(f'{result.messages} messages, {result.events} events in {result.elapsed * 1000:.1f} ms '
+          f'({result.rate:.0f} msgs/s)')
+    print(f'state {result.entity.state}, source {result.entity.source}')
+    print(f'transmitted {len(result.device.transmitted)}: '
+          f'{" ".join(msg.hex() for msg in result.device.transmitted)}')
+    print(f'topology {result.entity.topology.as_dict()}')
+
+
+if __name__ == '__main__':
+    asyncio.run(async_main(sys.argv[1], '--realtime' in sys.argv[2:]))
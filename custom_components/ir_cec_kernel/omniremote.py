@@ -1,57 +1,332 @@
-import lirc
+"""One remote for the TV and the sound bar, over HDMI-CEC and IR.
+
+Logical commands map to a CEC action, an IR action or both. A command that
+either bus can carry goes over CEC while its target is on the bus, as CEC
+is acknowledged and takes milliseconds, and falls back to IR when CEC
+fails. Power goes to the TV over CEC, and to the sound bar over IR only
+when the bar is not on the bus to follow the TV, or CEC failed: its Power
+key is a toggle, so sending it too would undo what CEC did. Every route's latency and success rate is tracked: a route is tried
+first until it has been measured, then the faster one wins, and one that
+keeps failing goes last until it has had time to recover.
+"""
+
+import asyncio
 import logging
-import socket
-from typing import Iterable
+import time
+from typing import Awaitable, Callable, Iterable, NamedTuple
 
-from homeassistant.components.remote import RemoteEntity
+from homeassistant.components.remote import (
+    ATTR_DELAY_SECS,
+    ATTR_NUM_REPEATS,
+    DEFAULT_DELAY_SECS,
+    DEFAULT_NUM_REPEATS,
+    RemoteEntity,
+)
+from homeassistant.exceptions import HomeAssistantError
 
+from ..a_lirc.lircd import IRBlaster, LircdError, async_acquire_transport, async_release_transport
+from ..a_lirc.nakamichi import NakamichiModel, async_get_model
+from ..hdmi_cec_kernel.media_player import (
+    CEC_LOG_ADDR_AUDIOSYSTEM,
+    DATA_CEC_ADAPTERS,
+    SOURCE_LIST,
+    UI_COMMAND_TABLE,
+    CecFeatureAbortError,
+    CecKeyPress,
+    CecTransmitError,
+    HdmiCecKernelEntity,
+    UiCmd,
+)
 
-class IRBlaster:
-    def __init__(self):
-        self.client = lirc.Client(
-            connection=lirc.LircdConnection(
-                address="/lircd/lircd-blaster",
-                socket=socket.socket(socket.AF_UNIX, socket.SOCK_STREAM),
-                timeout=5.0
-            )
-        )
+_LOGGER = logging.getLogger(__name__)
+
+LIRCD_SOCKET = '/lircd/lircd-blaster'
+
+ROUTE_CEC = 'cec'
+ROUTE_IR = 'ir'
+
+# Weight of the newest outcome in the latency and success averages
+ROUTE_EWMA_WEIGHT = 0.2
+# A route whose success rate drops below this is tried last, until it has
+# gone this long without failing
+ROUTE_SUCCESS_MIN = 0.5
+ROUTE_RETRY_AFTER = 60.0
+
+# What a failing route raises; anything else is a bug and propagates
+ROUTE_ERRORS = (OSError, TimeoutError, LircdError, CecTransmitError, CecFeatureAbortError, HomeAssistantError)
+
+# TV inputs that are sound bar inputs, by the bar's name for them
+SOUND_BAR_SOURCES = {
+    'HDMI 1.2': 'HDMI 2',
+    'HDMI 1.3': 'HDMI 3',
+    'HDMI 1.4': 'HDMI 4',
+}
+
+
+class OmniCommand(NamedTuple):
+    # Sent through the CEC entity whose bus has cec_target on it
+    cec: Callable[[HdmiCecKernelEntity], Awaitable] | None = None
+    cec_target: int = 0
+    # Sent through the sound bar model
+    ir: Callable[[NakamichiModel, IRBlaster], Awaitable] | None = None
+    # IR as well, after CEC, unless CEC got through and this address is on
+    # the bus to act on it; for commands whose targets may sit on
+    # different buses
+    ir_unless_heard: int | None = None
+    # What the sound bar model learns when the CEC route got through, and
+    # the bar keys whose effect a failed CEC send leaves uncertain
+    cec_observe: Callable[[NakamichiModel], None] | None = None
+    cec_uncertain: tuple[str, ...] = ()
+
+
+def cec_key(ui_command: UiCmd, destination=0):
+    return lambda entity: entity.adapter.key_sequencer.async_play([CecKeyPress(ui_command)], destination)
+
+
+def ir_key(key):
+    return lambda model, blaster: model.async_send_keys(blaster, [key])
+
+
+def cec_source(source):
+    return lambda entity: entity.async_select_source(source)
+
+
+def ir_source(source):
+    return lambda model, blaster: model.async_set(blaster, power=True, source=source)
+
+
+def observe_keys(*keys):
+    return lambda model: model.observe_keys(keys)
+
+
+def observe_source(source):
+    # Routing to a sound bar input wakes the bar and switches it there
+    return lambda model: model.observe(power=True, source=source)
 
-    def send_command(self, command):
-        self.client.send_once("nakaw", command)
 
+OMNI_COMMANDS = {
+    'power_on': OmniCommand(
+        cec=lambda entity: entity.async_turn_on(),
+        ir=lambda model, blaster: model.async_set(blaster, power=True),
+        ir_unless_heard=CEC_LOG_ADDR_AUDIOSYSTEM,
+        cec_observe=lambda model: model.observe(power=True)),
+    'power_off': OmniCommand(
+        cec=lambda entity: entity.async_turn_off(),
+        ir=lambda model, blaster: model.async_set(blaster, power=False),
+        ir_unless_heard=CEC_LOG_ADDR_AUDIOSYSTEM,
+        cec_observe=lambda model: model.observe(power=False)),
+    'volume_up': OmniCommand(
+        cec=cec_key(UiCmd.CEC_OP_UI_CMD_VOLUME_UP, CEC_LOG_ADDR_AUDIOSYSTEM), cec_target=CEC_LOG_ADDR_AUDIOSYSTEM,
+        ir=ir_key('VolPlus'), cec_observe=observe_keys('VolPlus'), cec_uncertain=('VolPlus',)),
+    'volume_down': OmniCommand(
+        cec=cec_key(UiCmd.CEC_OP_UI_CMD_VOLUME_DOWN, CEC_LOG_ADDR_AUDIOSYSTEM), cec_target=CEC_LOG_ADDR_AUDIOSYSTEM,
+        ir=ir_key('VolMinus'), cec_observe=observe_keys('VolMinus'), cec_uncertain=('VolMinus',)),
+    'mute': OmniCommand(
+        cec=cec_key(UiCmd.CEC_OP_UI_CMD_MUTE, CEC_LOG_ADDR_AUDIOSYSTEM), cec_target=CEC_LOG_ADDR_AUDIOSYSTEM,
+        ir=ir_key('Mute'), cec_observe=observe_keys('Mute'), cec_uncertain=('Mute',)),
+    **{button: OmniCommand(cec=cec_key(ui_command)) for button, ui_command in UI_COMMAND_TABLE.items()},
+    **{source: OmniCommand(
+        cec=cec_source(source),
+        ir=ir_source(SOUND_BAR_SOURCES[source]) if source in SOUND_BAR_SOURCES else None,
+        cec_observe=observe_source(SOUND_BAR_SOURCES[source]) if source in SOUND_BAR_SOURCES else None)
+       for source in SOURCE_LIST},
+}
 
-class NakamichiRemote(RemoteEntity):
-    _attr_activity_list = ['Power', 'SsePlus', 'Mute']
-    _attr_current_activity = '' # Music mode n' whatnot
+
+class RouteStats:
+    """Outcomes of one command over one route."""
+
+    __slots__ = ('sent', 'failed', 'latency', 'success', 'last_failure')
 
     def __init__(self):
-        self._attr_current_activity = ''
-        self.fd = -1
-        self.logger = logging.getLogger(self.__class__.__name__)
-        self.irb = IRBlaster()
+        self.sent = 0
+        self.failed = 0
+        # Moving averages; latency only counts commands that got through
+        self.latency = None
+        self.success = 1.0
+        self.last_failure = None
 
-    # load config file or hardcode
+    def record(self, latency, ok):
+        self.sent += 1
+        self.success += ROUTE_EWMA_WEIGHT * ((1.0 if ok else 0.0) - self.success)
+        if ok:
+            self.latency = latency if self.latency is None else \
+                self.latency + ROUTE_EWMA_WEIGHT * (latency - self.latency)
+        else:
+            self.failed += 1
+            self.last_failure = time.monotonic()
 
-    def turn_on(self, activity: str = None, **kwargs):
-        self.logger.debug('sending on')
-        self.send_command('Power')
+    def healthy(self, now):
+        return self.success >= ROUTE_SUCCESS_MIN or now - self.last_failure >= ROUTE_RETRY_AFTER
 
-    async def async_turn_on(self, activity: str = None, **kwargs):
-        self.logger.debug('sending async on')
-        self.turn_on()
+    def as_dict(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'success_rate': self.success,
+            'latency_ms': self.latency * 1000 if self.latency is not None else None,
+        }
+
+
+class OmniRemote(RemoteEntity):
+    _attr_activity_list = []
+    _attr_unique_id = 'omni'
+
+    def __init__(self, path, remote):
+        self._attr_is_on = False
+        self.path = path
+        # The sound bar's remote in lircd's config
+        self.remote = remote
+        self.irb = None
+        self.model = None
+        # command -> route -> RouteStats
+        self.stats = {name: {} for name in OMNI_COMMANDS}
+
+    async def async_added_to_hass(self) -> None:
+        self.irb = IRBlaster(async_acquire_transport(self.hass, self.path), self.remote)
+        self.async_on_remove(self.irb.transport.connection.add_availability_listener(self._availability_changed))
+        self.model = await async_get_model(self.hass)
+        self.async_on_remove(self.model.add_listener(self._model_changed))
+        self._model_changed(write=False)
+
+    async def async_will_remove_from_hass(self) -> None:
+        await async_release_transport(self.hass, self.irb.transport)
+
+    @property
+    def available(self) -> bool:
+        return self.irb is not None and self.irb.transport.connection.available or \
+            any(entity.available for entity in self._cec_entities())
+
+    def _availability_changed(self, available: bool):
+        self.async_write_ha_state()
+
+    def _model_changed(self, write=True):
+        self._attr_is_on = self.model.state.power
+        if write:
+            self.async_write_ha_state()
 
-    def turn_off(self, activity: str = None, **kwargs):
-        self.logger.debug('sending off')
+    def _cec_entities(self) -> Iterable[HdmiCecKernelEntity]:
+        manager = self.hass.data.get(DATA_CEC_ADAPTERS)
+        return manager.entities.values() if manager is not None else ()
+
+    def _cec_entity(self, target) -> HdmiCecKernelEntity | None:
+        """The open adapter that has heard from target, if any."""
+        for entity in self._cec_entities():
+            if entity.available and entity.topology.devices[target].last_seen is not None:
+                return entity
+        return None
+
+    def plan_routes(self, name) -> list[str]:
+        """The routes to try for command name, best first."""
+        command = OMNI_COMMANDS[name]
+        routes = []
+        if command.cec is not None and self._cec_entity(command.cec_target) is not None:
+            routes.append(ROUTE_CEC)
+        if command.ir is not None and self.irb.transport.connection.available:
+            routes.append(ROUTE_IR)
+        if command.ir_unless_heard is not None:
+            return routes
+        now = time.monotonic()
+        stats = self.stats[name]
+
+        def rank(route):
+            route_stats = stats.get(route)
+            if route_stats is None or route_stats.latency is None:
+                # Unmeasured, so worth a try; CEC first on ties
+                return route_stats is not None and not route_stats.healthy(now), 0.0
+            return not route_stats.healthy(now), route_stats.latency
+
+        return sorted(routes, key=rank)
+
+    async def _async_send_route(self, name, route):
+        command = OMNI_COMMANDS[name]
+        stats = self.stats[name].get(route)
+        if stats is None:
+            stats = self.stats[name][route] = RouteStats()
+        start = time.monotonic()
+        try:
+            if route == ROUTE_CEC:
+                entity = self._cec_entity(command.cec_target)
+                if entity is None:
+                    raise HomeAssistantError('CEC target left the bus')
+                await command.cec(entity)
+            else:
+                await command.ir(self.model, self.irb)
+        except ROUTE_ERRORS as e:
+            stats.record(time.monotonic() - start, False)
+            _LOGGER.debug('%s over %s failed: %r', name, route, e)
+            if route == ROUTE_CEC and command.cec_observe is not None:
+                # The bar may have acted on it anyway
+                self.model.forget(command.cec_uncertain)
+            raise
+        stats.record(time.monotonic() - start, True)
+        if route == ROUTE_CEC and command.cec_observe is not None and \
+                (command.ir_unless_heard is None or self._cec_entity(command.ir_unless_heard) is not None):
+            command.cec_observe(self.model)
+
+    async def async_send_omni_command(self, name):
+        if name not in OMNI_COMMANDS:
+            raise HomeAssistantError(f'unknown command {name}')
+        routes = self.plan_routes(name)
+        if not routes:
+            raise HomeAssistantError(f'no route can carry {name} right now')
+        heard = OMNI_COMMANDS[name].ir_unless_heard
+        if heard is not None:
+            errors = []
+            if ROUTE_CEC in routes:
+                try:
+                    await self._async_send_route(name, ROUTE_CEC)
+                    if self._cec_entity(heard) is not None:
+                        return
+                except ROUTE_ERRORS as e:
+                    errors.append(e)
+            if ROUTE_IR in routes:
+                try:
+                    await self._async_send_route(name, ROUTE_IR)
+                    return
+                except ROUTE_ERRORS as e:
+                    errors.append(e)
+            if len(errors) == len(routes):
+                raise HomeAssistantError(f'{name} failed on every route: {errors}')
+            return
+        error = None
+        for route in routes:
+            try:
+                await self._async_send_route(name, route)
+                return
+            except ROUTE_ERRORS as e:
+                error = e
+        raise HomeAssistantError(f'{name} failed on every route: {error!r}') from error
+
+    async def async_turn_on(self, activity: str = None, **kwargs):
+        await self.async_send_omni_command('power_on')
 
     async def async_turn_off(self, activity: str = None, **kwargs):
-        self.logger.debug('sending async off')
+        await self.async_send_omni_command('power_off')
 
     async def async_toggle(self, activity: str = None, **kwargs):
-        self.logger.debug('sending async toggle')
-
-    def send_command(self, command: Iterable[str], **kwargs):
-        self.logger.debug(f'sending send command {command}')
-        self.irb.send_command(command)
+        await self.async_send_omni_command('power_off' if self.model.state.power else 'power_on')
 
     async def async_send_command(self, command: Iterable[str], **kwargs):
-        self.logger.debug('sending async send command')
+        command = list(command)
+        unknown = [name for name in command if name not in OMNI_COMMANDS]
+        if unknown:
+            raise HomeAssistantError(f'unknown commands {unknown}')
+        delay_secs = kwargs.get(ATTR_DELAY_SECS, DEFAULT_DELAY_SECS)
+        first = True
+        for _ in range(kwargs.get(ATTR_NUM_REPEATS, DEFAULT_NUM_REPEATS)):
+            for name in command:
+                if not first:
+                    await asyncio.sleep(delay_secs)
+                first = False
+                await self.async_send_omni_command(name)
+
+    async def async_get_diagnostics(self):
+        return {
+            'routes': {
+                name: {route: stats.as_dict() for route, stats in routes.items()}
+                for name, routes in self.stats.items() if routes
+            },
+            'ir_available': self.irb.transport.connection.available,
+            'cec_adapters': {entity.adapter.path: entity.available for entity in self._cec_entities()},
+        }
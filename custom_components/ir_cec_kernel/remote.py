@@ -0,0 +1,41 @@
+import logging
+
+from homeassistant.core import HomeAssistant, SupportsResponse
+from homeassistant.exceptions import PlatformNotReady
+from homeassistant.helpers.entity_platform import AddEntitiesCallback, async_get_current_platform
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+
+import homeassistant.helpers.config_validation as cv
+
+from ..a_lirc.keymap import async_load_keymap
+from ..a_lirc.lircd import LircdError
+from ..a_lirc.nakamichi import MODEL_KEYS
+from .omniremote import LIRCD_SOCKET, OmniRemote
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_GET_DIAGNOSTICS = "get_diagnostics"
+
+
+async def async_setup_platform(
+        hass: HomeAssistant,
+        config: ConfigType,
+        async_add_entities: AddEntitiesCallback,
+        discovery_info: DiscoveryInfoType | None = None,
+) -> None:
+    try:
+        loader = await async_load_keymap(hass, LIRCD_SOCKET)
+    except (OSError, LircdError, TimeoutError) as e:
+        raise PlatformNotReady(f'cannot read the remotes of {LIRCD_SOCKET}: {e!r}') from e
+    remote = loader.keymap.find_remote(MODEL_KEYS)
+    if remote is None:
+        _LOGGER.warning('no remote of %s has the sound bar keys', LIRCD_SOCKET)
+        return
+    async_add_entities([OmniRemote(LIRCD_SOCKET, remote)])
+
+    platform = async_get_current_platform()
+
+    platform.async_register_entity_service(
+        SERVICE_GET_DIAGNOSTICS, cv.make_entity_service_schema({}), "async_get_diagnostics",
+        supports_response=SupportsResponse.ONLY,
+    )
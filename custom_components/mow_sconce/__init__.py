@@ -2,11 +2,17 @@
 
 from __future__ import annotations
 
+from contextlib import aclosing
 from datetime import timedelta
 import logging
 from typing import Any, Final
 
-from .mow_sconce import MowSconce, MowSconceDiscovery, ATTR_ID, ATTR_IPADDR
+from .mow_sconce import (
+    MowSconce,
+    MowSconceDiscovery,
+    ATTR_ID,
+    ATTR_IPADDR,
+)
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST, Platform
@@ -34,8 +40,9 @@ from .discovery import (
     async_build_cached_discovery,
     async_clear_discovery_cache,
     async_discover_device,
-    async_discover_devices,
     async_get_discovery,
+    async_get_discovery_stats,
+    async_iter_discover_devices,
     async_trigger_discovery,
     async_update_entry_from_discovery,
 )
@@ -45,6 +52,7 @@ _LOGGER = logging.getLogger(__name__)
 PLATFORMS: Final = [
     Platform.LIGHT,
     Platform.NUMBER,
+    Platform.SENSOR,
 ]
 DISCOVERY_INTERVAL: Final = timedelta(minutes=15)
 REQUEST_REFRESH_DELAY: Final = 1.5
@@ -64,6 +72,8 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the mow_sconce component."""
     domain_data = hass.data.setdefault(DOMAIN, {})
     domain_data[MOW_SCONCE_DISCOVERY] = []
+    # Keeps what config flows recorded before setup
+    async_get_discovery_stats(hass)
 
     @callback
     def _async_start_background_discovery(*_: Any) -> None:
@@ -73,9 +83,11 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         )
 
     async def _async_discovery(*_: Any) -> None:
-        async_trigger_discovery(
-            hass, await async_discover_devices(hass, DISCOVER_SCAN_TIMEOUT)
-        )
+        async with aclosing(
+            async_iter_discover_devices(hass, DISCOVER_SCAN_TIMEOUT)
+        ) as discoveries:
+            async for device in discoveries:
+                async_trigger_discovery(hass, [device])
 
     _async_start_background_discovery()
     async_track_time_interval(
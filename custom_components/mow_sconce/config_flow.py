@@ -2,13 +2,15 @@
 
 from __future__ import annotations
 
-from typing import Any, cast
+import asyncio
+from contextlib import aclosing
+from typing import Any, Final, cast
 
 from .mow_sconce import (
     ATTR_ID,
     ATTR_IPADDR,
 )
-from .mow_sconce import MowSconceDiscovery
+from .mow_sconce import MowSconceDiscovery, MowSconceScanner
 import voluptuous as vol
 
 from homeassistant.config_entries import (
@@ -32,12 +34,19 @@ from .const import (
 )
 from .discovery import (
     async_discover_device,
-    async_discover_devices,
+    async_iter_discover_devices,
     async_name_from_discovery,
     async_populate_data_from_discovery,
     async_update_entry_from_discovery,
 )
 
+# Quiet time that ends a scan early. Scans re-broadcast every scan
+# timeout / BROADCAST_FREQUENCY seconds, and a sconce that missed one
+# broadcast answers the next, so wait out more than one interval.
+DISCOVER_SETTLE_TIMEOUT: Final = (
+    1.5 * DISCOVER_SCAN_TIMEOUT / MowSconceScanner.BROADCAST_FREQUENCY
+)
+
 
 class MowSconceConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow for mow_sconce Integration."""
@@ -174,14 +183,23 @@ class MowSconceConfigFlow(ConfigFlow, domain=DOMAIN):
             entry.data[CONF_HOST]
             for entry in self._async_current_entries(include_ignore=False)
         }
-        discovered_devices = await async_discover_devices(
-            self.hass, DISCOVER_SCAN_TIMEOUT
-        )
         self._discovered_devices = {}
-        for device in discovered_devices:
-            mac_address = device[ATTR_ID]
-            assert mac_address is not None
-            self._discovered_devices[dr.format_mac(mac_address)] = device
+        # Stop listening once replies have settled instead of waiting out the
+        # whole scan timeout
+        settle_timeout: float | None = None
+        async with aclosing(
+            async_iter_discover_devices(self.hass, DISCOVER_SCAN_TIMEOUT)
+        ) as discoveries:
+            while True:
+                try:
+                    async with asyncio.timeout(settle_timeout):
+                        device = await anext(discoveries)
+                except (StopAsyncIteration, TimeoutError):
+                    break
+                mac_address = device[ATTR_ID]
+                assert mac_address is not None
+                self._discovered_devices[dr.format_mac(mac_address)] = device
+                settle_timeout = DISCOVER_SETTLE_TIMEOUT
         devices_name = {
             mac: f"{async_name_from_discovery(device)} ({device[ATTR_IPADDR]})"
             for mac, device in self._discovered_devices.items()
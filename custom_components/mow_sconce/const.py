@@ -3,6 +3,8 @@ from typing import Final
 DOMAIN: Final = "mow_sconce"
 MOW_SCONCE_DISCOVERY: Final = "mow_sconce_discovery"
 MOW_SCONCE_DISCOVERY_SIGNAL = "mow_sconce_discovery_{entry_id}"
+MOW_SCONCE_DISCOVERY_STATS: Final = "mow_sconce_discovery_stats"
+MOW_SCONCE_DISCOVERY_STATS_SIGNAL = "mow_sconce_discovery_stats_updated"
 
 SIGNAL_STATE_UPDATED = "mow_sconce_{}_state_updated"
 
@@ -0,0 +1,33 @@
+"""Diagnostics support for mow_sconce."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from .mow_sconce import MowSconce
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .discovery import async_get_discovery_stats
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    device: MowSconce = hass.data[DOMAIN][entry.entry_id]
+    stats = async_get_discovery_stats(hass)
+    return {
+        "entry": {
+            "title": entry.title,
+            "data": dict(entry.data),
+        },
+        "discovery": device.discovery,
+        "sconce": {
+            "reply_latency": stats.sconce_latency(device.ipaddr),
+            "scans_missed": stats.sconce_scans_missed(device.ipaddr),
+        },
+        "discovery_stats": stats.as_dict(),
+    }
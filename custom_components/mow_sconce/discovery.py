@@ -3,11 +3,18 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import Mapping
+from collections.abc import AsyncIterator, Mapping
+from contextlib import aclosing
 import logging
 from typing import Any, Final
 
-from .mow_sconce import MowSconceDiscovery, MowSconceScanner, ATTR_ID, ATTR_IPADDR
+from .mow_sconce import (
+    MowSconceDiscovery,
+    MowSconceDiscoveryStats,
+    MowSconceScanner,
+    ATTR_ID,
+    ATTR_IPADDR,
+)
 
 from homeassistant import config_entries
 from homeassistant.components import network
@@ -15,6 +22,7 @@ from homeassistant.config_entries import ConfigEntry, ConfigEntryState
 from homeassistant.const import CONF_HOST, CONF_NAME
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import device_registry as dr, discovery_flow
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.util.async_ import create_eager_task
 from homeassistant.util.network import is_ip_address
 
@@ -22,6 +30,8 @@ from .const import (
     DIRECTED_DISCOVERY_TIMEOUT,
     DOMAIN,
     MOW_SCONCE_DISCOVERY,
+    MOW_SCONCE_DISCOVERY_STATS,
+    MOW_SCONCE_DISCOVERY_STATS_SIGNAL,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -109,6 +119,17 @@ def async_get_discovery(hass: HomeAssistant, host: str) -> MowSconceDiscovery |
     return None
 
 
+@callback
+def async_get_discovery_stats(hass: HomeAssistant) -> MowSconceDiscoveryStats:
+    """Return the discovery stats, created on first use.
+
+    Config flows can scan before the component has been set up.
+    """
+    return hass.data.setdefault(DOMAIN, {}).setdefault(
+        MOW_SCONCE_DISCOVERY_STATS, MowSconceDiscoveryStats()
+    )
+
+
 @callback
 def async_clear_discovery_cache(hass: HomeAssistant, host: str) -> None:
     """Clear the host from the discovery cache."""
@@ -119,10 +140,10 @@ def async_clear_discovery_cache(hass: HomeAssistant, host: str) -> None:
     ]
 
 
-async def async_discover_devices(
+async def async_iter_discover_devices(
     hass: HomeAssistant, timeout: int, address: str | None = None
-) -> list[MowSconceDiscovery]:
-    """Discover mow_sconce devices."""
+) -> AsyncIterator[MowSconceDiscovery]:
+    """Discover mow_sconce devices, yielding each one as soon as it replies."""
     if address:
         targets = [address]
     else:
@@ -131,27 +152,41 @@ async def async_discover_devices(
             for address in await network.async_get_ipv4_broadcast_addresses(hass)
         ]
 
+    found: asyncio.Queue[MowSconceDiscovery | None] = asyncio.Queue()
     scanner = MowSconceScanner()
-    for idx, discovered in enumerate(
-        await asyncio.gather(
-            *[
-                create_eager_task(scanner.async_scan(timeout=timeout, address=address))
-                for address in targets
-            ],
-            return_exceptions=True,
+    scanner.metrics.address = address
+    scans = [
+        create_eager_task(
+            scanner.async_scan(
+                timeout=timeout, address=target, on_found=found.put_nowait
+            )
         )
-    ):
-        if isinstance(discovered, Exception):
-            _LOGGER.debug("Scanning %s failed with error: %s", targets[idx], discovered)
-            continue
-
-    if not address:
-        return scanner.get_found_sconces()
-
-    return [
-        device for device in scanner.get_found_sconces() if device[ATTR_IPADDR] == address
+        for target in targets
     ]
 
+    async def _async_wait_scans() -> None:
+        for idx, discovered in enumerate(
+            await asyncio.gather(*scans, return_exceptions=True)
+        ):
+            if isinstance(discovered, Exception):
+                _LOGGER.debug(
+                    "Scanning %s failed with error: %s", targets[idx], discovered
+                )
+        found.put_nowait(None)
+
+    scans_done = create_eager_task(_async_wait_scans())
+    try:
+        while (device := await found.get()) is not None:
+            if not address or device[ATTR_IPADDR] == address:
+                yield device
+        scanner.metrics.complete = True
+    finally:
+        for scan in scans:
+            scan.cancel()
+        await asyncio.gather(scans_done, return_exceptions=True)
+        async_get_discovery_stats(hass).record(scanner.metrics)
+        async_dispatcher_send(hass, MOW_SCONCE_DISCOVERY_STATS_SIGNAL)
+
 
 async def async_discover_device(
     hass: HomeAssistant, host: str
@@ -159,8 +194,10 @@ async def async_discover_device(
     """Direct discovery at a single ip instead of broadcast."""
     # If we are missing the unique_id we should be able to fetch it
     # from the device by doing a directed discovery at the host only
-    for device in await async_discover_devices(hass, DIRECTED_DISCOVERY_TIMEOUT, host):
-        if device[ATTR_IPADDR] == host:
+    async with aclosing(
+        async_iter_discover_devices(hass, DIRECTED_DISCOVERY_TIMEOUT, host)
+    ) as discoveries:
+        async for device in discoveries:
             return device
     return None
 
@@ -5,7 +5,13 @@ from __future__ import annotations
 import logging
 from typing import Any, Optional, cast
 
-from .mow_sconce import MowSconce
+from .mow_sconce import (
+    MowSconce,
+    MowSconceUnsupportedError,
+    OP_SET_BRIGHTNESS,
+    OP_SET_EFFECT,
+    OP_SET_PRIMARY_COLOR,
+)
 
 from homeassistant import config_entries
 from homeassistant.components.light import (
@@ -16,6 +22,7 @@ from homeassistant.components.light import (
     LightEntityFeature, ColorMode,
 )
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from .const import (
@@ -43,10 +50,6 @@ async def async_setup_entry(
 
 class MowSconceLight(LightEntity):
     _attr_name = None
-    _attr_supported_features = LightEntityFeature.EFFECT
-    _attr_effect_list = ['Static', 'Rainbow']
-    _attr_supported_color_modes = {ColorMode.RGBW}
-    _attr_color_mode = ColorMode.RGBW
 
     def __init__(
         self,
@@ -56,6 +59,19 @@ class MowSconceLight(LightEntity):
         """Initialize the light."""
         self._device: MowSconce = device
         self._attr_unique_id = base_unique_id
+        # Only offer what the sconce advertised, so unsupported commands
+        # are refused by Home Assistant rather than sent
+        if device.supports_opcode(OP_SET_PRIMARY_COLOR):
+            self._attr_color_mode = ColorMode.RGBW
+        elif device.supports_opcode(OP_SET_BRIGHTNESS):
+            self._attr_color_mode = ColorMode.BRIGHTNESS
+        else:
+            self._attr_color_mode = ColorMode.ONOFF
+        self._attr_supported_color_modes = {self._attr_color_mode}
+        self._attr_supported_features = LightEntityFeature(0)
+        if device.supports_opcode(OP_SET_EFFECT):
+            self._attr_supported_features |= LightEntityFeature.EFFECT
+            self._attr_effect_list = device.effect_list
         self._is_on = False
         self._brightness = 0
         self._rgbw: tuple[int, int, int, int] = (0, 0, 0, 255)
@@ -82,6 +98,13 @@ class MowSconceLight(LightEntity):
         return self._effect
 
     async def async_turn_on(self, **kwargs: Any) -> None:
+        try:
+            self._turn_on(**kwargs)
+        except MowSconceUnsupportedError as e:
+            raise HomeAssistantError(str(e)) from e
+        self.async_schedule_update_ha_state()
+
+    def _turn_on(self, **kwargs: Any) -> None:
         self._is_on = True
 
         if brightness := kwargs.get(ATTR_BRIGHTNESS):
@@ -91,17 +114,20 @@ class MowSconceLight(LightEntity):
         if effect := kwargs.get(ATTR_EFFECT):
             self._effect = effect
 
-        self._device.set_primary_color(self._rgbw)
+        if self._device.supports_opcode(OP_SET_PRIMARY_COLOR):
+            self._device.set_primary_color(self._rgbw)
         self._device.set_brightness(self._brightness)
 
-        effect_index = 0
-        if effect := self._effect:
-            effect_index = self._attr_effect_list.index(effect)
-        self._device.set_effect(effect_index)
-
-        self.async_schedule_update_ha_state()
+        if self._device.supports_opcode(OP_SET_EFFECT):
+            effect_index = 0
+            if effect := self._effect:
+                effect_index = self._attr_effect_list.index(effect)
+            self._device.set_effect(effect_index)
 
     async def async_turn_off(self, **kwargs: Any) -> None:
+        try:
+            self._device.set_brightness(0)
+        except MowSconceUnsupportedError as e:
+            raise HomeAssistantError(str(e)) from e
         self._is_on = False
-        self._device.set_brightness(0)
         self.async_schedule_update_ha_state()
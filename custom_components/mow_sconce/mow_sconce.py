@@ -1,18 +1,44 @@
 import asyncio
 import contextlib
 import socket
+import struct
 import logging
 from asyncio import AbstractEventLoop
 import time
+from collections import deque
+from dataclasses import dataclass, field
 from construct import this, Struct, Int8ul, Int16ul, Const, Array
-from typing import TypedDict, Optional, Final, List, Tuple, Callable, Union, Dict
+from typing import TypedDict, NotRequired, Optional, Final, List, Tuple, Callable, Union, Dict, Deque, Any
 
 ATTR_IPADDR: Final = "ipaddr"
 ATTR_ID: Final = "id"
+ATTR_FIRMWARE_VERSION: Final = "firmware_version"
+ATTR_LED_COUNT: Final = "led_count"
+ATTR_OPCODES: Final = "opcodes"
+ATTR_EFFECTS: Final = "effects"
+ATTR_EFFECT_SPEED_MIN: Final = "effect_speed_min"
+ATTR_EFFECT_SPEED_MAX: Final = "effect_speed_max"
+
+OP_SET_COLOR_LIST: Final = 0
+OP_SHIFT_COLOR: Final = 1
+OP_SET_PRIMARY_COLOR: Final = 2
+OP_SET_EFFECT: Final = 3
+OP_SET_EFFECT_SPEED: Final = 4
+OP_SET_BRIGHTNESS: Final = 5
+
+# Capabilities of sconces that only send the legacy ASCII discovery reply
+DEFAULT_OPCODES: Final = [0, 1, 2, 3, 4, 5]
+DEFAULT_EFFECTS: Final = ['Static', 'Rainbow']
+DEFAULT_EFFECT_SPEED_MIN: Final = 0
+DEFAULT_EFFECT_SPEED_MAX: Final = 65535
 
 _LOGGER = logging.getLogger(__name__)
 
 
+class MowSconceUnsupportedError(Exception):
+    """The sconce does not advertise the opcode of a command."""
+
+
 class MowSconceDatagramProtocol(asyncio.DatagramProtocol):
     def __init__(
         self,
@@ -39,6 +65,12 @@ class MowSconceDiscovery(TypedDict):
 
     ipaddr: str
     id: str  # aka mac
+    firmware_version: NotRequired[str]
+    led_count: NotRequired[int]
+    opcodes: NotRequired[List[int]]
+    effects: NotRequired[List[str]]
+    effect_speed_min: NotRequired[int]
+    effect_speed_max: NotRequired[int]
 
 
 class MowSconce:
@@ -66,6 +98,27 @@ class MowSconce:
         """Set the discovery data."""
         self._discovery = value
 
+    def _capability(self, key: str, default):
+        if self._discovery is None:
+            return default
+        return self._discovery.get(key, default)
+
+    @property
+    def effect_list(self) -> List[str]:
+        """Return the effect names, indexed by effect number."""
+        return self._capability(ATTR_EFFECTS, DEFAULT_EFFECTS)
+
+    @property
+    def effect_speed_range(self) -> Tuple[int, int]:
+        """Return the (min, max) effect speed."""
+        return (
+            self._capability(ATTR_EFFECT_SPEED_MIN, DEFAULT_EFFECT_SPEED_MIN),
+            self._capability(ATTR_EFFECT_SPEED_MAX, DEFAULT_EFFECT_SPEED_MAX),
+        )
+
+    def supports_opcode(self, opcode: int) -> bool:
+        return opcode in self._capability(ATTR_OPCODES, DEFAULT_OPCODES)
+
     async def async_setup(self, updated_callback: Callable[[], None]) -> None:
         """Setup the connection and fetch initial state."""
         self._updated_callback = updated_callback
@@ -97,6 +150,10 @@ class MowSconce:
             self.transport = None
 
     def _send_cmd(self, cmd):
+        if not self.supports_opcode(cmd[0]):
+            raise MowSconceUnsupportedError(
+                f"{self.ipaddr} does not support opcode {cmd[0]}"
+            )
         if self.transport:
             _LOGGER.debug("cmd: %s => %s", self._destination, cmd)
             self.transport.sendto(cmd)
@@ -141,6 +198,124 @@ class MowSconce:
         self._send_cmd(self.SetBrightness.build({"brightness": brightness}))
 
 
+# Upper bounds in seconds of the reply latency histogram buckets
+LATENCY_BUCKETS: Final = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _histogram(values: List[float]) -> Dict[str, int]:
+    buckets = {f"le_{bound}": 0 for bound in LATENCY_BUCKETS}
+    buckets["le_inf"] = 0
+    for value in values:
+        for bound in LATENCY_BUCKETS:
+            if value <= bound:
+                buckets[f"le_{bound}"] += 1
+                break
+        else:
+            buckets["le_inf"] += 1
+    return buckets
+
+
+@dataclass
+class MowSconceScanMetrics:
+    """Metrics of a single discovery pass."""
+
+    address: Optional[str] = None
+    # When the first probe went out; reply latencies count from there
+    started: Optional[float] = None
+    # False when the pass was cut short, as by a config flow that stopped
+    # listening once replies settled
+    complete: bool = False
+    probes_sent: Dict[str, int] = field(default_factory=dict)
+    replies: int = 0
+    duplicate_replies: int = 0
+    parse_failures: int = 0
+    first_reply_latency: Optional[float] = None
+    last_reply_latency: Optional[float] = None
+    # First reply latency of each sconce, keyed by ipaddr
+    sconce_latencies: Dict[str, float] = field(default_factory=dict)
+
+    def record_probe(self, target: str) -> None:
+        if self.started is None:
+            self.started = time.monotonic()
+        self.probes_sent[target] = self.probes_sent.get(target, 0) + 1
+
+    def record_reply(self, ipaddr: str, duplicate: bool, parsed: bool) -> None:
+        latency = time.monotonic() - self.started
+        self.replies += 1
+        if self.first_reply_latency is None:
+            self.first_reply_latency = latency
+        self.last_reply_latency = latency
+        if duplicate:
+            self.duplicate_replies += 1
+        elif not parsed:
+            self.parse_failures += 1
+        else:
+            self.sconce_latencies[ipaddr] = latency
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "complete": self.complete,
+            "probes_sent": dict(self.probes_sent),
+            "replies": self.replies,
+            "duplicate_replies": self.duplicate_replies,
+            "parse_failures": self.parse_failures,
+            "first_reply_latency": self.first_reply_latency,
+            "last_reply_latency": self.last_reply_latency,
+            "sconce_latencies": dict(self.sconce_latencies),
+        }
+
+
+class MowSconceDiscoveryStats:
+    """Rolling aggregate of the most recent discovery passes."""
+
+    def __init__(self, window: int = 96) -> None:
+        self._scans: Deque[MowSconceScanMetrics] = deque(maxlen=window)
+
+    def record(self, metrics: MowSconceScanMetrics) -> None:
+        self._scans.append(metrics)
+
+    @property
+    def last_scan(self) -> Optional[MowSconceScanMetrics]:
+        return self._scans[-1] if self._scans else None
+
+    def sconce_latency(self, ipaddr: str) -> Optional[float]:
+        """Return the latest reply latency of a sconce."""
+        for scan in reversed(self._scans):
+            if ipaddr in scan.sconce_latencies:
+                return scan.sconce_latencies[ipaddr]
+        return None
+
+    def sconce_scans_missed(self, ipaddr: str) -> int:
+        """Return how many complete broadcast passes in the window the sconce didn't answer."""
+        return sum(
+            1
+            for scan in self._scans
+            if scan.address is None
+            and scan.complete
+            and ipaddr not in scan.sconce_latencies
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        scans = list(self._scans)
+        return {
+            "scans": len(scans),
+            "probes_sent": sum(sum(scan.probes_sent.values()) for scan in scans),
+            "replies": sum(scan.replies for scan in scans),
+            "duplicate_replies": sum(scan.duplicate_replies for scan in scans),
+            "parse_failures": sum(scan.parse_failures for scan in scans),
+            "first_reply_latency_histogram": _histogram(
+                [scan.first_reply_latency for scan in scans
+                 if scan.first_reply_latency is not None]
+            ),
+            "last_reply_latency_histogram": _histogram(
+                [scan.last_reply_latency for scan in scans
+                 if scan.last_reply_latency is not None]
+            ),
+            "last_scan": self.last_scan.as_dict() if self.last_scan else None,
+        }
+
+
 class MowSconceScanner:
     DISCOVERY_PORT: int = 6722
     BROADCAST_ADDRESS = "<broadcast>"
@@ -149,6 +324,7 @@ class MowSconceScanner:
     def __init__(self):
         self.loop: AbstractEventLoop = asyncio.get_running_loop()
         self._discoveries: Dict[str, MowSconceDiscovery] = {}
+        self.metrics = MowSconceScanMetrics()
 
     @property
     def found_sconces(self) -> List[MowSconceDiscovery]:
@@ -180,6 +356,84 @@ class MowSconceScanner:
     def get_discovery_reply_message() -> str:
         return 'mow sconce reply: '
 
+    # Binary discovery reply, followed by effect_count effect names that are
+    # each a length byte and that many bytes of UTF-8. Newer versions may
+    # append fields after the effect names.
+    DISCOVERY_REPLY_MAGIC: bytes = b'MOWS'
+    DiscoveryReplyHeader = struct.Struct(
+        "<"
+        "4s"  # magic
+        "B"  # version
+        "6s"  # mac
+        "3B"  # firmware major, minor, patch
+        "H"  # led_count
+        "I"  # supported opcode bitmask
+        "H"  # effect_speed_min
+        "H"  # effect_speed_max
+        "B"  # effect_count
+    )
+
+    @staticmethod
+    def _parse_binary_reply(
+        data: bytes, from_ipaddr: str
+    ) -> Optional[MowSconceDiscovery]:
+        header = MowSconceScanner.DiscoveryReplyHeader
+        if len(data) < header.size:
+            return None
+        _, version, mac, fw_major, fw_minor, fw_patch, led_count, opcode_mask, \
+            effect_speed_min, effect_speed_max, effect_count = header.unpack_from(data)
+        if version < 1 or effect_speed_min > effect_speed_max:
+            return None
+
+        view = memoryview(data)
+        offset = header.size
+        effects = []
+        for _ in range(effect_count):
+            if offset >= len(view):
+                return None
+            end = offset + 1 + view[offset]
+            if end > len(view):
+                return None
+            try:
+                effects.append(str(view[offset + 1:end], "utf-8"))
+            except UnicodeDecodeError:
+                return None
+            offset = end
+
+        return MowSconceDiscovery(
+            ipaddr=from_ipaddr,
+            id=mac.hex(),
+            firmware_version=f"{fw_major}.{fw_minor}.{fw_patch}",
+            led_count=led_count,
+            opcodes=[opcode for opcode in range(32) if opcode_mask & (1 << opcode)],
+            effects=effects,
+            effect_speed_min=effect_speed_min,
+            effect_speed_max=effect_speed_max,
+        )
+
+    @staticmethod
+    def _parse_reply(
+        data: bytes, from_address: Tuple[str, int]
+    ) -> Optional[MowSconceDiscovery]:
+        """Parse a binary or legacy ASCII discovery reply.
+
+        Returns None for anything that isn't a well-formed reply
+        """
+        from_ipaddr = from_address[0]
+        if data.startswith(MowSconceScanner.DISCOVERY_REPLY_MAGIC):
+            return MowSconceScanner._parse_binary_reply(data, from_ipaddr)
+        reply_start = MowSconceScanner.get_discovery_reply_message().encode("ascii")
+        if data.startswith(reply_start):
+            try:
+                from_mac = data[len(reply_start):].decode("ascii")
+            except UnicodeDecodeError:
+                return None
+            return MowSconceDiscovery(
+                ipaddr=from_ipaddr,
+                id=from_mac,
+            )
+        return None
+
     async def _async_run_scan(
         self,
         transport: asyncio.DatagramTransport,
@@ -190,6 +444,7 @@ class MowSconceScanner:
         """Send the scans."""
         discovery_message = self.get_discovery_message()
         self._send_message(transport, destination, discovery_message)
+        self.metrics.record_probe(destination[0])
         quit_time = time.monotonic() + timeout
         time_out = timeout / self.BROADCAST_FREQUENCY
         while True:
@@ -207,6 +462,7 @@ class MowSconceScanner:
                 return
             # No response, send broadcast again in cast it got lost
             self._send_message(transport, destination, discovery_message)
+            self.metrics.record_probe(destination[0])
 
     @staticmethod
     def _process_response(
@@ -214,6 +470,7 @@ class MowSconceScanner:
         from_address: Tuple[str, int],
         address: Optional[str],
         response_list: Dict[str, MowSconceDiscovery],
+        on_found: Optional[Callable[[MowSconceDiscovery], None]] = None,
     ) -> bool:
         """Process a response.
 
@@ -221,8 +478,9 @@ class MowSconceScanner:
         """
         if data is None:
             return False
-        decoded_data = data.decode("ascii")
-        MowSconceScanner._process_data(from_address, decoded_data, response_list)
+        found = MowSconceScanner._process_data(from_address, data, response_list)
+        if found is not None and on_found is not None:
+            on_found(found)
         if address is None or address not in response_list:
             return False
         return True
@@ -230,32 +488,46 @@ class MowSconceScanner:
     @staticmethod
     def _process_data(
         from_address: Tuple[str, int],
-        decoded_data: str,
+        data: bytes,
         response_list: Dict[str, MowSconceDiscovery],
-    ) -> None:
-        """Process data."""
-        reply_start = MowSconceScanner.get_discovery_reply_message()
-        if decoded_data.startswith(reply_start):
-            from_ipaddr = from_address[0]
-            from_mac = decoded_data[len(reply_start):]
-            response_list.setdefault(
-                from_ipaddr,
-                MowSconceDiscovery(
-                    ipaddr=from_ipaddr,
-                    id=from_mac,
-                ),
-            )
+    ) -> Optional[MowSconceDiscovery]:
+        """Process data.
+
+        Returns the discovery if this is the first reply from the sconce
+        """
+        if from_address[0] in response_list:
+            return None
+        discovery = MowSconceScanner._parse_reply(data, from_address)
+        if discovery is None:
+            _LOGGER.debug("discover: ignoring malformed reply from %s", from_address)
+            return None
+        response_list[discovery[ATTR_IPADDR]] = discovery
+        return discovery
 
     async def async_scan(
-        self, timeout: int = 10, address: Optional[str] = None
+        self,
+        timeout: int = 10,
+        address: Optional[str] = None,
+        on_found: Optional[Callable[[MowSconceDiscovery], None]] = None,
     ) -> List[MowSconceDiscovery]:
-        """Discover mow sconce."""
+        """Discover mow sconce.
+
+        on_found is called as soon as each sconce replies for the first time,
+        so callers don't have to wait out the whole scan.
+        """
         destination = self._destination_from_address(address)
         found_all_future: "asyncio.Future[bool]" = self.loop.create_future()
 
         def _on_response(data: bytes, addr: Tuple[str, int]) -> None:
             _LOGGER.debug("discover: %s <= %s", addr, data)
-            if self._process_response(data, addr, address, self._discoveries):
+            duplicate = addr[0] in self._discoveries
+            stop = self._process_response(
+                data, addr, address, self._discoveries, on_found
+            )
+            self.metrics.record_reply(
+                addr[0], duplicate, duplicate or addr[0] in self._discoveries
+            )
+            if stop:
                 with contextlib.suppress(asyncio.InvalidStateError):
                     found_all_future.set_result(True)
 
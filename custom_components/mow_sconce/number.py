@@ -1,5 +1,5 @@
 from homeassistant import config_entries
-from .mow_sconce import MowSconce
+from .mow_sconce import MowSconce, OP_SET_EFFECT_SPEED
 from homeassistant.components.number import NumberEntity, NumberMode
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
@@ -13,12 +13,11 @@ async def async_setup_entry(
 ) -> None:
     """Set up the sconce."""
     device: MowSconce = hass.data[DOMAIN][entry.entry_id]
-    async_add_entities([MowSconceEffectSpeed(device, entry.unique_id or entry.entry_id)])
+    if device.supports_opcode(OP_SET_EFFECT_SPEED):
+        async_add_entities([MowSconceEffectSpeed(device, entry.unique_id or entry.entry_id)])
 
 
 class MowSconceEffectSpeed(NumberEntity):
-    _attr_native_min_value = 0
-    _attr_native_max_value = 65535
     _attr_native_step = 1
     _attr_mode = NumberMode.SLIDER
 
@@ -30,10 +29,11 @@ class MowSconceEffectSpeed(NumberEntity):
         """Initialize the light."""
         self._device: MowSconce = device
         self._attr_unique_id = f"{base_unique_id}_effect_speed"
-        self._attr_native_value = 32768
+        self._attr_native_min_value, self._attr_native_max_value = device.effect_speed_range
+        self._attr_native_value = (self._attr_native_min_value + self._attr_native_max_value + 1) // 2
 
     async def async_set_native_value(self, value: float) -> None:
-        int_value = min(65535, max(0, int(value)))
+        int_value = min(self._attr_native_max_value, max(self._attr_native_min_value, int(value)))
         self._attr_native_value = float(int_value)
         self._device.set_effect_speed(int_value)
         self.async_schedule_update_ha_state()
@@ -0,0 +1,94 @@
+from homeassistant import config_entries
+from .mow_sconce import MowSconce, MowSconceDiscoveryStats
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from .const import DOMAIN, MOW_SCONCE_DISCOVERY_STATS_SIGNAL
+from .discovery import async_get_discovery_stats
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: config_entries.ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the sconce discovery sensors."""
+    device: MowSconce = hass.data[DOMAIN][entry.entry_id]
+    stats = async_get_discovery_stats(hass)
+    base_unique_id = entry.unique_id or entry.entry_id
+    async_add_entities([
+        MowSconceDiscoveryLatency(device, stats, base_unique_id),
+        MowSconceDiscoveryScansMissed(device, stats, base_unique_id),
+    ])
+
+
+class MowSconceDiscoverySensor(SensorEntity):
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        device: MowSconce,
+        stats: MowSconceDiscoveryStats,
+    ) -> None:
+        """Initialize the sensor."""
+        self._device: MowSconce = device
+        self._stats = stats
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, MOW_SCONCE_DISCOVERY_STATS_SIGNAL, self._async_stats_updated
+            )
+        )
+
+    @callback
+    def _async_stats_updated(self) -> None:
+        self.async_write_ha_state()
+
+
+class MowSconceDiscoveryLatency(MowSconceDiscoverySensor):
+    _attr_name = "Discovery reply latency"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    def __init__(
+        self,
+        device: MowSconce,
+        stats: MowSconceDiscoveryStats,
+        base_unique_id: str,
+    ) -> None:
+        super().__init__(device, stats)
+        self._attr_unique_id = f"{base_unique_id}_discovery_latency"
+
+    @property
+    def native_value(self) -> float | None:
+        if (latency := self._stats.sconce_latency(self._device.ipaddr)) is None:
+            return None
+        return round(latency * 1000, 1)
+
+
+class MowSconceDiscoveryScansMissed(MowSconceDiscoverySensor):
+    _attr_name = "Discovery scans missed"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(
+        self,
+        device: MowSconce,
+        stats: MowSconceDiscoveryStats,
+        base_unique_id: str,
+    ) -> None:
+        super().__init__(device, stats)
+        self._attr_unique_id = f"{base_unique_id}_discovery_scans_missed"
+
+    @property
+    def native_value(self) -> int:
+        return self._stats.sconce_scans_missed(self._device.ipaddr)
@@ -0,0 +1,82 @@
+"""Replays through FakeCecAdapter, with and without a logical address."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('homeassistant')
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.hdmi_cec_kernel.benchmark import sample_event_buf, sample_traffic  # noqa: E402
+from custom_components.hdmi_cec_kernel.media_player import (  # noqa: E402
+    CEC_LOG_ADDR_INVALID,
+    PHYS_ADDR_BY_SOURCE,
+    HdmiCecKernelEntity,
+)
+from custom_components.hdmi_cec_kernel.recorder import KIND_EVENT  # noqa: E402
+from custom_components.hdmi_cec_kernel.replay import (  # noqa: E402
+    REPLAY_ENTITY_ID,
+    FakeCecAdapter,
+    FakeCecDevice,
+    async_replay,
+    fake_ioctl,
+)
+
+
+def replay(tmp_path, records, device=None):
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        return await async_replay(hass, records, device=device)
+    return asyncio.run(run())
+
+
+def test_replay_counts_records(tmp_path):
+    records = sample_traffic(200)
+    result = replay(tmp_path, records)
+    assert result.messages + result.events == len(records)
+    assert result.messages == sum(1 for kind, _, _ in records if kind != KIND_EVENT)
+    assert result.device.transmitted
+
+
+def test_replay_claims_configured_address(tmp_path):
+    result = replay(tmp_path, [])
+    assert result.device.log_addrs[0] == 4
+    assert result.entity.adapter.log_addr == 4
+
+
+def test_replay_unconfigured_adapter(tmp_path):
+    device = FakeCecDevice(log_addr=CEC_LOG_ADDR_INVALID)
+    result = replay(tmp_path, sample_traffic(50), device)
+    assert result.device.log_addrs[0] == CEC_LOG_ADDR_INVALID
+    assert not result.device.transmitted
+
+
+def test_switch_source_unconfigured_adapter(tmp_path):
+    device = FakeCecDevice(log_addr=CEC_LOG_ADDR_INVALID)
+    adapter = FakeCecAdapter()
+    phys_addr = PHYS_ADDR_BY_SOURCE['HDMI 2']
+
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        entity = HdmiCecKernelEntity(adapter)
+        entity.hass = hass
+        entity.entity_id = REPLAY_ENTITY_ID
+        with fake_ioctl(device):
+            try:
+                await adapter.async_run(adapter.open)
+                with pytest.raises(OSError):
+                    await adapter.async_run(adapter.switch_source, phys_addr)
+                assert not device.transmitted
+
+                # The HDMI link comes up and the kernel claims an address
+                device.claim_log_addr = device.log_addrs[0] = 4
+                device.queue(KIND_EVENT, sample_event_buf())
+                entity.read_ready()
+                await hass.async_block_till_done()
+                await adapter.async_run(adapter.switch_source, phys_addr)
+                assert device.transmitted
+            finally:
+                await entity.async_will_remove_from_hass()
+
+    asyncio.run(run())